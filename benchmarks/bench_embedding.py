@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Benchmark of the embedding of the training examples.
+
+It simulates a remote embeddings model, with a fixed latency per call and a
+cost per text, and compares embedding all the examples in a single call,
+which was the behaviour before, against embedding them in chunks over a pool
+of workers.
+
+    python benchmarks/bench_embedding.py
+"""
+
+import time
+
+from langchain.embeddings import DeterministicFakeEmbedding
+
+from promptmeteo.selector.embedding import embed_texts
+
+
+class RemoteFakeEmbedding(DeterministicFakeEmbedding):
+    """
+    Fake embeddings that sleep as a remote embeddings API would.
+    """
+
+    latency: float = 0.05
+    cost_per_text: float = 0.0002
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency + self.cost_per_text * len(texts))
+        return super().embed_documents(texts)
+
+
+def main(n_texts: int = 5000) -> None:
+    """
+    Runs the benchmark and prints the time of each configuration.
+    """
+
+    embeddings = RemoteFakeEmbedding(size=64)
+    texts = [f"example {idx}" for idx in range(n_texts)]
+
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    print(f"{'single call':>24}: {time.perf_counter() - start:6.2f} s")
+
+    for chunk_size, max_concurrency in [(256, 1), (256, 4), (256, 16)]:
+        start = time.perf_counter()
+        embed_texts(
+            embeddings,
+            texts,
+            chunk_size=chunk_size,
+            max_concurrency=max_concurrency,
+        )
+        name = f"chunks {chunk_size} x {max_concurrency}"
+        print(f"{name:>24}: {time.perf_counter() - start:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
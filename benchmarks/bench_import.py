@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Startup benchmark of `import promptmeteo`.
+
+Each run imports the package in a fresh interpreter and reports the wall time
+of the import and the peak resident memory of the process.
+
+    python benchmarks/bench_import.py
+"""
+
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import resource
+import sys
+import time
+
+start = time.perf_counter()
+import promptmeteo
+elapsed = time.perf_counter() - start
+
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss = rss / 1024 if sys.platform == "darwin" else rss
+print(elapsed, rss)
+"""
+
+
+def main(repeat: int = 10) -> None:
+    """
+    Runs the benchmark and prints the median import time and peak RSS.
+    """
+
+    times, memory = [], []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        times.append(float(output[0]))
+        memory.append(float(output[1]))
+
+    print(f"import time: {statistics.median(times) * 1e3:8.1f} ms")
+    print(f"   peak RSS: {statistics.median(memory) / 1024:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
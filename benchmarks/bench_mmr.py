@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Benchmark of the Maximal Marginal Relevance selection of examples.
+
+It compares the MMR search of the LangChain FAISS vectorstore, used by the
+`relevance` algorithm before, which reconstructs the candidate vectors and
+reranks them one query at a time, against the native selector, which reranks
+the candidates of all the queries with matrix products.
+
+    python benchmarks/bench_mmr.py
+"""
+
+import time
+import uuid
+
+import numpy as np
+from langchain.embeddings import DeterministicFakeEmbedding
+from langchain.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+from promptmeteo.selector.index import build_index
+from promptmeteo.selector.custom_selectors import MaxMarginalRelevanceSelector
+
+
+def main(
+    n_examples: int = 50000,
+    dimension: int = 384,
+    n_queries: int = 256,
+    k: int = 10,
+    fetch_k: int = 40,
+) -> None:
+    """
+    Runs the benchmark and prints the time per query of each implementation.
+    """
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n_examples, dimension), dtype=np.float32)
+    queries = rng.standard_normal((n_queries, dimension), dtype=np.float32)
+
+    ids = [str(uuid.uuid4()) for _ in range(n_examples)]
+    vectorstore = FAISS(
+        DeterministicFakeEmbedding(size=dimension),
+        build_index(vectors),
+        InMemoryDocstore(
+            {
+                doc_id: Document(page_content="", metadata={"row": row})
+                for row, doc_id in enumerate(ids)
+            }
+        ),
+        dict(enumerate(ids)),
+    )
+    selector = MaxMarginalRelevanceSelector(
+        vectorstore=vectorstore, k=k, fetch_k=fetch_k
+    )
+
+    start = time.perf_counter()
+    langchain = [
+        [
+            doc.metadata
+            for doc in vectorstore.max_marginal_relevance_search_by_vector(
+                query.tolist(), k=k, fetch_k=fetch_k
+            )
+        ]
+        for query in queries
+    ]
+    langchain_time = time.perf_counter() - start
+
+    selector.load_vectors()
+    start = time.perf_counter()
+    native = selector.select_examples_by_vectors(queries)
+    native_time = time.perf_counter() - start
+
+    agreement = np.mean([a == b for a, b in zip(langchain, native)])
+    for name, seconds in [
+        ("langchain", langchain_time),
+        ("native", native_time),
+    ]:
+        print(f"{name:>10}: {seconds / n_queries * 1e3:8.3f} ms/query")
+    print(f"{'agreement':>10}: {agreement:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
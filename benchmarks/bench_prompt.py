@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Micro-benchmark of the per-sample prompt assembly cost.
+
+It compares the prompt assembly before prompts were compiled, which built
+two `PromptTemplate` objects from the task template on every call, against
+filling the compiled prompt with only the sample and the examples.
+
+    python benchmarks/bench_prompt.py
+"""
+
+import timeit
+from string import Formatter
+
+from langchain.prompts import PromptTemplate
+
+from promptmeteo.prompts import PromptFactory
+from promptmeteo.prompts.base import BasePrompt
+
+
+def baseline_prompt(
+    prompt: BasePrompt,
+    sample: str,
+    examples: str,
+) -> str:
+    """
+    Prompt of a sample as it was assembled before prompts were compiled:
+    the former `BasePrompt.run()` followed by the formatting of
+    `Task._get_prompt()`.
+    """
+
+    prompt_variables = dict(
+        __PROMPT_SAMPLE__=(
+            prompt.PROMPT_SAMPLE if hasattr(prompt, "PROMPT_SAMPLE") else ""
+        ),
+        __PROMPT_LABELS__="",
+        __PROMPT_DOMAIN__="",
+        __PROMPT_DETAIL__="",
+        __SHOT_EXAMPLES__=(
+            prompt.SHOT_EXAMPLES if hasattr(prompt, "SHOT_EXAMPLES") else ""
+        ),
+        __ANSWER_FORMAT__=(
+            prompt.ANSWER_FORMAT if hasattr(prompt, "ANSWER_FORMAT") else ""
+        ),
+        __CHAIN_THOUGHT__=(
+            prompt.CHAIN_THOUGHT if hasattr(prompt, "CHAIN_THOUGHT") else ""
+        ),
+    )
+
+    # Labels
+    prompt_labels = (
+        ", ".join(prompt._prompt_labels)
+        if isinstance(prompt._prompt_labels, list)
+        else prompt._prompt_detail
+    )
+    prompt_variables["__PROMPT_LABELS__"] = (
+        prompt.PROMPT_LABELS.format(__LABELS__=prompt_labels)
+        if prompt._prompt_labels
+        else ""
+    )
+
+    # Domain
+    prompt_variables["__PROMPT_DOMAIN__"] = prompt.PROMPT_DOMAIN.format(
+        __DOMAIN__=prompt._prompt_domain
+    )
+
+    # Detail
+    prompt_detail = (
+        "\n - ".join([""] + prompt._prompt_detail)
+        if isinstance(prompt._prompt_detail, list)
+        else prompt._prompt_detail
+    )
+    prompt_variables["__PROMPT_DETAIL__"] = prompt.PROMPT_DETAIL.format(
+        __DETAIL__=prompt_detail
+    )
+
+    intro_prompt = PromptTemplate.from_template(
+        PromptTemplate.from_template(prompt.TEMPLATE).format(
+            **{
+                k: v
+                for (k, v) in prompt_variables.items()
+                if k in [i[1] for i in Formatter().parse(prompt.TEMPLATE)]
+            }
+        )
+    )
+
+    variables = dict(__SAMPLE__=sample, __EXAMPLES__=examples)
+
+    return intro_prompt.format(
+        **{
+            k: v
+            for (k, v) in variables.items()
+            if k in intro_prompt.input_variables
+        }
+    )
+
+
+def main(number: int = 2000) -> None:
+    """
+    Runs the benchmark and prints the cost per call.
+    """
+
+    prompt = PromptFactory.factory_method(
+        language="es",
+        task_type="classification",
+        model_name="fake-static",
+        prompt_domain="reviews",
+        prompt_labels=["positive", "negative", "neutral"],
+        prompt_detail=["Be concise.", "Use only the given labels."],
+    )
+    sample, examples = "me encanta", "ejemplo"
+
+    def uncompiled():
+        return baseline_prompt(prompt, sample, examples)
+
+    def compiled():
+        return prompt.compile().format(__SAMPLE__=sample, __EXAMPLES__=examples)
+
+    assert uncompiled() == compiled()
+
+    for name, function in [("uncompiled", uncompiled), ("compiled", compiled)]:
+        seconds = min(timeit.repeat(function, number=number, repeat=5))
+        print(f"{name:>10}: {seconds / number * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
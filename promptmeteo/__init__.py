@@ -5,3 +5,4 @@ from .document_classifier import DocumentClassifier
 from .api_generator import APIGenerator
 from .api_formatter import APIFormatter
 from .summarizer import Summarizer
+from . import registry
@@ -20,14 +20,10 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
 import re
-import tarfile
-import tempfile
-import json
-import os
 
 import yaml
 from copy import deepcopy
-from typing import List
+from typing import BinaryIO, List, Union
 
 from .constants import REST_PROTOCOL
 
@@ -38,6 +34,7 @@ except ImportError:
 
 from .base import BaseUnsupervised
 from .tasks import TaskTypes
+from .selector import SelectorTypes
 from .tools import add_docstring_from
 from .validations import version_validation
 
@@ -102,6 +99,7 @@ class APIFormatter(BaseUnsupervised):
     """
 
     TASK_TYPE = TaskTypes.API_CORRECTION.value
+    SELECTOR_TYPE = SelectorTypes.STATIC.value
     ALLOWED_PROTOCOLS = [REST_PROTOCOL]
 
     @add_docstring_from(BaseUnsupervised.__init__)
@@ -218,15 +216,19 @@ class APIFormatter(BaseUnsupervised):
     @add_docstring_from(BaseUnsupervised.load_model)
     def load_model(
         cls,
-        model_path: str,
+        model_path: Union[str, bytes, BinaryIO],
+        **kwargs,
     ) -> Self:
         """
         Loads a model artifact to make new predictions.
 
         Parameters
         ----------
-        model_path : str
-            Path to the model artifact.
+        model_path : Union[str, bytes, BinaryIO]
+            Path to the model artifact, or its contents as bytes or a
+            binary file object.
+        kwargs
+            Arguments of `Base.load_model()`, such as `lazy`.
 
         Returns
         -------
@@ -234,50 +236,28 @@ class APIFormatter(BaseUnsupervised):
             Returns the loaded APIFormatter object.
         """
 
-        model_dir = os.path.dirname(model_path)
-        model_name = os.path.basename(model_path)
-
-        if not model_name.endswith(".meteo"):
-            raise ValueError(
-                f"{cls.__name__} error in `load_model()`. "
-                f'model_path="{model_path}" has a bad model name extension. '
-                f"Model name must end with `.meteo` (i.e. `./model.meteo`)"
-            )
-
-        if not os.path.exists(model_path):
-            raise ValueError(
-                f"{cls.__name__} error in `load_model()`. "
-                f"directory {model_dir} does not exists."
-            )
-
-        with tempfile.TemporaryDirectory() as tmp:
-            with tarfile.open(model_path, "r:gz") as tar:
-                tar.extractall(tmp)
-
-            init_tmp_path = os.path.join(
-                tmp, f"{os.path.splitext(model_name)[0]}.init"
-            )
-
-            with open(init_tmp_path) as f_init:
-                params = json.load(f_init)
-
-            self = cls(**params)
-            self._entities = params["_entities"]
-            self._parameters = params["_parameters"]
+        return super(APIFormatter, cls).load_model(model_path, **kwargs)
 
-            self.builder.build_selector_by_load(
-                model_path=os.path.join(tmp, model_name),
-                selector_type=self.SELECTOR_TYPE,
-                selector_k=self._selector_k,
-                selector_algorithm=self._selector_algorithm,
-            )
+    @classmethod
+    def _from_init_params(cls, init_params: dict) -> Self:
+        """
+        Creates the model from its saved parameters, restoring the entities
+        and parameters extracted when it was trained.
+        """
 
-            self._is_trained = True
+        self = cls(**init_params)
+        self._entities = init_params["_entities"]
+        self._parameters = init_params["_parameters"]
 
         return self
 
     @add_docstring_from(BaseUnsupervised.predict)
-    def predict(self, api_codes: List[str], external_info: dict) -> List[str]:
+    def predict(
+        self,
+        api_codes: List[str],
+        external_info: dict,
+        **kwargs,
+    ) -> List[str]:
         """
         Receive a list of API codes and return a list with the corrected APIs.
 
@@ -287,6 +267,8 @@ class APIFormatter(BaseUnsupervised):
             List of API codes.
         external_info : dict
             External information to be added to the APIs.
+        **kwargs : dict
+            Execution options passed to `BaseUnsupervised.predict()`.
 
         Returns
         -------
@@ -295,13 +277,48 @@ class APIFormatter(BaseUnsupervised):
         """
 
         _api_codes = deepcopy(api_codes)
-        _api_codes = super(APIFormatter, self).predict(examples=_api_codes)
-        _api_codes = [self._replace(api) for api in _api_codes]
-        _api_codes = [
-            self._add_external_information(api, external_info)
-            for api in _api_codes
+        _api_codes = super(APIFormatter, self).predict(
+            examples=_api_codes, **kwargs
+        )
+        return self._complete_apis(_api_codes, external_info)
+
+    @add_docstring_from(BaseUnsupervised.apredict)
+    async def apredict(
+        self,
+        api_codes: List[str],
+        external_info: dict,
+        **kwargs,
+    ) -> List[str]:
+        """
+        Asynchronous version of `predict()`.
+        """
+
+        _api_codes = deepcopy(api_codes)
+        _api_codes = await super(APIFormatter, self).apredict(
+            examples=_api_codes, **kwargs
+        )
+        return self._complete_apis(_api_codes, external_info)
+
+    def _complete_apis(
+        self,
+        api_codes: List[str],
+        external_info: dict,
+    ) -> List[str]:
+        """
+        Replace the trained entities and parameters in the predicted APIs and
+        add the external information to them.
+        """
+
+        return [
+            (
+                self._add_external_information(
+                    self._replace(api), external_info
+                )
+                if isinstance(api, str)
+                else api
+            )
+            for api in api_codes
         ]
-        return _api_codes
 
     def _replace(
         self,
@@ -0,0 +1,793 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import io
+import os
+import json
+import mmap
+import time
+import zlib
+import shutil
+import hashlib
+import tarfile
+import tempfile
+from enum import Enum
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Optional, Union
+
+ARTIFACT_FORMAT = "promptmeteo"
+ARTIFACT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+SELECTOR_FOLDER = "selector"
+CHUNK_SIZE = 1 << 20
+
+ArtifactSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+
+class ArtifactCompression(str, Enum):
+    """
+    Enum with the available compressions of the artifact members.
+    """
+
+    NONE: str = "none"
+    ZLIB: str = "zlib"
+
+
+class Artifact:
+    """
+    Contents of a model artifact: the version of its format, the parameters
+    of the model and the files of its example selector. The selector is the
+    path of a folder when the artifact is a folder on disk that can be read
+    in place, and a dictionary of in-memory files otherwise.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        init_params: Dict[str, Any],
+        selector: Union[str, Dict[str, Any]],
+        task_type: Optional[str] = None,
+    ) -> None:
+        self.version = version
+        self.init_params = init_params
+        self.selector = selector
+        self.task_type = task_type
+
+
+def write_artifact(
+    target: Union[str, BinaryIO],
+    init_params: Dict[str, Any],
+    selector_path: str,
+    compression: str = ArtifactCompression.NONE,
+    task_type: Optional[str] = None,
+) -> None:
+    """
+    Writes a model artifact in the format version 2: an uncompressed tarball
+    whose first member is a JSON manifest with the parameters of the model
+    and the size, checksum and compression of every other member. The files
+    of the example selector are stored under the `selector/` folder.
+
+    Parameters
+    ----------
+    target : Union[str, BinaryIO]
+        Path or file object where the artifact is written.
+    init_params : Dict[str, Any]
+        Parameters of the model.
+    selector_path : str
+        Folder where the example selector has been saved.
+    compression : str
+        Compression of each member, `none` or `zlib`. The members are
+        compressed one by one, so they are read without decompressing the
+        whole artifact.
+    task_type : Optional[str]
+        Type of the task of the model, recorded in the manifest.
+    """
+
+    compression = ArtifactCompression(compression)
+
+    files = sorted(
+        os.path.relpath(os.path.join(root, name), selector_path)
+        for root, _, names in os.walk(selector_path)
+        for name in names
+    )
+
+    with _staging_folder(compression) as staging:
+        members, stored = {}, {}
+        for number, file in enumerate(files):
+            path = os.path.join(selector_path, file)
+            if compression == ArtifactCompression.ZLIB:
+                path = _compress_file(
+                    path, os.path.join(staging, f"{number}.z")
+                )
+
+            name = f"{SELECTOR_FOLDER}/{file.replace(os.sep, '/')}"
+            members[name] = {
+                "size": os.path.getsize(path),
+                "sha256": _file_digest(path),
+                "compression": compression.value,
+            }
+            stored[name] = path
+
+        manifest = json.dumps(
+            {
+                "format": ARTIFACT_FORMAT,
+                "version": ARTIFACT_VERSION,
+                "task_type": task_type,
+                "init_params": init_params,
+                "members": members,
+            }
+        ).encode("utf-8")
+
+        # Paths are replaced atomically, so artifacts being read from a
+        # memory-mapped file are never truncated
+        is_path = isinstance(target, (str, os.PathLike))
+        output = f"{os.fspath(target)}.tmp" if is_path else target
+
+        with _open_tar(output, "w") as tar:
+            info = tarfile.TarInfo(MANIFEST_FILE)
+            info.size = len(manifest)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(manifest))
+
+            for name, path in stored.items():
+                with open(path, "rb") as fin:
+                    tar.addfile(tar.gettarinfo(path, arcname=name), fin)
+
+        if is_path:
+            os.replace(output, target)
+
+
+def read_artifact(
+    source: ArtifactSource,
+    verify: bool = True,
+) -> Artifact:
+    """
+    Reads a model artifact from a path, a folder, a file object or bytes.
+
+    Tarballs of the version 2 format given as a path or as bytes are read in
+    place: the files of the selector are views of the uncompressed members,
+    over the memory-mapped file, so they are not copied before FAISS reads
+    them. Other tarballs, and file objects, are read sequentially in a
+    single pass and the files of the selector are kept in memory, without
+    extracting them to disk. Folders, as the ones written by
+    `extract_artifact()`, are read in place.
+
+    Parameters
+    ----------
+    source : ArtifactSource
+        Artifact to read.
+    verify : bool
+        Check the members against the checksums of the manifest. Artifacts
+        of the version 1 format have no checksums.
+
+    Returns
+    -------
+    Artifact
+        The contents of the artifact.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        if os.path.isdir(source):
+            return _read_folder(os.fspath(source), verify)
+
+        with open(source, "rb") as fin:
+            try:
+                mapped = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                return read_artifact(fin, verify)
+
+        artifact = _read_tar_in_place(mapped, memoryview(mapped), verify)
+        if artifact is not None:
+            return artifact
+
+        mapped.seek(0)
+        return read_artifact(mapped, verify)
+
+    if isinstance(source, bytes):
+        artifact = _read_tar_in_place(
+            io.BytesIO(source), memoryview(source), verify
+        )
+        if artifact is not None:
+            return artifact
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+
+    files = {}
+
+    @contextmanager
+    def open_file(name):
+        buffer = io.BytesIO()
+        yield buffer
+        files[name] = buffer.getbuffer()
+
+    manifest = _read_tar(source, open_file, verify)
+
+    return Artifact(
+        manifest["version"],
+        manifest["init_params"],
+        files,
+        manifest.get("task_type"),
+    )
+
+
+def extract_artifact(
+    source: ArtifactSource,
+    folder: str,
+    verify: bool = True,
+) -> str:
+    """
+    Extracts a model artifact into a folder that `read_artifact()` reads in
+    place. The members are streamed to disk and decompressed, and the
+    manifest is rewritten with the checksums of the extracted files.
+
+    Parameters
+    ----------
+    source : ArtifactSource
+        Artifact to extract.
+    folder : str
+        Folder where the artifact is extracted.
+    verify : bool
+        Check the members against the checksums of the manifest.
+
+    Returns
+    -------
+    str
+        The folder where the artifact has been extracted.
+    """
+
+    selector_path = os.path.join(folder, SELECTOR_FOLDER)
+
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        artifact = _read_folder(os.fspath(source), verify)
+        if isinstance(artifact.selector, str):
+            shutil.copytree(artifact.selector, selector_path)
+        else:
+            for name, data in artifact.selector.items():
+                with _create_file(selector_path, name) as fout:
+                    fout.write(data)
+        manifest = {
+            "version": artifact.version,
+            "task_type": artifact.task_type,
+            "init_params": artifact.init_params,
+        }
+
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fin:
+            return extract_artifact(fin, folder, verify)
+
+    else:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        manifest = _read_tar(
+            source,
+            lambda name: _create_file(selector_path, name),
+            verify,
+        )
+
+    os.makedirs(selector_path, exist_ok=True)
+    members = {}
+    for root, _, names in os.walk(selector_path):
+        for name in names:
+            path = os.path.join(root, name)
+            file = os.path.relpath(path, folder).replace(os.sep, "/")
+            members[file] = {
+                "size": os.path.getsize(path),
+                "sha256": _file_digest(path),
+                "compression": ArtifactCompression.NONE.value,
+            }
+
+    with open(
+        os.path.join(folder, MANIFEST_FILE), "w", encoding="utf-8"
+    ) as fout:
+        json.dump(
+            {
+                "format": ARTIFACT_FORMAT,
+                "version": manifest["version"],
+                "task_type": manifest.get("task_type"),
+                "init_params": manifest["init_params"],
+                "members": members,
+            },
+            fout,
+        )
+
+    return folder
+
+
+def read_manifest(
+    source: ArtifactSource,
+) -> Optional[Dict[str, Any]]:
+    """
+    Reads only the manifest of a model artifact, from its first member, or
+    None if the artifact has the format version 1, which has no manifest.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        if os.path.isdir(source):
+            manifest_path = os.path.join(source, MANIFEST_FILE)
+            if not os.path.exists(manifest_path):
+                return None
+            with open(manifest_path, encoding="utf-8") as fin:
+                return json.load(fin)
+
+        with open(source, "rb") as fin:
+            return read_manifest(fin)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+
+    with _open_tar(source, "r|*") as tar:
+        for member in tar:
+            if member.isfile():
+                if member.name != MANIFEST_FILE:
+                    return None
+                return json.load(tar.extractfile(member))
+
+    return None
+
+
+def read_init_params(
+    source: ArtifactSource,
+) -> Dict[str, Any]:
+    """
+    Reads only the parameters of the model of an artifact, from its
+    manifest. Tarballs of the format version 1 are read until their `.init`
+    member.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        if os.path.isdir(source):
+            manifest = read_manifest(source)
+            if manifest is not None:
+                _check_manifest(manifest)
+                return manifest["init_params"]
+            with open(_init_file(os.fspath(source)), encoding="utf-8") as f:
+                return json.load(f)
+
+        with open(source, "rb") as fin:
+            return read_init_params(fin)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+
+    with _open_tar(source, "r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+
+            if member.name == MANIFEST_FILE:
+                manifest = json.load(tar.extractfile(member))
+                _check_manifest(manifest)
+                return manifest["init_params"]
+
+            folder, _, file = member.name.partition("/")
+            if not file and folder.endswith(".init"):
+                return json.load(tar.extractfile(member))
+
+    raise ValueError(
+        "The artifact is not a model saved with `save_model()`: it has no "
+        "manifest nor `.init` file."
+    )
+
+
+def read_archive(
+    path: str,
+) -> Dict[str, bytes]:
+    """
+    Reads every file of a tarball, compressed or not, into memory.
+    """
+
+    with tarfile.open(path, "r:*") as tar:
+        return {
+            member.name: tar.extractfile(member).read()
+            for member in tar.getmembers()
+            if member.isfile()
+        }
+
+
+def _read_tar(
+    fileobj: BinaryIO,
+    open_file: Callable[[str], Any],
+    verify: bool,
+) -> Dict[str, Any]:
+    """
+    Reads an artifact tarball as a stream and returns its manifest. The
+    files of the selector are copied, decompressed, into the file objects
+    returned by `open_file()` for their path relative to the selector
+    folder.
+
+    The format version 2 is recognised by the manifest being the first
+    member. Otherwise, the artifact is read in the format version 1, with
+    the parameters of the model in `<name>.init` and the files of the
+    selector in the folder `<name>.meteo/`.
+    """
+
+    manifest, init_params, members = None, None, None
+    seen = set()
+
+    with _open_tar(fileobj, "r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            fin = tar.extractfile(member)
+
+            if not seen and members is None and member.name == MANIFEST_FILE:
+                manifest = json.load(fin)
+                _check_manifest(manifest)
+                init_params = manifest["init_params"]
+                members = manifest["members"]
+                continue
+
+            if members is not None:
+                entry = _member_entry(members, member.name)
+                with open_file(_selector_name(member.name)) as fout:
+                    digest = _copy(fin, fout, entry["compression"])
+                _check_digest(member.name, entry, digest, verify)
+
+            else:
+                folder, _, file = member.name.partition("/")
+                if not file and folder.endswith(".init"):
+                    init_params = json.load(fin)
+                elif file and folder.endswith(".meteo"):
+                    with open_file(_safe_name(file)) as fout:
+                        _copy(fin, fout, ArtifactCompression.NONE)
+
+            seen.add(member.name)
+
+    if init_params is None:
+        raise ValueError(
+            "The artifact is not a model saved with `save_model()`: it has "
+            "no manifest nor `.init` file."
+        )
+
+    if verify and members is not None:
+        _check_complete(members, seen)
+
+    return manifest or {"version": 1, "init_params": init_params}
+
+
+def _read_tar_in_place(
+    fileobj: BinaryIO,
+    view: memoryview,
+    verify: bool,
+) -> Optional[Artifact]:
+    """
+    Reads an uncompressed tarball of the format version 2 whose contents are
+    `view`. The uncompressed members are returned as slices of `view`, and
+    only the compressed ones are copied, decompressed. Returns None if the
+    tarball is compressed or has another format version, so it is read as a
+    stream.
+    """
+
+    try:
+        tar = tarfile.open(fileobj=fileobj, mode="r:")
+    except tarfile.ReadError:
+        return None
+
+    with tar:
+        first = tar.next()
+        if first is None or first.name != MANIFEST_FILE:
+            return None
+
+        manifest = json.load(tar.extractfile(first))
+        _check_manifest(manifest)
+        members = manifest["members"]
+
+        files, seen = {}, set()
+        for member in tar:
+            if not member.isfile() or member is first:
+                continue
+
+            entry = _member_entry(members, member.name)
+            if entry["compression"] == ArtifactCompression.NONE:
+                data = view[
+                    member.offset_data : member.offset_data + member.size
+                ]
+                digest = hashlib.sha256(data).hexdigest() if verify else None
+            else:
+                buffer = io.BytesIO()
+                digest = _copy(
+                    tar.extractfile(member), buffer, entry["compression"]
+                )
+                data = buffer.getbuffer()
+
+            _check_digest(member.name, entry, digest, verify)
+            files[_selector_name(member.name)] = data
+            seen.add(member.name)
+
+    if verify:
+        _check_complete(members, seen)
+
+    return Artifact(
+        manifest["version"],
+        manifest["init_params"],
+        files,
+        manifest.get("task_type"),
+    )
+
+
+def _member_entry(
+    members: Dict[str, Any],
+    name: str,
+) -> Dict[str, Any]:
+    entry = members.get(name)
+    if entry is None or not name.startswith(f"{SELECTOR_FOLDER}/"):
+        raise ValueError(
+            f"Artifact member `{name}` is not in the manifest of the "
+            f"artifact."
+        )
+
+    return entry
+
+
+def _selector_name(
+    name: str,
+) -> str:
+    return _safe_name(name[len(SELECTOR_FOLDER) + 1 :])
+
+
+def _check_digest(
+    name: str,
+    entry: Dict[str, Any],
+    digest: Optional[str],
+    verify: bool,
+) -> None:
+    if verify and digest != entry["sha256"]:
+        raise ValueError(
+            f"Artifact member `{name}` is corrupted: its checksum does not "
+            f"match the manifest."
+        )
+
+
+def _check_complete(
+    members: Dict[str, Any],
+    seen: set,
+) -> None:
+    if set(members) - seen:
+        raise ValueError(
+            f"The artifact is incomplete. Members missing: "
+            f"{sorted(set(members) - seen)}."
+        )
+
+
+def _read_folder(
+    folder: str,
+    verify: bool,
+) -> Artifact:
+    """
+    Reads an extracted artifact. Folders without a manifest are read as an
+    extracted artifact of the format version 1.
+    """
+
+    manifest_path = os.path.join(folder, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        init_path = _init_file(folder)
+        with open(init_path, encoding="utf-8") as f:
+            init_params = json.load(f)
+        return Artifact(
+            1, init_params, f"{os.path.splitext(init_path)[0]}.meteo"
+        )
+
+    with open(manifest_path, encoding="utf-8") as fin:
+        manifest = json.load(fin)
+    _check_manifest(manifest)
+
+    if verify:
+        for name, entry in manifest["members"].items():
+            path = os.path.join(folder, _safe_name(name))
+            if (
+                not os.path.exists(path)
+                or _file_digest(path) != entry["sha256"]
+            ):
+                raise ValueError(
+                    f"Artifact member `{name}` is missing or corrupted: its "
+                    f"checksum does not match the manifest."
+                )
+
+    selector_path = os.path.join(folder, SELECTOR_FOLDER)
+    compressed = {
+        name: entry
+        for name, entry in manifest["members"].items()
+        if entry["compression"] != ArtifactCompression.NONE
+    }
+    if not compressed:
+        return Artifact(
+            manifest["version"],
+            manifest["init_params"],
+            selector_path,
+            manifest.get("task_type"),
+        )
+
+    files = {}
+    prefix = f"{SELECTOR_FOLDER}/"
+    for name, entry in manifest["members"].items():
+        buffer = io.BytesIO()
+        with open(os.path.join(folder, _safe_name(name)), "rb") as fin:
+            _copy(fin, buffer, entry["compression"])
+        files[name[len(prefix) :]] = buffer.getbuffer()
+
+    return Artifact(
+        manifest["version"],
+        manifest["init_params"],
+        files,
+        manifest.get("task_type"),
+    )
+
+
+def _init_file(
+    folder: str,
+) -> str:
+    """
+    Path of the `.init` file of an extracted artifact of the format version
+    1.
+    """
+
+    init_files = [name for name in os.listdir(folder) if name.endswith(".init")]
+    if len(init_files) != 1:
+        raise ValueError(
+            f"Folder `{folder}` is not an extracted model artifact: it has no "
+            f"manifest nor `.init` file."
+        )
+
+    return os.path.join(folder, init_files[0])
+
+
+def _check_manifest(
+    manifest: Dict[str, Any],
+) -> None:
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(
+            "The artifact manifest is not a manifest of a promptmeteo model."
+        )
+
+    if manifest.get("version", 0) > ARTIFACT_VERSION:
+        raise ValueError(
+            f"The artifact has the format version {manifest['version']}, "
+            f"which is newer than the last version this library can read, "
+            f"{ARTIFACT_VERSION}. Please, upgrade promptmeteo."
+        )
+
+
+def _safe_name(
+    name: str,
+) -> str:
+    """
+    Converts a member name to a relative path, refusing the names that
+    would be written outside of the extraction folder.
+    """
+
+    path = os.path.normpath(name)
+    if os.path.isabs(path) or path.split(os.sep)[0] == "..":
+        raise ValueError(f"Artifact member `{name}` has an unsafe path.")
+
+    return path
+
+
+def _copy(
+    fin: BinaryIO,
+    fout: BinaryIO,
+    compression: str,
+) -> str:
+    """
+    Copies a member in chunks, decompressing it, and returns the checksum of
+    the stored bytes.
+    """
+
+    compression = ArtifactCompression(compression)
+    decompressor = (
+        zlib.decompressobj()
+        if compression == ArtifactCompression.ZLIB
+        else None
+    )
+
+    digest = hashlib.sha256()
+    try:
+        while True:
+            chunk = fin.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            fout.write(
+                decompressor.decompress(chunk) if decompressor else chunk
+            )
+
+        if decompressor is not None:
+            fout.write(decompressor.flush())
+
+    except zlib.error as error:
+        raise ValueError(
+            f"An artifact member is corrupted: it can not be decompressed. "
+            f"{error}"
+        ) from error
+
+    return digest.hexdigest()
+
+
+def _compress_file(
+    path: str,
+    target: str,
+) -> str:
+    """
+    Compresses a file with the fastest level of zlib.
+    """
+
+    compressor = zlib.compressobj(1)
+    with open(path, "rb") as fin, open(target, "wb") as fout:
+        while True:
+            chunk = fin.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            fout.write(compressor.compress(chunk))
+        fout.write(compressor.flush())
+
+    return target
+
+
+def _file_digest(
+    path: str,
+) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fin:
+        while True:
+            chunk = fin.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _create_file(
+    folder: str,
+    name: str,
+) -> BinaryIO:
+    path = os.path.join(folder, _safe_name(name))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    return open(path, "wb")
+
+
+def _open_tar(
+    target: Union[str, BinaryIO],
+    mode: str,
+) -> tarfile.TarFile:
+    if isinstance(target, (str, os.PathLike)):
+        return tarfile.open(target, mode)
+
+    return tarfile.open(fileobj=target, mode=mode)
+
+
+@contextmanager
+def _staging_folder(
+    compression: ArtifactCompression,
+) -> Optional[str]:
+    """
+    Temporary folder for the compressed members, only when they are
+    compressed.
+    """
+
+    if compression == ArtifactCompression.NONE:
+        yield None
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        yield tmp
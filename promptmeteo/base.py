@@ -21,15 +21,24 @@
 #  THE SOFTWARE.
 
 import os
-import tarfile
+import asyncio
 import tempfile
 import json
+import threading
 from abc import ABC
+from functools import partial
+from contextlib import nullcontext
+from concurrent.futures import Executor
 from typing import (
     List,
     Any,
+    BinaryIO,
+    Callable,
     Dict,
+    Iterable,
+    Iterator,
     Optional,
+    Union,
 )
 
 try:
@@ -39,7 +48,22 @@ except ImportError:
 
 from .tasks import Task
 from .tasks import TaskBuilder
+from .cache import CachedEmbeddings
+from .models import SharedModels
+from .models import active_shared_models
 from .tools import add_docstring_from
+from .tools import bounded_map
+from .tools import bounded_map_unordered
+from .tools import extract_cached
+from .artifact import SELECTOR_FOLDER
+from .artifact import Artifact
+from .artifact import read_archive
+from .artifact import read_artifact
+from .artifact import read_init_params
+from .artifact import read_manifest
+from .artifact import write_artifact
+from .artifact import extract_artifact
+from .selector.base import BaseSelector
 from .selector.base import SelectorAlgorithms
 
 
@@ -71,12 +95,123 @@ class Base(ABC):
         prompt_detail: Optional[str] = None,
         selector_k: int = 10,
         selector_algorithm: str = "relevance",
+        selector_index: str = "flat",
+        selector_index_params: Optional[Dict] = None,
+        selector_max_tokens: Optional[int] = None,
+        train_deduplicate: bool = False,
+        train_dedup_threshold: Optional[float] = None,
+        train_coreset_size: Optional[int] = None,
         verbose: bool = False,
+        response_cache: Optional[bool] = None,
+        response_cache_size: int = 1024,
+        response_cache_path: Optional[str] = None,
+        response_cache_ttl: Optional[float] = None,
+        response_cache_disk_size: Optional[int] = None,
+        embeddings_cache: bool = False,
+        embeddings_cache_size: int = 10000,
+        embeddings_cache_path: Optional[str] = None,
+        embeddings_chunk_size: int = 256,
+        embeddings_max_concurrency: Optional[int] = None,
+        embeddings_max_retries: int = 3,
+        embeddings_checkpoint_path: Optional[str] = None,
+        embeddings_progress_callback: Optional[
+            Callable[[int, int], None]
+        ] = None,
         **kwargs,
     ) -> None:
         """
         Initialize the Promptmeteo model.
 
+        Parameters
+        ----------
+        language : str
+            Language of the prompts.
+        model_name : str
+            Name of the LLM.
+        model_provider_name : str
+            Name of the LLM provider.
+        model_provider_token : Optional[str]
+            Token of the LLM provider.
+        model_params : Optional[Dict]
+            Parameters of the LLM. The provider defaults are used if empty.
+        prompt_domain : Optional[str]
+            Domain of the texts, included in the prompt.
+        prompt_labels : List[str]
+            Expected labels, included in the prompt.
+        prompt_detail : Optional[str]
+            Additional instructions included in the prompt.
+        selector_k : int
+            Number of examples included in the prompt.
+        selector_algorithm : str
+            Algorithm used to select the examples.
+        selector_index : str
+            Type of the FAISS index of the examples: `flat` (exact search),
+            `ivf_flat`, `hnsw` or `ivf_pq`. Approximate indexes keep the search
+            fast and the memory bounded for large sets of examples.
+        selector_index_params : Optional[Dict]
+            Parameters of the index: `nlist` and `nprobe` for the IVF indexes,
+            `M`, `efConstruction` and `efSearch` for HNSW, and `pq_m` and
+            `pq_nbits` for IVF-PQ. Missing values are chosen from the number of
+            examples.
+        selector_max_tokens : Optional[int]
+            Maximum number of tokens of the prompt plus the model output. If
+            given, the prompt only includes the most relevant examples, up
+            to `selector_k`, that fit in the tokens left by the instructions,
+            the sample and the maximum output tokens of the model parameters
+            (256 if they are not set). Tokens are counted with tiktoken.
+        train_deduplicate : bool
+            Whether to drop, when training a supervised model, the examples
+            with the same text and annotation as a previous example.
+        train_dedup_threshold : Optional[float]
+            If given, the examples whose embeddings have a cosine similarity
+            of at least this value with a previous example of the same
+            annotation are also dropped when training a supervised model.
+        train_coreset_size : Optional[int]
+            If given, a supervised model keeps at most this number of
+            examples per annotation, chosen to cover the embeddings space of
+            the annotation. The examples dropped are reported in
+            `train_report`.
+        verbose : bool
+            Print the prompt, the LLM output and the parsed result.
+        response_cache : Optional[bool]
+            Whether to cache the LLM responses. By default responses are only
+            cached if the model is deterministic (temperature 0.0).
+        response_cache_size : int
+            Maximum number of responses kept in the in-memory LRU cache.
+        response_cache_path : Optional[str]
+            Path of a SQLite database where responses are also cached, so they
+            are reused between processes and executions.
+        response_cache_ttl : Optional[float]
+            Seconds that a cached response stays valid. By default responses
+            do not expire.
+        response_cache_disk_size : Optional[int]
+            Maximum number of responses kept in the SQLite database.
+        embeddings_cache : bool
+            Whether to cache the embeddings vectors of the examples and the
+            samples, so texts already seen are not embedded again. It is
+            enabled when `embeddings_cache_path` is given.
+        embeddings_cache_size : int
+            Maximum number of vectors kept in the in-memory LRU cache.
+        embeddings_cache_path : Optional[str]
+            Directory where the embeddings vectors are also stored on disk.
+        embeddings_chunk_size : int
+            Number of examples embedded in each call when training.
+        embeddings_max_concurrency : Optional[int]
+            Maximum number of chunks of examples embedded at the same time.
+            By default 1 for local embeddings models, which already use all
+            the cores, and 4 for remote ones.
+        embeddings_max_retries : int
+            Number of times a chunk of examples is embedded again after an
+            error, with an exponential backoff.
+        embeddings_checkpoint_path : Optional[str]
+            Directory where the vectors of the chunks are saved as they are
+            embedded, so a training interrupted by an error can be resumed
+            without embedding them again.
+        embeddings_progress_callback : Optional[Callable[[int, int], None]]
+            Function called with the number of examples embedded and the total
+            number of examples each time a chunk is finished. It is not saved
+            with the model.
+
         Raises
         ------
         ValueError
@@ -94,7 +229,25 @@ class Base(ABC):
             "prompt_detail": prompt_detail,
             "selector_k": selector_k,
             "selector_algorithm": selector_algorithm,
+            "selector_index": selector_index,
+            "selector_index_params": selector_index_params,
+            "selector_max_tokens": selector_max_tokens,
+            "train_deduplicate": train_deduplicate,
+            "train_dedup_threshold": train_dedup_threshold,
+            "train_coreset_size": train_coreset_size,
             "verbose": verbose,
+            "response_cache": response_cache,
+            "response_cache_size": response_cache_size,
+            "response_cache_path": response_cache_path,
+            "response_cache_ttl": response_cache_ttl,
+            "response_cache_disk_size": response_cache_disk_size,
+            "embeddings_cache": embeddings_cache,
+            "embeddings_cache_size": embeddings_cache_size,
+            "embeddings_cache_path": embeddings_cache_path,
+            "embeddings_chunk_size": embeddings_chunk_size,
+            "embeddings_max_concurrency": embeddings_max_concurrency,
+            "embeddings_max_retries": embeddings_max_retries,
+            "embeddings_checkpoint_path": embeddings_checkpoint_path,
         }
         self._init_params.update(kwargs)
 
@@ -108,6 +261,37 @@ class Base(ABC):
         self.prompt_detail: Optional[str] = prompt_detail
         self._selector_k: int = selector_k
         self._selector_algorithm: str = selector_algorithm
+        self._selector_index: str = selector_index
+        self._selector_index_params: Dict = selector_index_params or {}
+        self._selector_max_tokens: Optional[int] = selector_max_tokens
+        if selector_max_tokens is not None and (
+            not isinstance(selector_max_tokens, int) or selector_max_tokens < 1
+        ):
+            raise ValueError(
+                f"{self.__class__.__name__} error in function `__init__`. "
+                f"Argument `selector_max_tokens` is expected to be a positive "
+                f"integer. Instead it got: {selector_max_tokens}"
+            )
+        self._train_deduplicate: bool = train_deduplicate
+        self._train_dedup_threshold: Optional[float] = train_dedup_threshold
+        self._train_coreset_size: Optional[int] = train_coreset_size
+        if train_dedup_threshold is not None and not (
+            0.0 < train_dedup_threshold <= 1.0
+        ):
+            raise ValueError(
+                f"{self.__class__.__name__} error in function `__init__`. "
+                f"Argument `train_dedup_threshold` is expected to be in the "
+                f"interval (0, 1]. Instead it got: {train_dedup_threshold}"
+            )
+        if train_coreset_size is not None and (
+            not isinstance(train_coreset_size, int) or train_coreset_size < 1
+        ):
+            raise ValueError(
+                f"{self.__class__.__name__} error in function `__init__`. "
+                f"Argument `train_coreset_size` is expected to be a positive "
+                f"integer. Instead it got: {train_coreset_size}"
+            )
+        self._model_path: Optional[str] = None
         if (
             self._selector_algorithm
             == SelectorAlgorithms.SIMILARITY_CLASS_BALANCED.value
@@ -118,8 +302,30 @@ class Base(ABC):
                 f"is only valid for DocumentClassifier models"
             )
         self.verbose: bool = verbose
+        self._response_cache: Optional[bool] = response_cache
+        self._response_cache_size: int = response_cache_size
+        self._response_cache_path: Optional[str] = response_cache_path
+        self._response_cache_ttl: Optional[float] = response_cache_ttl
+        self._response_cache_disk_size: Optional[int] = response_cache_disk_size
+        self._embeddings_cache: bool = (
+            embeddings_cache or embeddings_cache_path is not None
+        )
+        self._embeddings_cache_size: int = embeddings_cache_size
+        self._embeddings_cache_path: Optional[str] = embeddings_cache_path
+        self._embedding_options: Dict[str, Any] = {
+            "chunk_size": embeddings_chunk_size,
+            "max_concurrency": embeddings_max_concurrency,
+            "max_retries": embeddings_max_retries,
+            "checkpoint_path": embeddings_checkpoint_path,
+            "progress_callback": embeddings_progress_callback,
+        }
 
         self._builder = None
+        self._builder_lock = threading.Lock()
+        self._pending_load: Optional[Callable[[TaskBuilder], None]] = None
+        # Pool of models active when a lazy model was loaded, used when its
+        # builder is created
+        self._shared_models: Optional[SharedModels] = None
         self._is_trained = False
 
     @property
@@ -137,7 +343,19 @@ class Base(ABC):
         Get the TaskBuilder instance for the model.
         """
         if self._builder is None:
-            self._builder = self.create_builder()
+            with self._builder_lock:
+                if self._builder is None:
+                    with (
+                        self._shared_models.activate()
+                        if self._shared_models is not None
+                        else nullcontext()
+                    ):
+                        builder = self.create_builder()
+                    if self._pending_load is not None:
+                        self._pending_load(builder)
+                        self._pending_load = None
+                    self._shared_models = None
+                    self._builder = builder
         return self._builder
 
     def create_builder(self) -> TaskBuilder:
@@ -158,6 +376,31 @@ class Base(ABC):
             model_params=self.model_params,
         )
 
+        # Build response cache
+        builder.build_cache(
+            model_name=self.model_name,
+            model_provider_name=self.model_provider_name,
+            cache=self._response_cache,
+            cache_size=self._response_cache_size,
+            cache_path=self._response_cache_path,
+            cache_ttl=self._response_cache_ttl,
+            cache_disk_size=self._response_cache_disk_size,
+        )
+
+        # Build embeddings cache
+        if self._embeddings_cache:
+            builder.build_embeddings_cache(
+                cache_size=self._embeddings_cache_size,
+                cache_path=self._embeddings_cache_path,
+            )
+
+        # Build token budget
+        if self._selector_max_tokens is not None:
+            builder.build_token_budget(
+                max_tokens=self._selector_max_tokens,
+                model_name=self.model_name,
+            )
+
         # Build prompt
         builder.build_prompt(
             model_name=self.model_name,
@@ -181,6 +424,41 @@ class Base(ABC):
         """
         return self.builder.task
 
+    @property
+    def cache_stats(
+        self,
+    ) -> Dict[str, Optional[Dict[str, int]]]:
+        """
+        Get the hits and misses of the model caches.
+        """
+        cache = self.task.model.cache
+        embeddings = (
+            self.task.model.embeddings
+            if self.task.model.embeddings_loaded
+            else None
+        )
+        return {
+            "responses": cache.stats if cache is not None else None,
+            "embeddings": (
+                embeddings.stats
+                if isinstance(embeddings, CachedEmbeddings)
+                else None
+            ),
+        }
+
+    @property
+    def train_report(
+        self,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get the report of the examples dropped in the last training: the
+        number of examples given and kept, the positions of the exact and
+        near duplicates with the position of the example they repeat, and
+        the positions of the examples left out of the coreset. It is None if
+        no examples were dropped because no pruning option was set.
+        """
+        return getattr(self.task.selector, "train_report", None)
+
     @property
     def is_trained(
         self,
@@ -193,6 +471,10 @@ class Base(ABC):
     def predict(
         self,
         examples: List[str],
+        max_concurrency: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        return_exceptions: bool = False,
+        batch_size: Optional[int] = None,
     ) -> List[str]:
         """
         Predict over new text samples.
@@ -201,44 +483,282 @@ class Base(ABC):
         ----------
         examples : List[str]
             List of text samples to predict.
+        max_concurrency : Optional[int]
+            Maximum number of samples predicted at the same time. If neither
+            `max_concurrency` nor `executor` are given, the samples are
+            predicted sequentially.
+        executor : Optional[Executor]
+            Executor used to predict the samples concurrently. If it is not
+            given, a thread pool with `max_concurrency` workers is used.
+        return_exceptions : bool
+            If True, the error raised when predicting a sample is returned in
+            its position of the output list instead of aborting the batch.
+        batch_size : Optional[int]
+            If given and the model supports it, the samples are sent to the
+            LLM in batches of `batch_size` prompts per call. Otherwise they are
+            sent one by one. When batching, an error affects all the samples
+            of its batch. The examples of the prompts are always selected for
+            all the samples at once, with batched embeddings and searches.
 
         Returns
         -------
         List[str]
-            List of predictions.
+            List of predictions, in the same order as `examples`.
         """
 
-        if not isinstance(examples, list):
+        self._check_examples(examples, function_name="predict")
+
+        if batch_size is not None and batch_size < 1:
             raise ValueError(
                 f"{self.__class__.__name__} error in function `predict()`. "
+                f"Argument `batch_size` is expected to be a positive integer. "
+                f"Instead it got: {batch_size}"
+            )
+
+        # The examples of all the samples are selected at once. If it fails
+        # and errors are returned, each sample selects its own examples so
+        # the error only affects the samples which raise it.
+        try:
+            prompts = self.task.get_prompts(examples)
+        except Exception:
+            if not return_exceptions:
+                raise
+            prompts = None
+
+        if prompts is None:
+            inputs, run_one, run_many = (
+                examples,
+                self.task.run,
+                self.task.run_batch,
+            )
+        else:
+            inputs, run_one, run_many = (
+                prompts,
+                self.task.run_prompt,
+                self.task.run_prompts,
+            )
+
+        if batch_size and self.task.model.supports_batch:
+            batches = [
+                inputs[start : start + batch_size]
+                for start in range(0, len(inputs), batch_size)
+            ]
+
+            def run_task(batch: List[str]) -> List[Any]:
+                return run_many(batch, batch_size=batch_size)
+
+        else:
+            batches = [[item] for item in inputs]
+
+            def run_task(batch: List[str]) -> List[Any]:
+                return [run_one(batch[0])]
+
+        def run(batch: List[str]) -> List[Any]:
+            try:
+                return run_task(batch)
+            except Exception as error:
+                if not return_exceptions:
+                    raise
+                return [error] * len(batch)
+
+        if max_concurrency is None and executor is None:
+            results = map(run, batches)
+        else:
+            results = bounded_map(
+                run,
+                batches,
+                max_concurrency=max_concurrency,
+                executor=executor,
+            )
+
+        return [result for batch in results for result in batch]
+
+    def predict_iter(
+        self,
+        examples: Iterable[str],
+        max_concurrency: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        return_exceptions: bool = False,
+        with_index: bool = False,
+        max_in_flight: Optional[int] = None,
+    ) -> Iterator[Any]:
+        """
+        Predict lazily over a stream of text samples. The samples are read
+        from `examples` only when there is room in a bounded window of
+        in-flight samples, and every prediction is yielded as soon as it is
+        completed, so the memory used does not depend on the number of
+        samples.
+
+        Parameters
+        ----------
+        examples : Iterable[str]
+            Any iterable (list, generator, file...) of text samples.
+        max_concurrency : Optional[int]
+            Maximum number of samples predicted at the same time. If neither
+            `max_concurrency` nor `executor` are given, the samples are
+            predicted sequentially.
+        executor : Optional[Executor]
+            Executor used to predict the samples concurrently. If it is not
+            given, a thread pool with `max_concurrency` workers is used.
+        return_exceptions : bool
+            If True, the error raised when predicting a sample is yielded in
+            place of its prediction instead of stopping the iteration.
+        with_index : bool
+            If True, tuples `(index, prediction)` are yielded, where `index` is
+            the position of the sample in `examples`. When predicting
+            concurrently the predictions are yielded in completion order.
+        max_in_flight : Optional[int]
+            Size of the window of samples read but not yielded yet. By
+            default it is equal to `max_concurrency`.
+
+        Returns
+        -------
+        Iterator[Any]
+            Iterator over the predictions.
+        """
+
+        def run(example: str) -> Any:
+            try:
+                if not isinstance(example, str):
+                    raise ValueError(
+                        f"{self.__class__.__name__} error in function "
+                        f"`predict_iter()`. Arguments `examples` are expected "
+                        f"to be of type `str`. Instead they got: "
+                        f"`{type(example)}`"
+                    )
+                return self.task.run(example)
+            except Exception as error:
+                if not return_exceptions:
+                    raise
+                return error
+
+        if max_concurrency is None and executor is None:
+            results = (
+                (idx, run(example)) for idx, example in enumerate(examples)
+            )
+        else:
+            results = bounded_map_unordered(
+                run,
+                examples,
+                max_concurrency=max_concurrency,
+                executor=executor,
+                max_in_flight=max_in_flight,
+            )
+
+        for idx, result in results:
+            yield (idx, result) if with_index else result
+
+    async def apredict(
+        self,
+        examples: List[str],
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+    ) -> List[str]:
+        """
+        Asynchronous version of `predict()`.
+
+        Parameters
+        ----------
+        examples : List[str]
+            List of text samples to predict.
+        max_concurrency : Optional[int]
+            Maximum number of samples awaited at the same time. If it is not
+            given, all the samples are sent at once.
+        return_exceptions : bool
+            If True, the error raised when predicting a sample is returned in
+            its position of the output list instead of aborting the batch.
+
+        Returns
+        -------
+        List[str]
+            List of predictions, in the same order as `examples`.
+        """
+
+        self._check_examples(examples, function_name="apredict")
+
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError(
+                f"{self.__class__.__name__} error in function `apredict()`. "
+                f"Argument `max_concurrency` is expected to be a positive "
+                f"integer. Instead it got: {max_concurrency}"
+            )
+
+        semaphore = (
+            asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        )
+
+        async def run(example: str) -> Any:
+            if semaphore is None:
+                return await self.task.arun(example)
+            async with semaphore:
+                return await self.task.arun(example)
+
+        return list(
+            await asyncio.gather(
+                *[run(example) for example in examples],
+                return_exceptions=return_exceptions,
+            )
+        )
+
+    def _check_examples(
+        self,
+        examples: List[str],
+        function_name: str,
+    ) -> None:
+        """
+        Check that the samples to predict are a list of strings.
+        """
+
+        if not isinstance(examples, list):
+            raise ValueError(
+                f"{self.__class__.__name__} error in function "
+                f"`{function_name}()`. "
                 f"Arguments `examples` and `annotations` are expected to be "
                 f"of type `List[str]`. Instead they got: `{type(examples)}`"
             )
 
         if not all([isinstance(val, str) for val in examples]):
             raise ValueError(
-                f"{self.__class__.__name__} error in function `predict()`. "
+                f"{self.__class__.__name__} error in function "
+                f"`{function_name}()`. "
                 f"Arguments `examples` are expected to be of type "
                 f"  `List[str]`. Some values seem no to be of type `str`."
             )
 
-        results = []
-        for example in examples:
-            results.append(self.task.run(example))
-
-        return results
-
     def save_model(
         self,
         model_path: str,
+        compact: bool = False,
+        compression: str = "none",
+        vectors_dtype: str = "float32",
     ) -> Self:
         """
         Save the trained model to disk.
 
+        The model is saved as a tarball whose first member is a manifest with
+        the parameters of the model and the checksum of every other member,
+        so it can be loaded reading it once, without extracting it.
+
+        If the model was loaded from or saved to `model_path` and examples
+        have been added or removed since then, only those changes are saved,
+        in the file `<model_path>.delta` next to the model, which has the
+        same format. They are applied when the model is loaded.
+
         Parameters
         ----------
         model_path : str
             Path where the model will be saved.
+        compact : bool
+            If True, the whole model is saved, merging the changes saved in
+            the `.delta` file, which is removed.
+        compression : str
+            Compression of each member of the model artifact, `none` or
+            `zlib`. The members are compressed one by one with the fastest
+            level.
+        vectors_dtype : str
+            Type of the raw vectors of the examples saved with the model,
+            `float32` or `float16`. They are used to `reindex()` the model
+            without embedding the examples again.
 
         Returns
         -------
@@ -269,32 +789,137 @@ class Base(ABC):
                 f"directory {model_dir} does not exists."
             )
 
+        delta_path = f"{model_path}.delta"
+
+        if (
+            not compact
+            and self._model_path == os.path.abspath(model_path)
+            and os.path.exists(model_path)
+            and getattr(self.task.selector, "has_delta", False)
+        ):
+            with tempfile.TemporaryDirectory() as tmp:
+                tmp_path = os.path.join(tmp, "delta")
+                self.task.selector.save_delta(tmp_path)
+
+                write_artifact(
+                    delta_path,
+                    self.init_params,
+                    tmp_path,
+                    compression=compression,
+                    task_type=self.TASK_TYPE,
+                )
+
+            return self
+
         with tempfile.TemporaryDirectory() as tmp:
-            tmp_path = os.path.join(tmp, model_name.replace(".meteo", ""))
-            self.task.selector.vectorstore.save_local(tmp_path)
+            tmp_path = os.path.join(tmp, SELECTOR_FOLDER)
+            self.task.selector.save_example_selector(
+                tmp_path, vectors_dtype=vectors_dtype
+            )
 
-            init_tmp_path = f"{tmp_path}.init"
-            with open(init_tmp_path, mode="w") as f:
-                json.dump(self.init_params, f)
+            write_artifact(
+                model_path,
+                self.init_params,
+                tmp_path,
+                compression=compression,
+                task_type=self.TASK_TYPE,
+            )
+
+        if os.path.exists(delta_path):
+            os.remove(delta_path)
+
+        if hasattr(self.task.selector, "reset_delta"):
+            self.task.selector.reset_delta()
+        self._model_path = os.path.abspath(model_path)
+
+        return self
+
+    def reindex(
+        self,
+        selector_index: Optional[str] = None,
+        selector_index_params: Optional[Dict] = None,
+    ) -> Self:
+        """
+        Rebuilds the vectorstore index of the trained model from the raw
+        vectors of its examples, without embedding them again. The next
+        call to `save_model()` saves the whole model.
+
+        Parameters
+        ----------
+        selector_index : Optional[str]
+            Type of the new index, one of `flat`, `ivf_flat`, `ivf_pq` or
+            `hnsw`. By default, the current one.
+        selector_index_params : Optional[Dict]
+            Parameters of the new index. By default, the current ones if the
+            index type does not change.
+
+        Returns
+        -------
+        Base
+            The reindexed model.
+        """
+
+        if not self.is_trained:
+            raise RuntimeError(
+                f"{self.__class__.__name__} error in `reindex()`. "
+                f"You are trying to reindex a model that has non been "
+                f"trained. Please, call `train()` function before"
+            )
+
+        selector = self.task.selector.reindex(
+            selector_index, selector_index_params
+        )
 
-            with tarfile.open(model_path, mode="w:gz") as tar:
-                tar.add(tmp_path, arcname=model_name)
-                tar.add(init_tmp_path, arcname=os.path.basename(init_tmp_path))
+        self._selector_index = selector._selector_index
+        self._selector_index_params = selector._selector_index_params
+        self._init_params["selector_index"] = self._selector_index
+        self._init_params["selector_index_params"] = self._selector_index_params
+        self._model_path = None
 
         return self
 
     @classmethod
     def load_model(
         cls,
-        model_path: str,
+        model_path: Union[str, bytes, BinaryIO],
+        mmap: bool = False,
+        cache_dir: Optional[str] = None,
+        verify: bool = True,
+        lazy: bool = False,
     ) -> Self:
         """
         Load a saved model from disk.
 
+        The model artifact is read once, without extracting it to disk.
+        Models saved in the format of previous versions, as gzipped
+        tarballs, are loaded too.
+
         Parameters
         ----------
-        model_path : str
-            Path from where the model will be loaded.
+        model_path : Union[str, bytes, BinaryIO]
+            Path from where the model will be loaded, a folder where the
+            model has been extracted, or the contents of the model as bytes
+            or a binary file object.
+        mmap : bool
+            If True, the model is extracted once into a cache folder and its
+            vectorstore index and documents are memory-mapped read-only
+            from there, so processes loading the same model share their
+            memory pages. Models loaded this way can not add or remove
+            examples. It requires `model_path` to be a path.
+        cache_dir : Optional[str]
+            Folder where the models loaded with `mmap` are extracted. By
+            default it is the `PROMPTMETEO_CACHE_DIR` environment variable or
+            `~/.cache/promptmeteo`.
+        verify : bool
+            If True, the members of the model are checked against the
+            checksums of its manifest. The embeddings of the model are
+            always checked against the fingerprint of the embeddings that
+            computed its vectors.
+        lazy : bool
+            If True, only the parameters of the model are read. Its LLM
+            client, its embeddings and its vectorstore are loaded when the
+            model is used for the first time, or when `warmup()` is called.
+            Binary file objects are read into memory.
 
         Returns
         -------
@@ -302,47 +927,189 @@ class Base(ABC):
             Loaded model instance.
         """
 
-        model_dir = os.path.dirname(model_path)
-        model_name = os.path.basename(model_path)
+        is_path = isinstance(model_path, (str, os.PathLike))
 
-        if not model_name.endswith(".meteo"):
+        if is_path and not os.path.isdir(model_path):
+            model_path = os.fspath(model_path)
+            model_dir = os.path.dirname(model_path)
+            model_name = os.path.basename(model_path)
+
+            if not model_name.endswith(".meteo"):
+                raise ValueError(
+                    f"{cls.__name__} error in `load_model()`. "
+                    f'model_path="{model_path}" has a bad model name '
+                    f"extension. Model name must end with `.meteo` "
+                    f"(i.e. `./model.meteo`)"
+                )
+
+            if not os.path.exists(model_path):
+                raise ValueError(
+                    f"{cls.__name__} error in `load_model()`. "
+                    f"directory {model_dir} does not exists."
+                )
+
+        if mmap and not is_path:
             raise ValueError(
                 f"{cls.__name__} error in `load_model()`. "
-                f'model_path="{model_path}" has a bad model name extension. '
-                f"Model name must end with `.meteo` (i.e. `./model.meteo`)"
+                f"Only the models loaded from a path can be memory-mapped."
             )
 
-        if not os.path.exists(model_path):
+        if mmap and os.path.exists(f"{os.fspath(model_path)}.delta"):
             raise ValueError(
                 f"{cls.__name__} error in `load_model()`. "
-                f"directory {model_dir} does not exists."
+                f"model_path={model_path} has changes saved in a `.delta` "
+                f"file that can not be applied to a memory-mapped model. "
+                f"Load it without `mmap` and call "
+                f"`save_model(model_path, compact=True)` before."
             )
 
-        with tempfile.TemporaryDirectory() as tmp:
-            with tarfile.open(model_path, "r:gz") as tar:
-                tar.extractall(tmp)
-
-            init_tmp_path = os.path.join(
-                tmp, f"{os.path.splitext(model_name)[0]}.init"
+        if is_path:
+            model_path = os.fspath(model_path)
+        elif not isinstance(model_path, (bytes, bytearray, memoryview)):
+            model_path = model_path.read()
+
+        if lazy:
+            self = cls._from_init_params(read_init_params(model_path))
+            self._pending_load = partial(
+                self._load_artifact,
+                model_path=model_path,
+                mmap=mmap,
+                cache_dir=cache_dir,
+                verify=verify,
+            )
+            self._shared_models = active_shared_models()
+        else:
+            artifact = cls._read_model_artifact(
+                model_path, mmap, cache_dir, verify
+            )
+            self = cls._from_init_params(artifact.init_params)
+            self._load_artifact(
+                self.builder, model_path, mmap, artifact=artifact
             )
-            with open(init_tmp_path) as f:
-                self = cls(**json.load(f))
 
-            self._load_builder(model_path=os.path.join(tmp, model_name))
+        if is_path:
+            self._model_path = os.path.abspath(model_path)
+        self._is_trained = True
+
+        return self
+
+    def warmup(
+        self,
+    ) -> Self:
+        """
+        Loads the parts of a model loaded with `lazy=True` which are loaded
+        when it is used for the first time: its LLM client, its embeddings
+        and its vectorstore. It does nothing if they are already loaded.
+
+        Returns
+        -------
+        Base
+            The loaded model.
+        """
 
-            self._is_trained = True
+        _ = self.builder
 
         return self
 
-    def _load_builder(self, **kwargs) -> TaskBuilder:
+    @property
+    def is_loaded(
+        self,
+    ) -> bool:
+        """
+        Whether the task of the model, with its LLM client and its
+        vectorstore, has been built. Models loaded with `lazy=True` are built
+        on their first use or by `warmup()`.
+        """
+
+        return self._builder is not None
+
+    @classmethod
+    def _read_model_artifact(
+        cls,
+        model_path: Union[str, bytes],
+        mmap: bool = False,
+        cache_dir: Optional[str] = None,
+        verify: bool = True,
+    ) -> Artifact:
+        """
+        Reads a saved model. With `mmap`, the model is extracted once into
+        the cache folder and its vectorstore is read from there.
+        """
+
+        if not mmap:
+            return read_artifact(model_path, verify=verify)
+
+        model_dir = extract_cached(
+            model_path,
+            cache_dir=cache_dir,
+            prepare=lambda folder: BaseSelector.prepare_mmap(
+                os.path.join(folder, SELECTOR_FOLDER)
+            ),
+            extract=lambda path, folder: extract_artifact(
+                path, folder, verify=verify
+            ),
+        )
+
+        # The files were verified when extracted, and `prepare_mmap()`
+        # rewrites them afterwards.
+        return read_artifact(model_dir, verify=False)
+
+    def _load_artifact(
+        self,
+        builder: TaskBuilder,
+        model_path: Union[str, bytes],
+        mmap: bool = False,
+        cache_dir: Optional[str] = None,
+        verify: bool = True,
+        artifact: Optional[Artifact] = None,
+    ) -> None:
+        """
+        Loads the example selector of a saved model into the task of
+        `builder`, and applies the changes saved in its `.delta` file.
+        """
+
+        if artifact is None:
+            artifact = self._read_model_artifact(
+                model_path, mmap, cache_dir, verify
+            )
+
+        kwargs = {"mmap": True} if mmap else {}
+        self._load_builder(builder, model_path=artifact.selector, **kwargs)
+
+        delta_path = (
+            f"{model_path}.delta" if isinstance(model_path, str) else ""
+        )
+        if not mmap and os.path.exists(delta_path):
+            if read_manifest(delta_path) is not None:
+                delta = read_artifact(delta_path, verify=verify).selector
+            else:
+                delta = read_archive(delta_path)
+            builder.task.selector.load_delta(
+                {os.path.basename(name): data for name, data in delta.items()}
+            )
+
+    @classmethod
+    def _from_init_params(cls, init_params: Dict[str, Any]) -> Self:
+        """
+        Creates the model from the parameters saved with it.
+        """
+
+        return cls(**init_params)
+
+    def _load_builder(
+        self, builder: Optional[TaskBuilder] = None, **kwargs
+    ) -> TaskBuilder:
         kwargs.setdefault("selector_type", self.SELECTOR_TYPE)
         kwargs.setdefault("selector_k", self._selector_k)
         kwargs.setdefault("selector_algorithm", self._selector_algorithm)
+        kwargs.setdefault("selector_index", self._selector_index)
+        kwargs.setdefault("selector_index_params", self._selector_index_params)
+        kwargs.setdefault("embedding_options", self._embedding_options)
         kwargs.setdefault("input_keys", ["__INPUT__"]),
         kwargs.setdefault("class_list", self.prompt_labels)
         kwargs.setdefault("class_key", "__OUTPUT__")
 
-        return self.builder.build_selector_by_load(**kwargs)
+        return (builder or self.builder).build_selector_by_load(**kwargs)
 
 
 class BaseSupervised(Base):
@@ -373,6 +1140,123 @@ class BaseSupervised(Base):
         parameters and task behaviour in each specific model training docstring.
         """
 
+        self._check_annotated_examples(
+            examples, annotations, function_name="train"
+        )
+
+        examples = [
+            example.replace("{", "{{").replace("}", "}}")
+            for example in examples
+        ]
+
+        annotations = [
+            annotation.replace("{", "{{").replace("}", "}}")
+            for annotation in annotations
+        ]
+
+        self.builder.build_selector_by_train(
+            examples=examples,
+            annotations=annotations,
+            selector_k=self._selector_k,
+            selector_type=self.SELECTOR_TYPE,
+            selector_algorithm=self._selector_algorithm,
+            selector_index=self._selector_index,
+            selector_index_params=self._selector_index_params,
+            embedding_options=self._embedding_options,
+            deduplicate=self._train_deduplicate,
+            dedup_threshold=self._train_dedup_threshold,
+            coreset_size=self._train_coreset_size,
+        )
+
+        self._is_trained = True
+        self._model_path = None
+
+        return self
+
+    def add_examples(
+        self,
+        examples: List[str],
+        annotations: List[str],
+    ) -> List[str]:
+        """
+        Adds annotated examples to a trained model without training it again.
+        Only the new examples are embedded, and examples already in the model
+        with the same annotation are not added twice.
+
+        Parameters
+        ----------
+        examples : List[str]
+            List of text samples.
+        annotations : List[str]
+            Annotation of each sample.
+
+        Returns
+        -------
+        List[str]
+            Id of each example in the model, which can be used to remove it.
+        """
+
+        if not self.is_trained:
+            raise RuntimeError(
+                f"{self.__class__.__name__} error in `add_examples()`. "
+                f"You are trying to add examples to a model that has not "
+                f"been trained. Please, call `train()` function before"
+            )
+
+        self._check_annotated_examples(
+            examples, annotations, function_name="add_examples"
+        )
+
+        return self.task.selector.add_examples(
+            examples=[
+                example.replace("{", "{{").replace("}", "}}")
+                for example in examples
+            ],
+            annotations=[
+                annotation.replace("{", "{{").replace("}", "}}")
+                for annotation in annotations
+            ],
+        )
+
+    def remove_examples(
+        self,
+        ids: List[str],
+    ) -> Self:
+        """
+        Removes examples from a trained model given the ids returned by
+        `add_examples()`.
+
+        Parameters
+        ----------
+        ids : List[str]
+            Ids of the examples to remove.
+
+        Returns
+        -------
+        Self
+        """
+
+        if not self.is_trained:
+            raise RuntimeError(
+                f"{self.__class__.__name__} error in `remove_examples()`. "
+                f"You are trying to remove examples from a model that has not "
+                f"been trained. Please, call `train()` function before"
+            )
+
+        self.task.selector.remove_examples(ids)
+
+        return self
+
+    def _check_annotated_examples(
+        self,
+        examples: List[str],
+        annotations: List[str],
+        function_name: str,
+    ) -> None:
+        """
+        Checks the training examples and their annotations.
+        """
+
         if not isinstance(examples, list) or not isinstance(annotations, list):
             raise ValueError(
                 f"Arguments `examples` and `annotations` are expected to be of "
@@ -384,14 +1268,16 @@ class BaseSupervised(Base):
             [isinstance(val, str) for val in annotations]
         ):
             raise ValueError(
-                f"{self.__class__.__name__} error in function `train()`. "
+                f"{self.__class__.__name__} error in function "
+                f"`{function_name}()`. "
                 f"Arguments `examples` and `annotations` are expected to be of "
                 f"type `List[str]`. Some values seem no to be of type `str`."
             )
 
         if len(examples) != len(annotations):
             raise ValueError(
-                f"{self.__class__.__name__} error in function `train()`. "
+                f"{self.__class__.__name__} error in function "
+                f"`{function_name}()`. "
                 f"Arguments `examples` and `annotations` are expected to have "
                 f"the same length. examples=({len(examples)},) annotations= "
                 f"({len(annotations)},)"
@@ -401,33 +1287,12 @@ class BaseSupervised(Base):
             for idx, annotation in enumerate(annotations):
                 if annotation not in self.prompt_labels:
                     raise ValueError(
-                        f"{self.__class__.__name__} error in `train()`. "
+                        f"{self.__class__.__name__} error in "
+                        f"`{function_name}()`. "
                         f"`annotation value in item {idx}: `{annotation}`"
                         f"is not in the expected values: {self.prompt_labels}"
                     )
 
-        examples = [
-            example.replace("{", "{{").replace("}", "}}")
-            for example in examples
-        ]
-
-        annotations = [
-            annotation.replace("{", "{{").replace("}", "}}")
-            for annotation in annotations
-        ]
-
-        self.builder.build_selector_by_train(
-            examples=examples,
-            annotations=annotations,
-            selector_k=self._selector_k,
-            selector_type=self.SELECTOR_TYPE,
-            selector_algorithm=self._selector_algorithm,
-        )
-
-        self._is_trained = True
-
-        return self
-
 
 class BaseUnsupervised(Base):
     """
@@ -481,6 +1346,9 @@ class BaseUnsupervised(Base):
             selector_k=self._selector_k,
             selector_type=self.SELECTOR_TYPE,
             selector_algorithm=self._selector_algorithm,
+            selector_index=self._selector_index,
+            selector_index_params=self._selector_index_params,
+            embedding_options=self._embedding_options,
         )
 
         self._is_trained = True
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+from typing import Optional
+
+from .base import BaseCache
+from .base import cache_key
+from .memory_cache import MemoryCache
+from .sqlite_cache import SQLiteCache
+from .tiered_cache import TieredCache
+from .embeddings_cache import CachedEmbeddings
+
+
+class CacheFactory:
+    """
+    Factory of Caches.
+    """
+
+    @classmethod
+    def factory_method(
+        cls,
+        cache_size: int,
+        cache_path: Optional[str] = None,
+        cache_ttl: Optional[float] = None,
+        cache_disk_size: Optional[int] = None,
+    ) -> BaseCache:
+        """
+        Returns an in-memory LRU cache of `cache_size` values. If `cache_path`
+        is given, the memory cache is backed by an on-disk SQLite cache stored
+        in that path.
+        """
+
+        memory_cache = MemoryCache(max_size=cache_size, ttl=cache_ttl)
+
+        if cache_path is None:
+            return memory_cache
+
+        return TieredCache(
+            [
+                memory_cache,
+                SQLiteCache(
+                    cache_path,
+                    max_size=cache_disk_size,
+                    ttl=cache_ttl,
+                ),
+            ]
+        )
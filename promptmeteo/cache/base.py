@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import json
+import asyncio
+import hashlib
+import threading
+from abc import ABC
+from abc import abstractmethod
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+
+def cache_key(*parts: Any) -> str:
+    """
+    Returns a stable hash of the given parts to be used as cache key. The
+    parts are serialized as JSON, so dictionaries with the same items produce
+    the same key regardless of their order.
+    """
+
+    return hashlib.sha256(
+        json.dumps(
+            parts, sort_keys=True, default=str, ensure_ascii=False
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+class BaseCache(ABC):
+    """
+    Cache Interface. Keeps count of the hits and misses of the lookups.
+    """
+
+    def __init__(self) -> None:
+        self._hits: int = 0
+        self._misses: int = 0
+        self._lock = threading.RLock()
+
+    @property
+    def stats(
+        self,
+    ) -> Dict[str, int]:
+        """Cache hits and misses."""
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses}
+
+    @property
+    def blocking(
+        self,
+    ) -> bool:
+        """
+        Whether the lookups block on I/O, so asynchronous callers should not
+        run them on the event loop.
+        """
+        return False
+
+    def get(
+        self,
+        key: str,
+    ) -> Optional[str]:
+        """
+        Returns the value stored for `key`, or None if it is not cached.
+        """
+
+        with self._lock:
+            value = self._get(key)
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        return value
+
+    def set(
+        self,
+        key: str,
+        value: str,
+    ) -> None:
+        """
+        Stores `value` for `key`.
+        """
+
+        with self._lock:
+            self._set(key, value)
+
+    async def aget(
+        self,
+        key: str,
+    ) -> Optional[str]:
+        """
+        Asynchronous version of `get()`. Blocking caches are looked up in the
+        default executor of the event loop.
+        """
+
+        if not self.blocking:
+            return self.get(key)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get, key)
+
+    async def aset(
+        self,
+        key: str,
+        value: str,
+    ) -> None:
+        """
+        Asynchronous version of `set()`. Blocking caches are written in the
+        default executor of the event loop.
+        """
+
+        if not self.blocking:
+            self.set(key, value)
+            return
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.set, key, value)
+
+    @abstractmethod
+    def _get(
+        self,
+        key: str,
+    ) -> Optional[str]:
+        """
+        Cache lookup without counting it.
+        """
+
+    @abstractmethod
+    def _set(
+        self,
+        key: str,
+        value: str,
+    ) -> None:
+        """
+        Cache store.
+        """
+
+    @abstractmethod
+    def clear(
+        self,
+    ) -> None:
+        """
+        Removes all the cached values.
+        """
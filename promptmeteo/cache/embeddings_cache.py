@@ -0,0 +1,514 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import os
+import json
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import TYPE_CHECKING
+
+from langchain_core.embeddings import Embeddings
+
+from .base import cache_key
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def embeddings_id(
+    embeddings: Embeddings,
+) -> str:
+    """
+    Returns an identifier of the embeddings model, made of the embeddings
+    class name and its model name, if any.
+    """
+
+    model = next(
+        (
+            getattr(embeddings, attribute)
+            for attribute in ["model_name", "model", "repo_id", "deployment"]
+            if getattr(embeddings, attribute, None)
+        ),
+        getattr(embeddings, "size", ""),
+    )
+
+    return f"{embeddings.__class__.__name__}:{model}"
+
+
+class EmbeddingsStore:
+    """
+    On-disk store of embeddings vectors. The vectors are appended to a raw
+    float32 file which is memory-mapped when read, and their keys are
+    appended to a text file together with their row in the vectors file.
+
+    The store can be shared by several processes. Writes hold an exclusive
+    lock on a lock file, and the keys appended by other processes are read
+    before writing and when a key is not found. On platforms without
+    `fcntl` there is no inter-process lock, and the store must only be used
+    by one process at a time.
+    """
+
+    KEYS_FILE: str = "keys.txt"
+    VECTORS_FILE: str = "vectors.f32"
+    META_FILE: str = "meta.json"
+    LOCK_FILE: str = "store.lock"
+
+    def __init__(
+        self,
+        store_path: str,
+    ) -> None:
+        os.makedirs(store_path, exist_ok=True)
+        self._keys_path = os.path.join(store_path, self.KEYS_FILE)
+        self._vectors_path = os.path.join(store_path, self.VECTORS_FILE)
+        self._meta_path = os.path.join(store_path, self.META_FILE)
+        self._lock_path = os.path.join(store_path, self.LOCK_FILE)
+        self._lock = threading.Lock()
+
+        self._dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._keys_offset = 0
+        self._vectors: Optional["np.memmap"] = None
+
+        with self._lock, self._file_lock(exclusive=False):
+            self._sync()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    @contextmanager
+    def _file_lock(
+        self,
+        exclusive: bool,
+    ) -> Iterator[None]:
+        """
+        Lock on the store shared with other processes.
+        """
+
+        if fcntl is None:
+            yield
+            return
+
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(
+                lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            )
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """
+        Reads the dimension and the keys written since the last read, also
+        by other processes. Must be called with both locks held.
+        """
+
+        if self._dim is None and os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as fin:
+                self._dim = json.load(fin)["dim"]
+
+        if not os.path.exists(self._keys_path):
+            return
+
+        with open(self._keys_path, "rb") as fin:
+            fin.seek(self._keys_offset)
+            for line in fin:
+                if not line.endswith(b"\n"):
+                    break
+                key, row = line.decode("utf-8").split()
+                self._rows[key] = int(row)
+                self._keys_offset += len(line)
+
+    def _mapped_vectors(self) -> "np.ndarray":
+        """
+        Memory map of the vectors file, remapped when it has grown.
+        """
+
+        import numpy as np
+
+        size = os.path.getsize(self._vectors_path) // (4 * self._dim)
+        if self._vectors is None or len(self._vectors) < size:
+            self._vectors = np.memmap(
+                self._vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(size, self._dim),
+            )
+        return self._vectors
+
+    def get(
+        self,
+        keys: List[str],
+    ) -> List[Optional[List[float]]]:
+        """
+        Returns the vectors stored for `keys`, None for the missing ones.
+        """
+
+        with self._lock:
+            if not all(key in self._rows for key in keys):
+                with self._file_lock(exclusive=False):
+                    self._sync()
+
+            if not any(key in self._rows for key in keys):
+                return [None] * len(keys)
+
+            vectors = self._mapped_vectors()
+            return [
+                vectors[self._rows[key]].tolist() if key in self._rows else None
+                for key in keys
+            ]
+
+    def set(
+        self,
+        keys: List[str],
+        vectors: List[List[float]],
+    ) -> None:
+        """
+        Appends new vectors to the store. The vectors are written before
+        their keys, so a key never points to a vector not written yet.
+        """
+
+        import numpy as np
+
+        with self._lock, self._file_lock(exclusive=True):
+            self._sync()
+
+            new = {
+                key: vector
+                for key, vector in zip(keys, vectors)
+                if key not in self._rows
+            }
+            if not new:
+                return
+
+            matrix = np.asarray(list(new.values()), dtype=np.float32)
+
+            if self._dim is None:
+                self._dim = matrix.shape[1]
+                with open(self._meta_path, "w", encoding="utf-8") as fout:
+                    json.dump({"dim": self._dim}, fout)
+
+            # A write interrupted by a crash can leave a partial row
+            row_size = 4 * self._dim
+            size = (
+                os.path.getsize(self._vectors_path)
+                if os.path.exists(self._vectors_path)
+                else 0
+            )
+            start = size // row_size
+            if size % row_size:
+                os.truncate(self._vectors_path, start * row_size)
+
+            with open(self._vectors_path, "ab") as fout:
+                fout.write(matrix.tobytes())
+
+            # As well as a partial line of keys
+            if (
+                os.path.exists(self._keys_path)
+                and os.path.getsize(self._keys_path) > self._keys_offset
+            ):
+                os.truncate(self._keys_path, self._keys_offset)
+
+            with open(self._keys_path, "ab") as fout:
+                lines = "".join(
+                    f"{key} {row}\n" for row, key in enumerate(new, start)
+                ).encode("utf-8")
+                fout.write(lines)
+            self._sync()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper which caches the vectors of the embedded texts, keyed
+    by the embeddings model and the text hash. Only texts not seen before are
+    sent to the wrapped embeddings.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_size: int = 10000,
+        cache_path: Optional[str] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        embeddings : Embeddings
+            Wrapped embeddings.
+        cache_size : int
+            Maximum number of vectors kept in the in-memory LRU cache.
+        cache_path : Optional[str]
+            Directory where the vectors are also stored on disk. Each
+            embeddings model uses its own subdirectory.
+        """
+
+        self._embeddings = embeddings
+        self._model_id = embeddings_id(embeddings)
+        self._cache_size = cache_size
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits: int = 0
+        self._misses: int = 0
+
+        self._store: Optional[EmbeddingsStore] = (
+            EmbeddingsStore(
+                os.path.join(cache_path, cache_key(self._model_id)[:16])
+            )
+            if cache_path
+            else None
+        )
+
+    @property
+    def embeddings(
+        self,
+    ) -> Embeddings:
+        """Wrapped embeddings."""
+        return self._embeddings
+
+    @property
+    def model_id(
+        self,
+    ) -> str:
+        """Identifier of the wrapped embeddings model."""
+        return self._model_id
+
+    @property
+    def stats(
+        self,
+    ) -> Dict[str, int]:
+        """Cache hits and misses."""
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses}
+
+    def _keys(
+        self,
+        texts: List[str],
+        kind: str,
+    ) -> List[str]:
+        """
+        Cache keys of the texts. Query and document embeddings are cached
+        separately because some providers embed them differently.
+        """
+
+        return [cache_key(self._model_id, kind, text) for text in texts]
+
+    def _lookup(
+        self,
+        keys: List[str],
+    ) -> List[Optional[List[float]]]:
+        with self._lock:
+            vectors = [self._memory.get(key) for key in keys]
+            for key, vector in zip(keys, vectors):
+                if vector is not None:
+                    self._memory.move_to_end(key)
+
+            missing = [
+                idx for idx, vector in enumerate(vectors) if vector is None
+            ]
+            if missing and self._store is not None:
+                stored = self._store.get([keys[idx] for idx in missing])
+                for idx, vector in zip(missing, stored):
+                    if vector is not None:
+                        vectors[idx] = vector
+                        self._remember(keys[idx], vector)
+
+            misses = sum(vector is None for vector in vectors)
+            self._misses += misses
+            self._hits += len(vectors) - misses
+
+        return vectors
+
+    def _remember(
+        self,
+        key: str,
+        vector: List[float],
+    ) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._cache_size:
+            self._memory.popitem(last=False)
+
+    def _save(
+        self,
+        keys: List[str],
+        vectors: List[List[float]],
+    ) -> None:
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            if self._store is not None:
+                self._store.set(keys, vectors)
+
+    async def _alookup(
+        self,
+        keys: List[str],
+    ) -> List[Optional[List[float]]]:
+        """
+        Asynchronous version of `_lookup()`. When vectors are stored on
+        disk, they are looked up in the default executor of the event loop.
+        """
+
+        if self._store is None:
+            return self._lookup(keys)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._lookup, keys)
+
+    async def _asave(
+        self,
+        keys: List[str],
+        vectors: List[List[float]],
+    ) -> None:
+        """
+        Asynchronous version of `_save()`. When vectors are stored on disk,
+        they are written in the default executor of the event loop.
+        """
+
+        if self._store is None:
+            return self._save(keys, vectors)
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._save, keys, vectors)
+
+    def _missing_texts(
+        self,
+        texts: List[str],
+        keys: List[str],
+        vectors: List[Optional[List[float]]],
+    ) -> Dict[str, str]:
+        """
+        Unique texts without a cached vector, by key.
+        """
+
+        return {
+            key: text
+            for text, key, vector in zip(texts, keys, vectors)
+            if vector is None
+        }
+
+    def embed_documents(
+        self,
+        texts: List[str],
+    ) -> List[List[float]]:
+        keys = self._keys(texts, "document")
+        vectors = self._lookup(keys)
+
+        missing = self._missing_texts(texts, keys, vectors)
+        if missing:
+            new_vectors = self._embeddings.embed_documents(
+                list(missing.values())
+            )
+            self._save(list(missing), new_vectors)
+            computed = dict(zip(missing, new_vectors))
+            vectors = [
+                vector if vector is not None else computed[key]
+                for key, vector in zip(keys, vectors)
+            ]
+
+        return vectors
+
+    def embed_query(
+        self,
+        text: str,
+    ) -> List[float]:
+        keys = self._keys([text], "query")
+        vector = self._lookup(keys)[0]
+
+        if vector is None:
+            vector = self._embeddings.embed_query(text)
+            self._save(keys, [vector])
+
+        return vector
+
+    def embed_queries(
+        self,
+        texts: List[str],
+    ) -> List[List[float]]:
+        """
+        Batched version of `embed_query()`. The texts not cached are embedded
+        with `embed_queries()` of the wrapped embeddings.
+        """
+
+        from ..selector.embedding import embed_queries
+
+        keys = self._keys(texts, "query")
+        vectors = self._lookup(keys)
+
+        missing = self._missing_texts(texts, keys, vectors)
+        if missing:
+            new_vectors = embed_queries(
+                self._embeddings, list(missing.values())
+            )
+            self._save(list(missing), new_vectors)
+            computed = dict(zip(missing, new_vectors))
+            vectors = [
+                vector if vector is not None else computed[key]
+                for key, vector in zip(keys, vectors)
+            ]
+
+        return vectors
+
+    async def aembed_documents(
+        self,
+        texts: List[str],
+    ) -> List[List[float]]:
+        keys = self._keys(texts, "document")
+        vectors = await self._alookup(keys)
+
+        missing = self._missing_texts(texts, keys, vectors)
+        if missing:
+            new_vectors = await self._embeddings.aembed_documents(
+                list(missing.values())
+            )
+            await self._asave(list(missing), new_vectors)
+            computed = dict(zip(missing, new_vectors))
+            vectors = [
+                vector if vector is not None else computed[key]
+                for key, vector in zip(keys, vectors)
+            ]
+
+        return vectors
+
+    async def aembed_query(
+        self,
+        text: str,
+    ) -> List[float]:
+        keys = self._keys([text], "query")
+        vector = (await self._alookup(keys))[0]
+
+        if vector is None:
+            vector = await self._embeddings.aembed_query(text)
+            await self._asave(keys, [vector])
+
+        return vector
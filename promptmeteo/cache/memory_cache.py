@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import time
+from collections import OrderedDict
+from typing import Optional
+from typing import Tuple
+
+from .base import BaseCache
+
+
+class MemoryCache(BaseCache):
+    """
+    In-memory LRU cache.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        max_size : int
+            Maximum number of values stored. When it is reached, the least
+            recently used value is evicted.
+        ttl : Optional[float]
+            Seconds that a value stays valid. By default values do not expire.
+        """
+
+        super(MemoryCache, self).__init__()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._values: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _get(
+        self,
+        key: str,
+    ) -> Optional[str]:
+        if key not in self._values:
+            return None
+
+        value, created = self._values[key]
+        if self._ttl is not None and time.time() - created > self._ttl:
+            del self._values[key]
+            return None
+
+        self._values.move_to_end(key)
+        return value
+
+    def _set(
+        self,
+        key: str,
+        value: str,
+    ) -> None:
+        self._values[key] = (value, time.time())
+        self._values.move_to_end(key)
+        while len(self._values) > self._max_size:
+            self._values.popitem(last=False)
+
+    def clear(
+        self,
+    ) -> None:
+        with self._lock:
+            self._values.clear()
@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import os
+import time
+import sqlite3
+from typing import Optional
+
+from .base import BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """
+    On-disk cache stored in a SQLite database. It can be shared by several
+    processes using the same database file.
+    """
+
+    # Maximum number of writes between two evictions of the expired and
+    # least recently used values.
+    EVICT_INTERVAL: int = 1000
+
+    # Seconds between two updates of the access time of a value, so most
+    # reads do not write to the database.
+    ACCESS_GRANULARITY: float = 60.0
+
+    def __init__(
+        self,
+        database_path: str,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        database_path : str
+            Path of the SQLite database file. It is created if it does not
+            exist.
+        max_size : Optional[int]
+            Maximum number of values stored. When it is exceeded, the least
+            recently used values are evicted. Eviction scans the table, so it
+            runs every `max_size // 10` writes, up to `EVICT_INTERVAL`, and
+            the cache can hold that many values over the limit in between.
+            The access times used to choose them are only updated every
+            `ACCESS_GRANULARITY` seconds. By default there is no limit.
+        ttl : Optional[float]
+            Seconds that a value stays valid. Expired values are never
+            returned, and are deleted every `EVICT_INTERVAL` writes. By
+            default values do not expire.
+        """
+
+        super(SQLiteCache, self).__init__()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._writes = 0
+        self._evict_interval = (
+            max(1, min(self.EVICT_INTERVAL, max_size // 10))
+            if max_size is not None
+            else self.EVICT_INTERVAL
+        )
+
+        database_dir = os.path.dirname(database_path)
+        if database_dir and not os.path.exists(database_dir):
+            raise ValueError(
+                f"{self.__class__.__name__} error in `__init__()`. "
+                f"directory {database_dir} does not exists."
+            )
+
+        self._connection = sqlite3.connect(
+            database_path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, "
+            "value TEXT NOT NULL, "
+            "created REAL NOT NULL, "
+            "accessed REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM cache"
+            ).fetchone()[0]
+
+    def _get(
+        self,
+        key: str,
+    ) -> Optional[str]:
+        row = self._connection.execute(
+            "SELECT value, created, accessed FROM cache WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        value, created, accessed = row
+        now = time.time()
+        if self._ttl is not None and now - created > self._ttl:
+            self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None
+
+        if (
+            self._max_size is not None
+            and now - accessed >= self.ACCESS_GRANULARITY
+        ):
+            self._connection.execute(
+                "UPDATE cache SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return value
+
+    def _set(
+        self,
+        key: str,
+        value: str,
+    ) -> None:
+        now = time.time()
+        self._connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, created, accessed) "
+            "VALUES (?, ?, ?, ?)",
+            (key, value, now, now),
+        )
+
+        self._writes += 1
+        if self._writes >= self._evict_interval:
+            self._writes = 0
+            self._evict(now)
+
+    @property
+    def blocking(
+        self,
+    ) -> bool:
+        return True
+
+    def _evict(
+        self,
+        now: float,
+    ) -> None:
+        """
+        Deletes the expired values and the least recently used values over
+        `max_size`.
+        """
+
+        if self._ttl is not None:
+            self._connection.execute(
+                "DELETE FROM cache WHERE created < ?", (now - self._ttl,)
+            )
+
+        if self._max_size is not None:
+            self._connection.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self._max_size,),
+            )
+
+    def clear(
+        self,
+    ) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM cache")
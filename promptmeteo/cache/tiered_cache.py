@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+from typing import List
+from typing import Optional
+
+from .base import BaseCache
+
+
+class TieredCache(BaseCache):
+    """
+    Cache composed by several caches, from the fastest to the slowest. Values
+    found in a slow tier are copied into the faster ones.
+    """
+
+    def __init__(
+        self,
+        tiers: List[BaseCache],
+    ) -> None:
+        super(TieredCache, self).__init__()
+        self._tiers = tiers
+
+    @property
+    def tiers(
+        self,
+    ) -> List[BaseCache]:
+        """Cache tiers."""
+        return self._tiers
+
+    @property
+    def blocking(
+        self,
+    ) -> bool:
+        return any(tier.blocking for tier in self._tiers)
+
+    def _get(
+        self,
+        key: str,
+    ) -> Optional[str]:
+        for idx, tier in enumerate(self._tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster_tier in self._tiers[:idx]:
+                    faster_tier.set(key, value)
+                return value
+
+        return None
+
+    def _set(
+        self,
+        key: str,
+        value: str,
+    ) -> None:
+        for tier in self._tiers:
+            tier.set(key, value)
+
+    def clear(
+        self,
+    ) -> None:
+        for tier in self._tiers:
+            tier.clear()
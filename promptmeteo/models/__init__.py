@@ -20,16 +20,21 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
 
+import weakref
+import importlib
+import threading
 from enum import Enum
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Type
 
 from .base import BaseModel
-from .openai import OpenAILLM
-from .fake_llm import FakeLLM
-from .hf_hub_api import HFHubApiLLM
-from .hf_pipeline import HFPipelineLLM
-from .google_vertexai import GoogleVertexAILLM
-from .bedrock import BedrockLLM
+from ..cache import cache_key
 
 
 class ModelProvider(str, Enum):
@@ -45,21 +50,154 @@ class ModelProvider(str, Enum):
     PROVIDER_5: str = "bedrock"
 
 
+class SharedModels:
+    """
+    Pool of the models created by `ModelFactory` while the pool is active.
+    Models with the same provider, name, token and parameters are copies
+    that share their LLM, and models whose embeddings are created with the
+    same arguments share the embeddings. Models are kept in the pool while
+    any of their copies is alive.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._models: "weakref.WeakValueDictionary[str, BaseModel]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._embeddings: "weakref.WeakValueDictionary[str, BaseModel]" = (
+            weakref.WeakValueDictionary()
+        )
+        self.shared_llms: int = 0
+        self.shared_embeddings: int = 0
+
+    @contextmanager
+    def activate(self) -> Iterator["SharedModels"]:
+        """
+        Makes `ModelFactory` use the pool in the current context.
+        """
+
+        token = _shared_models.set(self)
+        try:
+            yield self
+        finally:
+            _shared_models.reset(token)
+
+    def get(
+        self,
+        key: str,
+        create: Callable[[], BaseModel],
+    ) -> BaseModel:
+        """
+        Returns a copy of the pooled model with the given key, creating the
+        model with `create()` if it is not in the pool.
+        """
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self.shared_llms += 1
+                return model.share()
+
+        # Models are created outside the lock, so models with different
+        # keys are created concurrently
+        model = create()
+        embeddings_key = model.embeddings_key
+
+        with self._lock:
+            pooled = self._models.setdefault(key, model)
+            if pooled is not model:
+                self.shared_llms += 1
+                return pooled.share()
+
+            if embeddings_key is not None:
+                owner = self._embeddings.setdefault(embeddings_key, model)
+                if owner is not model:
+                    model.set_embeddings_loader(
+                        lambda: owner.embeddings, owner=owner
+                    )
+                    self.shared_embeddings += 1
+
+            return model.share()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """
+        Number of pooled models and of times an LLM or embeddings were
+        shared instead of created.
+        """
+
+        return {
+            "models": len(self._models),
+            "shared_llms": self.shared_llms,
+            "shared_embeddings": self.shared_embeddings,
+        }
+
+
+_shared_models: ContextVar[Optional[SharedModels]] = ContextVar(
+    "shared_models", default=None
+)
+
+
+def active_shared_models() -> Optional[SharedModels]:
+    """
+    Returns the pool of models active in the current context, if any.
+    """
+
+    return _shared_models.get()
+
+
 class ModelFactory:
     """
     The ModelFactory class is used to create a BaseModel object from the given
     configuration.
+
+    Provider modules are imported the first time their provider is requested,
+    so only the SDKs of the providers in use are loaded.
     """
 
     MAPPING = {
-        ModelProvider.PROVIDER_0: FakeLLM,
-        ModelProvider.PROVIDER_1: OpenAILLM,
-        ModelProvider.PROVIDER_2: HFHubApiLLM,
-        ModelProvider.PROVIDER_3: HFPipelineLLM,
-        ModelProvider.PROVIDER_3: GoogleVertexAILLM,
-        ModelProvider.PROVIDER_5: BedrockLLM,
+        ModelProvider.PROVIDER_0: ".fake_llm:FakeLLM",
+        ModelProvider.PROVIDER_1: ".openai:OpenAILLM",
+        ModelProvider.PROVIDER_2: ".hf_hub_api:HFHubApiLLM",
+        ModelProvider.PROVIDER_3: ".hf_pipeline:HFPipelineLLM",
+        ModelProvider.PROVIDER_4: ".google_vertexai:GoogleVertexAILLM",
+        ModelProvider.PROVIDER_5: ".bedrock:BedrockLLM",
     }
 
+    _lock = threading.Lock()
+    _classes: Dict[str, Type[BaseModel]] = {}
+
+    @classmethod
+    def get_model_class(
+        cls,
+        model_provider_name: str,
+    ) -> Type[BaseModel]:
+        """
+        Returns the BaseModel class of the given provider, importing its
+        module if it has not been imported yet.
+        """
+
+        model_cls = cls._classes.get(model_provider_name)
+        if model_cls is not None:
+            return model_cls
+
+        try:
+            model_path = cls.MAPPING[ModelProvider(model_provider_name)]
+        except ValueError as error:
+            raise ValueError(
+                f"{cls.__name__} error in `factory_method()`. "
+                f"{model_provider_name} is not in the list of supported "
+                f"providers: {[i.value for i in ModelProvider]}"
+            ) from error
+
+        module_name, class_name = model_path.split(":")
+        with cls._lock:
+            module = importlib.import_module(module_name, __name__)
+            model_cls = getattr(module, class_name)
+            cls._classes[model_provider_name] = model_cls
+
+        return model_cls
+
     @classmethod
     def factory_method(
         cls,
@@ -72,35 +210,41 @@ class ModelFactory:
         Returns a BaseModel object configured with the settings found in the
         provided parameters.
         """
-        model_cls = cls.MAPPING.get(model_provider_name)
 
-        if model_provider_name == ModelProvider.PROVIDER_0.value:
-            model_cls = FakeLLM
+        model_cls = cls.get_model_class(model_provider_name)
 
-        elif model_provider_name == ModelProvider.PROVIDER_1.value:
-            model_cls = OpenAILLM
+        def create() -> BaseModel:
+            return model_cls(
+                model_name=model_name,
+                model_params=model_params,
+                model_provider_token=model_provider_token,
+            )
 
-        elif model_provider_name == ModelProvider.PROVIDER_2.value:
-            model_cls = HFHubApiLLM
+        shared_models = _shared_models.get()
+        if shared_models is None:
+            return create()
+
+        return shared_models.get(
+            cache_key(
+                model_provider_name,
+                model_name,
+                model_provider_token,
+                model_params,
+            ),
+            create,
+        )
 
-        elif model_provider_name == ModelProvider.PROVIDER_3.value:
-            model_cls = HFPipelineLLM
 
-        elif model_provider_name == ModelProvider.PROVIDER_4.value:
-            model_cls = GoogleVertexAILLM
+def __getattr__(name: str):
+    """
+    Keeps `from promptmeteo.models import OpenAILLM` working without
+    importing every provider when the package is imported.
+    """
 
-        elif model_provider_name == ModelProvider.PROVIDER_5.value:
-            model_cls = BedrockLLM
+    for model_path in ModelFactory.MAPPING.values():
+        module_name, class_name = model_path.split(":")
+        if class_name == name:
+            module = importlib.import_module(module_name, __name__)
+            return getattr(module, class_name)
 
-        else:
-            raise ValueError(
-                f"{cls.__name__} error in `factory_method()`. "
-                f"{model_provider_name} is not in the list of supported "
-                f"providers: {[i.value for i in ModelProvider]}"
-            )
-
-        return model_cls(
-            model_name=model_name,
-            model_params=model_params,
-            model_provider_token=model_provider_token,
-        )
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -22,6 +22,7 @@
 
 import os
 from enum import Enum
+from functools import partial
 from typing import Dict
 from typing import Optional
 
@@ -29,6 +30,7 @@ from langchain.chat_models import AzureChatOpenAI
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.llms import AzureOpenAI
 
+from . import clients
 from .base import BaseModel
 
 
@@ -126,15 +128,39 @@ class AzureOpenAILLM(BaseModel):
             )
         self.model_params = model_params
 
+        # Clients are shared by the models with the same configuration
+        token = model_provider_token or os.environ.get("OPENAI_API_KEY", "")
+        endpoint = (
+            self.model_params.get("openai_api_base")
+            or self.model_params.get("azure_endpoint")
+            or os.environ.get("AZURE_OPENAI_ENDPOINT")
+            or os.environ.get("OPENAI_API_BASE", "")
+        )
+
         # Model
-        self._llm = ModelEnum[model].value.client(
-            openai_api_key=model_provider_token, **self.model_params
+        self._llm = clients.get(
+            "azure-openai",
+            ModelEnum[model].value.client,
+            endpoint,
+            {"openai_api_key": token},
+            self.model_params,
         )
 
         # Embeddings
-        self._embeddings = ModelEnum[model].value.embedding(
-            deployment="text-embedding-ada-002-v2",
-            openai_api_key=os.environ.get("EMBEDDINGS_API_KEY", None)
-            or model_provider_token,
-            openai_api_base=os.environ.get("EMBEDDINGS_API_BASE", ""),
+        embeddings_endpoint = os.environ.get("EMBEDDINGS_API_BASE", "")
+        self.set_embeddings_loader(
+            partial(
+                clients.get,
+                "azure-openai",
+                ModelEnum[model].value.embedding,
+                embeddings_endpoint,
+                {
+                    "openai_api_key": os.environ.get("EMBEDDINGS_API_KEY", None)
+                    or model_provider_token
+                },
+                {
+                    "deployment": "text-embedding-ada-002-v2",
+                    "openai_api_base": embeddings_endpoint,
+                },
+            )
         )
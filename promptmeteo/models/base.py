@@ -20,12 +20,44 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
 
+import copy
+import threading
 from abc import ABC
+from functools import partial
+from typing import Callable
+from typing import Dict
+from typing import List
 from typing import Optional
 
-from langchain.llms.base import BaseLLM
-from langchain.schema import HumanMessage
-from langchain.embeddings.base import Embeddings
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.outputs import LLMResult
+from langchain_core.messages import BaseMessage
+from langchain_core.messages import HumanMessage
+from langchain_core.embeddings import Embeddings
+
+from ..cache import BaseCache
+from ..cache import cache_key
+
+# sentence-transformers encodes 32 texts per batch by default, which
+# underuses the model when training with thousands of examples.
+SENTENCE_TRANSFORMERS_BATCH_SIZE = 128
+
+
+def sentence_transformers_loader(
+    model_name: str,
+) -> Callable[[], Embeddings]:
+    """
+    Loader of the local sentence-transformers embeddings `model_name`,
+    encoding `SENTENCE_TRANSFORMERS_BATCH_SIZE` texts per batch.
+    """
+
+    from langchain.embeddings import HuggingFaceEmbeddings
+
+    return partial(
+        HuggingFaceEmbeddings,
+        model_name=model_name,
+        encode_kwargs={"batch_size": SENTENCE_TRANSFORMERS_BATCH_SIZE},
+    )
 
 
 class BaseModel(ABC):
@@ -36,6 +68,15 @@ class BaseModel(ABC):
     def __init__(self, **kwargs):
         self._llm: Optional[BaseLLM] = kwargs.get("llm", None)
         self._embeddings: Optional[Embeddings] = kwargs.get("embeddings", None)
+        self._embeddings_loader: Optional[Callable[[], Embeddings]] = None
+        self._embeddings_lock = threading.Lock()
+        self._cache: Optional[BaseCache] = None
+        self._cache_namespace: str = ""
+
+        # Models whose LLM or embeddings this model uses, kept alive while
+        # this model is
+        self._shared_from: Optional["BaseModel"] = None
+        self._embeddings_owner: Optional["BaseModel"] = None
 
     @property
     def llm(
@@ -48,9 +89,187 @@ class BaseModel(ABC):
     def embeddings(
         self,
     ) -> Embeddings:
-        """Get Model Embeddings."""
+        """
+        Get Model Embeddings. They are created the first time they are
+        used, so models of tasks that do not select examples never load them.
+        """
+
+        if self._embeddings_loader is not None:
+            with self._embeddings_lock:
+                if self._embeddings_loader is not None:
+                    self._embeddings = self._embeddings_loader()
+                    self._embeddings_loader = None
+
         return self._embeddings
 
+    @embeddings.setter
+    def embeddings(
+        self,
+        embeddings: Embeddings,
+    ) -> None:
+        """Set Model Embeddings."""
+        self._embeddings = embeddings
+        self._embeddings_loader = None
+
+    @property
+    def embeddings_loaded(
+        self,
+    ) -> bool:
+        """Whether the Model Embeddings have already been created."""
+        return self._embeddings_loader is None
+
+    def set_embeddings_loader(
+        self,
+        loader: Callable[[], Embeddings],
+        owner: Optional["BaseModel"] = None,
+    ) -> None:
+        """
+        Set the function that creates the Model Embeddings when they are
+        used for the first time. `owner` is the model the embeddings are
+        taken from, if any, which is kept alive while this model is.
+        """
+
+        self._embeddings = None
+        self._embeddings_loader = loader
+        self._embeddings_owner = owner
+
+    def wrap_embeddings(
+        self,
+        wrapper: Callable[[Embeddings], Embeddings],
+    ) -> None:
+        """
+        Replace the Model Embeddings by `wrapper(embeddings)`. If they have
+        not been created yet, the wrapper is applied when they are created.
+        """
+
+        with self._embeddings_lock:
+            loader = self._embeddings_loader
+            if loader is None:
+                if self._embeddings is not None:
+                    self._embeddings = wrapper(self._embeddings)
+            else:
+                self._embeddings_loader = lambda: wrapper(loader())
+
+    @property
+    def embeddings_key(
+        self,
+    ) -> Optional[str]:
+        """
+        Hash of the function and arguments that create the Model Embeddings,
+        so models configured with the same embeddings can share them. It is
+        None when the embeddings have already been created or they are not
+        created by a `functools.partial`.
+        """
+
+        loader = self._embeddings_loader
+        if not isinstance(loader, partial):
+            return None
+
+        return cache_key(
+            f"{loader.func.__module__}.{loader.func.__qualname__}",
+            loader.args,
+            loader.keywords,
+        )
+
+    def share(
+        self,
+    ) -> "BaseModel":
+        """
+        Returns a copy of the model with its own response cache which shares
+        the LLM and the embeddings of this model. The embeddings are created
+        once, by this model, when any of its copies uses them.
+        """
+
+        model = copy.copy(self)
+        model._embeddings_lock = threading.Lock()
+        model._cache = None
+        model._cache_namespace = ""
+        model._shared_from = self
+
+        if self._embeddings_loader is not None:
+            model._embeddings_loader = lambda: self.embeddings
+
+        return model
+
+    @property
+    def cache(
+        self,
+    ) -> Optional[BaseCache]:
+        """Get Model response cache."""
+        return self._cache
+
+    @property
+    def params(
+        self,
+    ) -> Dict:
+        """
+        Get Model parameters as a dictionary. Some providers define their
+        parameters as a class with a `model_kwargs` attribute.
+        """
+
+        params = getattr(self, "model_params", None) or {}
+        if not isinstance(params, dict):
+            params = {
+                key: value
+                for key, value in vars(params).items()
+                if not key.startswith("_")
+            }
+
+        return params
+
+    @property
+    def is_deterministic(
+        self,
+    ) -> bool:
+        """
+        Whether the model is configured to always return the same output for
+        the same prompt, which is the case when the temperature is zero.
+        """
+
+        params = self.params
+        temperature = params.get(
+            "temperature",
+            (params.get("model_kwargs") or {}).get(
+                "temperature", getattr(self.llm, "temperature", None)
+            ),
+        )
+
+        return temperature is not None and float(temperature) == 0.0
+
+    @property
+    def supports_batch(
+        self,
+    ) -> bool:
+        """
+        Whether the LLM can generate several prompts in a single call. Chat
+        models only accept one conversation per call.
+        """
+        return isinstance(self.llm, BaseLLM)
+
+    def set_cache(
+        self,
+        cache: Optional[BaseCache],
+        namespace: str = "",
+    ) -> None:
+        """
+        Set the cache used to store the model responses. `namespace`
+        identifies the model configuration, so responses of different models
+        are not mixed when sharing the same cache.
+        """
+
+        self._cache = cache
+        self._cache_namespace = namespace
+
+    def _cache_key(
+        self,
+        sample: str,
+    ) -> str:
+        """
+        Key of the cached response for a prompt.
+        """
+
+        return cache_key(self._cache_namespace, sample)
+
     def run(
         self,
         sample: str,
@@ -59,6 +278,25 @@ class BaseModel(ABC):
         Executes the model LLM and return its prediction.
         """
 
+        if self._cache is None:
+            return self._run(sample)
+
+        key = self._cache_key(sample)
+        output = self._cache.get(key)
+        if output is None:
+            output = self._run(sample)
+            self._cache.set(key, output)
+
+        return output
+
+    def _run(
+        self,
+        sample: str,
+    ) -> str:
+        """
+        Executes the model LLM without looking up the cache.
+        """
+
         try:
             return self.llm(prompt=sample)
 
@@ -69,3 +307,92 @@ class BaseModel(ABC):
             raise RuntimeError(
                 f'Error generating from LLM: with sample "{sample}"'
             ) from error
+
+    def run_batch(
+        self,
+        samples: List[str],
+        batch_size: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Executes the model LLM over a list of samples, sending `batch_size`
+        samples in each call, and return their predictions in order. Models
+        which do not support batches predict the samples one by one. Only
+        the samples without a cached response are sent to the LLM.
+        """
+
+        if not self.supports_batch:
+            return [self.run(sample) for sample in samples]
+
+        outputs: List[Optional[str]] = [None] * len(samples)
+        keys: List[Optional[str]] = [None] * len(samples)
+
+        if self._cache is not None:
+            for idx, sample in enumerate(samples):
+                keys[idx] = self._cache_key(sample)
+                outputs[idx] = self._cache.get(keys[idx])
+
+        pending = [idx for idx, output in enumerate(outputs) if output is None]
+        if not pending:
+            return outputs
+
+        batch_size = (
+            batch_size or getattr(self.llm, "batch_size", None) or len(pending)
+        )
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+
+            try:
+                result = self._generate_batch([samples[idx] for idx in batch])
+
+            except Exception as error:
+                raise RuntimeError(
+                    f"Error generating from LLM: with a batch of "
+                    f"{len(batch)} samples"
+                ) from error
+
+            for idx, generations in zip(batch, result.generations):
+                outputs[idx] = generations[0].text
+                if self._cache is not None:
+                    self._cache.set(keys[idx], outputs[idx])
+
+        return outputs
+
+    def _generate_batch(
+        self,
+        batch: List[str],
+    ) -> LLMResult:
+        """
+        Sends a batch of samples to the LLM in a single call.
+        """
+
+        return self.llm.generate(batch)
+
+    async def arun(
+        self,
+        sample: str,
+    ) -> str:
+        """
+        Executes the model LLM asynchronously and return its prediction.
+        """
+
+        if self._cache is not None:
+            key = self._cache_key(sample)
+            output = await self._cache.aget(key)
+            if output is not None:
+                return output
+
+        try:
+            output = await self.llm.ainvoke(sample)
+
+        except Exception as error:
+            raise RuntimeError(
+                f'Error generating from LLM: with sample "{sample}"'
+            ) from error
+
+        output = output.content if isinstance(output, BaseMessage) else output
+
+        if self._cache is not None:
+            await self._cache.aset(key, output)
+
+        return output
@@ -29,6 +29,7 @@ from langchain.llms.bedrock import Bedrock
 from langchain.embeddings import HuggingFaceEmbeddings
 
 from .base import BaseModel
+from .base import sentence_transformers_loader
 
 
 class ModelTypes(str, Enum):
@@ -120,4 +121,4 @@ class BedrockLLM(BaseModel):
         if os.path.exists("/home/models/all-MiniLM-L6-v2"):
             embedding_name = "/home/models/all-MiniLM-L6-v2"
 
-        self._embeddings = HuggingFaceEmbeddings(model_name=embedding_name)
+        self.set_embeddings_loader(sentence_transformers_loader(embedding_name))
@@ -0,0 +1,454 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import os
+import sys
+import time
+import weakref
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Type
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..cache import cache_key
+
+
+class PooledSession(requests.Session):
+    """
+    HTTP session shared by every thread and every client of a `ClientPool`.
+    Connections are kept alive and reused while they have been idle for
+    less than `keepalive` seconds. The `openai` package closes the session
+    of each thread from time to time; that only drops the idle connections,
+    the session is closed by its pool.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        keepalive: float,
+    ) -> None:
+        super().__init__()
+
+        adapter = HTTPAdapter(
+            pool_connections=max_connections,
+            pool_maxsize=max_connections,
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+        self.keepalive = keepalive
+        self._last_used = time.monotonic()
+        self._lock = threading.Lock()
+
+    def request(self, *args, **kwargs) -> requests.Response:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_used > self.keepalive:
+                self._drop_connections()
+            self._last_used = now
+
+        return super().request(*args, **kwargs)
+
+    def close(self) -> None:
+        self._drop_connections()
+
+    def shutdown(self) -> None:
+        """Closes the session."""
+        super().close()
+
+    def _drop_connections(self) -> None:
+        for adapter in self.adapters.values():
+            adapter.poolmanager.clear()
+
+
+class ClientPool:
+    """
+    Pool of the clients of the OpenAI and Azure OpenAI providers. Models
+    configured with the same provider, endpoint, credentials and parameters
+    get the same client instead of creating their own.
+
+    With `openai<1` the HTTP session is global to the `openai` package, and
+    each thread keeps its own. With `share_session` the pool makes the
+    package send every request through a single `PooledSession`, so
+    connections are set up once and reused by every thread and model. It
+    is off by default because it also applies to any other user of the
+    `openai` package in the process. With `openai>=1` each client keeps its
+    own connection pool, which is shared by the models that share the
+    client.
+
+    With `openai<1`, `max_connections` and `keepalive` only take effect
+    with `share_session=True`; otherwise the `openai` package uses its own
+    per-thread sessions with the `requests` defaults.
+
+    The pool keeps the `max_clients` most recently used clients. The
+    connections of an evicted client are closed once no model uses it.
+
+    Parameters
+    ----------
+
+    max_connections : int
+        Connections kept open to each host. With `openai<1`, only with
+        `share_session`.
+
+    keepalive : float
+        Seconds an idle connection is kept open to be reused. With
+        `openai<1`, only with `share_session`.
+
+    timeout : Optional[float]
+        Seconds to wait for a response. By default, and when only
+        `connect_timeout` is given, the timeout of the `openai` package.
+
+    connect_timeout : Optional[float]
+        Seconds to wait for a connection to be established. By default the
+        same as `timeout`.
+
+    share_session : bool
+        Send the requests of `openai<1` through the pool session.
+
+    max_clients : int
+        Clients kept in the pool.
+
+    The timeouts are only passed to the clients when one of them is given,
+    and a `request_timeout` in the parameters of a model takes precedence.
+    """
+
+    # Timeout of the `openai` package when no `request_timeout` is given.
+    OPENAI_TIMEOUT: float = 600.0
+
+    def __init__(
+        self,
+        max_connections: int = 10,
+        keepalive: float = 60.0,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        share_session: bool = False,
+        max_clients: int = 32,
+    ) -> None:
+        self.max_connections = max_connections
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.share_session = share_session
+        self.max_clients = max_clients
+
+        self._lock = threading.Lock()
+        self._clients: "OrderedDict[str, Any]" = OrderedDict()
+        self._session: Optional[PooledSession] = None
+        self.created: int = 0
+        self.reused: int = 0
+        self.evicted: int = 0
+
+    @property
+    def session(
+        self,
+    ) -> PooledSession:
+        """HTTP session of the pool, created the first time it is used."""
+
+        with self._lock:
+            if self._session is None:
+                self._session = PooledSession(
+                    self.max_connections, self.keepalive
+                )
+
+            return self._session
+
+    def get(
+        self,
+        provider: str,
+        client_cls: Type,
+        endpoint: str,
+        credentials: Dict[str, Any],
+        params: Dict[str, Any],
+    ) -> Any:
+        """
+        Returns the client of `client_cls` for the given provider, endpoint,
+        credentials and parameters, creating it with
+        `client_cls(**credentials, **params)` if it is not in the pool.
+        Only a hash of the credentials is kept in the pool key.
+        """
+
+        key = cache_key(
+            provider,
+            f"{client_cls.__module__}.{client_cls.__qualname__}",
+            endpoint,
+            cache_key(credentials),
+            params,
+        )
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.reused += 1
+                return client
+
+        kwargs = {**params, **credentials}
+        request_timeout = self._request_timeout()
+        if request_timeout is not None:
+            kwargs.setdefault("request_timeout", request_timeout)
+
+        client = client_cls(**kwargs)
+        if self.share_session:
+            self._install_session()
+
+        evicted = []
+        with self._lock:
+            pooled = self._clients.setdefault(key, client)
+            self._clients.move_to_end(key)
+            if pooled is client:
+                self.created += 1
+            else:
+                self.reused += 1
+
+            while len(self._clients) > max(1, self.max_clients):
+                evicted.append(self._clients.popitem(last=False)[1])
+                self.evicted += 1
+
+        for old_client in evicted:
+            _close_when_unused(old_client)
+
+        return pooled
+
+    def clear(
+        self,
+    ) -> None:
+        """
+        Removes every client from the pool and closes its HTTP session.
+        Models keep the clients they already have.
+        """
+
+        openai = sys.modules.get("openai")
+
+        with self._lock:
+            evicted = list(self._clients.values())
+            session = self._session
+            self._clients = OrderedDict()
+            self._session = None
+
+        for client in evicted:
+            _close_when_unused(client)
+
+        if session is not None:
+            if getattr(openai, "requestssession", None) is session:
+                openai.requestssession = None
+            session.shutdown()
+
+    @property
+    def stats(
+        self,
+    ) -> Dict[str, Any]:
+        """
+        Number of pooled clients and of times a client was created, reused
+        or evicted.
+        """
+
+        return {
+            "clients": len(self._clients),
+            "created": self.created,
+            "reused": self.reused,
+            "evicted": self.evicted,
+        }
+
+    def _request_timeout(
+        self,
+    ) -> Any:
+        if self.timeout is None and self.connect_timeout is None:
+            return None
+
+        timeout = self.timeout or self.OPENAI_TIMEOUT
+        connect_timeout = self.connect_timeout or timeout
+
+        if _is_openai_v1():
+            import httpx
+
+            return httpx.Timeout(timeout, connect=connect_timeout)
+
+        return (connect_timeout, timeout)
+
+    def _install_session(
+        self,
+    ) -> None:
+        """
+        Makes the `openai<1` package send its requests through the pool
+        session, unless the user has already set a session of their own.
+        """
+
+        if _is_openai_v1():
+            return
+
+        import openai
+
+        current = openai.requestssession
+        if current is None or isinstance(current, PooledSession):
+            openai.requestssession = self.session
+
+
+def _is_openai_v1() -> bool:
+    from langchain_community.utils.openai import is_openai_v1
+
+    return is_openai_v1()
+
+
+def _http_clients(
+    client: Any,
+) -> List[Any]:
+    """
+    `openai>=1` clients used by a model client, which own its connections.
+    With `openai<1` the connections belong to the `openai` package.
+    """
+
+    owners = []
+    for attr in ["client", "async_client"]:
+        owner = getattr(getattr(client, attr, None), "_client", None)
+        if owner is not None and hasattr(owner, "close"):
+            owners.append(owner)
+
+    return owners
+
+
+def _close_http_clients(
+    owners: List[Any],
+) -> None:
+    import asyncio
+
+    for owner in owners:
+        if asyncio.iscoroutinefunction(owner.close):
+            # Async clients cannot be closed here; their connections are
+            # closed when they are garbage collected.
+            continue
+        try:
+            owner.close()
+        except Exception:
+            pass
+
+
+def _close_when_unused(
+    client: Any,
+) -> None:
+    """
+    Closes the connections of a client removed from the pool once no model
+    uses it anymore.
+    """
+
+    owners = _http_clients(client)
+    if not owners:
+        return
+
+    try:
+        weakref.finalize(client, _close_http_clients, owners)
+    except TypeError:
+        pass
+
+
+def _flag(
+    value: str,
+) -> bool:
+    return value.lower() in ["1", "true", "yes"]
+
+
+def _setting(
+    name: str,
+    cast: Callable[[str], Any],
+    default: Any,
+) -> Any:
+    value = os.environ.get(f"PROMPTMETEO_HTTP_{name}")
+
+    return cast(value) if value else default
+
+
+_pool = ClientPool(
+    max_connections=_setting("MAX_CONNECTIONS", int, 10),
+    keepalive=_setting("KEEPALIVE", float, 60.0),
+    timeout=_setting("TIMEOUT", float, None),
+    connect_timeout=_setting("CONNECT_TIMEOUT", float, None),
+    share_session=_setting("SHARE_SESSION", _flag, False),
+    max_clients=_setting("MAX_CLIENTS", int, 32),
+)
+
+
+def get(
+    provider: str,
+    client_cls: Type,
+    endpoint: str,
+    credentials: Dict[str, Any],
+    params: Dict[str, Any],
+) -> Any:
+    """
+    Returns a client from the process pool. See `ClientPool.get`. The pool
+    settings are read from the `PROMPTMETEO_HTTP_MAX_CONNECTIONS`,
+    `PROMPTMETEO_HTTP_KEEPALIVE`, `PROMPTMETEO_HTTP_TIMEOUT`,
+    `PROMPTMETEO_HTTP_CONNECT_TIMEOUT`, `PROMPTMETEO_HTTP_SHARE_SESSION` and
+    `PROMPTMETEO_HTTP_MAX_CLIENTS` environment variables. With `openai<1`,
+    `PROMPTMETEO_HTTP_MAX_CONNECTIONS` and `PROMPTMETEO_HTTP_KEEPALIVE` only
+    take effect when `PROMPTMETEO_HTTP_SHARE_SESSION` is set.
+    """
+
+    return _pool.get(provider, client_cls, endpoint, credentials, params)
+
+
+def stats() -> Dict[str, Any]:
+    """
+    Statistics of the process pool. See `ClientPool.stats`.
+    """
+
+    return _pool.stats
+
+
+def clear() -> None:
+    """
+    Removes every client from the process pool.
+    """
+
+    _pool.clear()
+
+
+def configure(
+    max_connections: Optional[int] = None,
+    keepalive: Optional[float] = None,
+    timeout: Optional[float] = None,
+    connect_timeout: Optional[float] = None,
+    share_session: Optional[bool] = None,
+    max_clients: Optional[int] = None,
+) -> None:
+    """
+    Changes the settings of the process pool. The settings not given are
+    kept. The pool is cleared, so the clients created from now on use the
+    new settings. With `openai<1`, `max_connections` and `keepalive` only
+    take effect with `share_session=True`.
+    """
+
+    _pool.clear()
+
+    if max_connections is not None:
+        _pool.max_connections = max_connections
+    if keepalive is not None:
+        _pool.keepalive = keepalive
+    if timeout is not None:
+        _pool.timeout = timeout
+    if connect_timeout is not None:
+        _pool.connect_timeout = connect_timeout
+    if share_session is not None:
+        _pool.share_session = share_session
+    if max_clients is not None:
+        _pool.max_clients = max_clients
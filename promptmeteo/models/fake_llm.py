@@ -21,6 +21,7 @@
 #  THE SOFTWARE.
 
 from enum import Enum
+from functools import partial
 from typing import Any
 from typing import List
 from typing import Dict
@@ -205,7 +206,7 @@ class FakeLLM(BaseModel):
         self.model_params = model_params
         self.model_provider_token = model_provider_token
 
-        self._embeddings = FakeEmbeddings(size=64)
+        self.set_embeddings_loader(partial(FakeEmbeddings, size=64))
         if model_name in self.LLM_MAPPING:
             self._llm = self.LLM_MAPPING[model_name]()
         else:
@@ -118,7 +118,7 @@ class GoogleVertexAILLM(BaseModel):
         )
 
         # Embeddings
-        self._embeddings = VertexAIEmbeddings()
+        self.set_embeddings_loader(VertexAIEmbeddings)
 
         # Model Parameters
         if not model_params:
@@ -21,6 +21,7 @@
 #  THE SOFTWARE.
 
 from enum import Enum
+from functools import partial
 from typing import Optional
 
 from langchain.llms import HuggingFaceHub
@@ -88,6 +89,7 @@ class HFHubApiLLM(BaseModel):
             raise ValueError("invalid model_params")
 
         super(HFHubApiLLM, self).__init__()
+        self.model_params = model_params
 
         self._llm = HuggingFaceHub(
             repo_id=model_name,
@@ -95,7 +97,10 @@ class HFHubApiLLM(BaseModel):
             model_kwargs=model_params.model_kwargs,
         )
 
-        self._embeddings = HuggingFaceHubEmbeddings(
-            repo_id="sentence-transformers/all-MiniLM-L6-v2",
-            huggingfacehub_api_token=model_provider_token,
+        self.set_embeddings_loader(
+            partial(
+                HuggingFaceHubEmbeddings,
+                repo_id="sentence-transformers/all-MiniLM-L6-v2",
+                huggingfacehub_api_token=model_provider_token,
+            )
         )
@@ -22,12 +22,14 @@
 
 import os
 from enum import Enum
+from typing import List
 from typing import Optional
 
 from langchain.llms import HuggingFacePipeline
-from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.schema import LLMResult
 
 from .base import BaseModel
+from .base import sentence_transformers_loader
 
 
 class ModelTypes(str, Enum):
@@ -59,6 +61,7 @@ class ModelParams(Enum):
         model_path = "/home/models/flan-t5-small"
         model_task = "text2text-generation"
         model_kwargs = {"temperature": 0.0, "max_length": 64}
+        batch_size = 16
 
 
 class HFPipelineLLM(BaseModel):
@@ -93,6 +96,7 @@ class HFPipelineLLM(BaseModel):
             raise ValueError("Invalid model_params")
 
         super(HFPipelineLLM, self).__init__()
+        self.model_params = model_params
 
         if os.path.exists(model_params.model_path):
             model_name = model_params.model_path
@@ -101,12 +105,26 @@ class HFPipelineLLM(BaseModel):
             model_id=model_name,
             task=model_params.model_task,
             model_kwargs=model_params.model_kwargs,
+            batch_size=getattr(model_params, "batch_size", 4),
         )
 
         embedding_name = "sentence-transformers/all-MiniLM-L6-v2"
         if os.path.exists("/home/models/all-MiniLM-L6-v2"):
             embedding_name = "/home/models/all-MiniLM-L6-v2"
 
-        self._embeddings = HuggingFaceEmbeddings(model_name=embedding_name)
+        self.set_embeddings_loader(sentence_transformers_loader(embedding_name))
 
         self.model_provider_token = model_provider_token
+
+    def _generate_batch(
+        self,
+        batch: List[str],
+    ) -> LLMResult:
+        """
+        Sends a batch of samples to the pipeline, which runs them through the
+        model as a single tensor batch.
+        """
+
+        return self.llm.generate(
+            batch, pipeline_kwargs={"batch_size": len(batch)}
+        )
@@ -20,7 +20,9 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
 
+import os
 from enum import Enum
+from functools import partial
 from typing import Dict
 from typing import Optional
 
@@ -28,6 +30,7 @@ from langchain.llms import OpenAI
 from langchain.chat_models import ChatOpenAI
 from langchain.embeddings import OpenAIEmbeddings
 
+from . import clients
 from .base import BaseModel
 
 
@@ -123,14 +126,32 @@ class OpenAILLM(BaseModel):
             )
         self.model_params = model_params
 
+        # Clients are shared by the models with the same configuration
+        endpoint = self.model_params.get("openai_api_base") or os.environ.get(
+            "OPENAI_API_BASE", ""
+        )
+        credentials = {
+            "openai_api_key": model_provider_token
+            or os.environ.get("OPENAI_API_KEY", "")
+        }
+
         # Model
-        self._llm = ModelEnum[model].value.client(
-            openai_api_key=model_provider_token,
-            **self.model_params,
+        self._llm = clients.get(
+            "openai",
+            ModelEnum[model].value.client,
+            endpoint,
+            credentials,
+            self.model_params,
         )
 
         # Embeddings
-        self._embeddings = ModelEnum[model].value.embedding(
-            deployment="text-embedding-ada-002-v2",
-            openai_api_key=model_provider_token,
+        self.set_embeddings_loader(
+            partial(
+                clients.get,
+                "openai",
+                ModelEnum[model].value.embedding,
+                endpoint,
+                credentials,
+                {"deployment": "text-embedding-ada-002-v2"},
+            )
         )
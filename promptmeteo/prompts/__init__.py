@@ -21,74 +21,116 @@
 #  THE SOFTWARE.
 
 import os
+import threading
 from enum import Enum
+from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Type
 
 from .base import BasePrompt
+from .base import CompiledPrompt
+from .bundle import PromptKey
+from .bundle import load_prompts
 
 
 module_dir = os.path.abspath(os.path.join(__file__, os.path.pardir))
 
 
-def get_files_taxonomy(sep: str = "_"):
+class PromptRegistry:
     """
-    Convert a list of prompt files with the naming convetion of
-    `{model_name}_{language}_{task}.prompt into a dictorionary version.
-    Given the following folder structure:
-
-        ./prompts/
-          ├── __init__.py
-          ├── base.py
-          ├── google-flan-t5-small_es_classification.prompt
-          ├── google-flan-t5-small_es_code-generation.prompt
-          ├── google-flan-t5-small_es_ner.prompt
-          ├── text-davinci-003_es_classification.prompt
-          ├── text-davinci-003_es_code-generation.prompt
-          └── text-davinci-003_es_ner.prompt
-
-    The function returns:
-
-        {'google-flan-t5-small': {
-             'es': {
-                 'classification': {},
-                 'ner': {}
-                 }
-              },
-         'text-davinci-003': {
-             'es': {
-                 'classification': {},
-                 'code-generation': {},
-                 'ner': {}
-                 }
-              }
-        }
-
+    Process-wide registry of the prompt files. The prompts are read from
+    the precompiled bundle the first time a prompt is requested, or listed
+    from the prompts directory if the bundle is out of date, and each prompt
+    class is built once per model, language and task, so resolving a prompt
+    is a dictionary lookup.
     """
 
-    try:
-        prompt_files = [
-            os.path.join(path, name.replace(".prompt", "")).replace(
-                module_dir + "/", ""
-            )
-            for path, _, files in os.walk(module_dir)
-            for name in files
-            if name.endswith(".prompt")
-        ]
+    _lock = threading.RLock()
+    _prompts: Optional[Dict[PromptKey, Dict]] = None
+    _taxonomy: Optional[Dict] = None
+    _classes: Dict[Tuple[str, str, str], Type[BasePrompt]] = {}
+
+    @classmethod
+    def prompts(
+        cls,
+    ) -> Dict[PromptKey, Dict]:
+        """
+        Returns the prompts keyed by model name, language and task, loading
+        them if they have not been loaded yet.
+        """
+
+        if cls._prompts is None:
+            with cls._lock:
+                if cls._prompts is None:
+                    prompts = load_prompts(module_dir)
+
+                    taxonomy = {}
+                    for model_name, language, task_type in prompts:
+                        taxonomy.setdefault(model_name, {}).setdefault(
+                            language, {}
+                        )[task_type] = {}
+
+                    cls._taxonomy = taxonomy
+                    cls._prompts = prompts
+
+        return cls._prompts
+
+    @classmethod
+    def taxonomy(
+        cls,
+    ) -> Dict:
+        """
+        Returns the prompt files taxonomy, loading the prompts if they have
+        not been loaded yet.
+        """
+
+        if cls._taxonomy is None:
+            cls.prompts()
+
+        return cls._taxonomy
 
-        taxonomy = {}
-        for prompt_file in prompt_files:
-            tmp = taxonomy
-            for field in prompt_file.split(sep):
-                tmp = tmp.setdefault(field, {})
+    @classmethod
+    def get_class(
+        cls,
+        language: str,
+        task_type: str,
+        _model_name: str,
+    ) -> Type[BasePrompt]:
+        """
+        Returns the prompt class for the given model, language and task,
+        building it from its prompt file the first time it is requested.
+        """
+
+        key = (_model_name, language, task_type)
+        prompt_cls = cls._classes.get(key)
+
+        if prompt_cls is None:
+            with cls._lock:
+                prompt_cls = cls._classes.get(key)
+                if prompt_cls is None:
+                    prompt_cls = PromptFactory.build_class(
+                        language, task_type, _model_name
+                    )
+                    cls._classes[key] = prompt_cls
 
-    except Exception as error:
-        raise RuntimeError(
-            "Problems with the prompts file structure in directory "
-            "promptmeteo/prompts. The expected naming for the prompts "
-            "is `<model_name>_<language>_<task>.prompt`."
-        ) from error
+        return prompt_cls
 
-    return taxonomy
+    @classmethod
+    def refresh(
+        cls,
+    ) -> None:
+        """
+        Forgets the scanned prompt files and the built prompt classes, so
+        the prompt files are read again the next time they are requested.
+        Prompts already built keep their former template.
+        """
+
+        with cls._lock:
+            cls._prompts = None
+            cls._taxonomy = None
+            cls._classes = {}
 
 
 class PromptFactory:
@@ -113,7 +155,7 @@ class PromptFactory:
 
         _model_name = model_name.replace("/", "-")
 
-        taxonomy = get_files_taxonomy()
+        taxonomy = PromptRegistry.taxonomy()
 
         if _model_name not in taxonomy:
             raise ValueError(
@@ -138,7 +180,7 @@ class PromptFactory:
                 f"{list(taxonomy[model_name][language])}"
             )
 
-        prompt_cls = cls.build_class(language, task_type, _model_name)
+        prompt_cls = PromptRegistry.get_class(language, task_type, _model_name)
 
         return prompt_cls(
             prompt_domain=prompt_domain,
@@ -155,7 +197,7 @@ class PromptFactory:
         """
         Creates a class dinamically that inherits from `BasePrompt` given
         arguments configuracion. This new class has included its prompt from
-        the .prompt file.
+        the prompt bundle or, if the bundle is out of date, the .prompt file.
 
         Example
         -------
@@ -181,8 +223,18 @@ class PromptFactory:
             prompt_class_name, (BasePrompt,), {"__init__": BasePrompt.__init__}
         )
 
-        file_name = f"{_model_name}_{language}_{task_type}.prompt"
-        with open(os.path.join(module_dir, file_name), encoding="utf-8") as fin:
-            prompt_cls.read_prompt(fin.read())
+        prompt = PromptRegistry.prompts().get(
+            (_model_name, language, task_type), {}
+        )
+
+        if "sections" in prompt:
+            prompt_cls.load_sections(prompt["sections"], prompt["text"])
+
+        else:
+            file_name = f"{_model_name}_{language}_{task_type}.prompt"
+            with open(
+                os.path.join(module_dir, file_name), encoding="utf-8"
+            ) as fin:
+                prompt_cls.read_prompt(fin.read())
 
         return prompt_cls
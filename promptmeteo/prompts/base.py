@@ -22,10 +22,38 @@
 
 from abc import ABC
 from string import Formatter
+from typing import Any
+from typing import Dict
+from typing import FrozenSet
 from typing import List
+from typing import NamedTuple
+from typing import Optional
 
 import yaml
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
+
+
+class CompiledPrompt(NamedTuple):
+    """
+    Prompt template with the domain, labels and detail sections already
+    filled, so only the sample and the examples are left to substitute.
+    """
+
+    template: str
+    input_variables: FrozenSet[str]
+
+    def format(
+        self,
+        **kwargs: Any,
+    ) -> str:
+        """
+        Fill the template with the given variables. Variables which are not
+        in the template are ignored.
+        """
+
+        return self.template.format(
+            **{k: v for k, v in kwargs.items() if k in self.input_variables}
+        )
 
 
 class BasePrompt(ABC):
@@ -81,6 +109,9 @@ class BasePrompt(ABC):
         self._prompt_labels = prompt_labels
         self._prompt_detail = prompt_detail
 
+        self._compiled: Optional[CompiledPrompt] = None
+        self._compiled_revision: int = -1
+
     @property
     def domain(
         self,
@@ -88,6 +119,15 @@ class BasePrompt(ABC):
         """Prompt Domain."""
         return self._prompt_domain
 
+    @domain.setter
+    def domain(
+        self,
+        prompt_domain: str,
+    ) -> None:
+        """Set Prompt Domain."""
+        self._prompt_domain = prompt_domain
+        self._compiled = None
+
     @property
     def labels(
         self,
@@ -95,12 +135,37 @@ class BasePrompt(ABC):
         """Prompt Labels."""
         return [self._prompt_labels]
 
+    @labels.setter
+    def labels(
+        self,
+        prompt_labels: List[str],
+    ) -> None:
+        """Set Prompt Labels."""
+        self._prompt_labels = prompt_labels
+        self._compiled = None
+
+    @property
+    def detail(
+        self,
+    ) -> str:
+        """Prompt Detail."""
+        return self._prompt_detail
+
+    @detail.setter
+    def detail(
+        self,
+        prompt_detail: str,
+    ) -> None:
+        """Set Prompt Detail."""
+        self._prompt_detail = prompt_detail
+        self._compiled = None
+
     @property
     def template(
         self,
     ) -> str:
         """Prompt Template."""
-        return self.run().format(
+        return self.compile().format(
             __SAMPLE__="{__SAMPLE__}", __EXAMPLES__="{__EXAMPLES__}"
         )
 
@@ -138,16 +203,7 @@ class BasePrompt(ABC):
             ) from error
 
         try:
-            cls.TEMPLATE = prompt["TEMPLATE"]
-            cls.PROMPT_DOMAIN = prompt.get("PROMPT_DOMAIN", "")
-            cls.PROMPT_LABELS = prompt.get("PROMPT_LABELS", "")
-            cls.PROMPT_DETAIL = prompt.get("PROMPT_DETAIL", "")
-            cls.PROMPT_SAMPLE = prompt.get("PROMPT_SAMPLE", "")
-            cls.ANSWER_FORMAT = prompt.get("ANSWER_FORMAT", "")
-            cls.CHAIN_THOUGHT = prompt.get("CHAIN_THOUGHT", "")
-            cls.SHOT_EXAMPLES = prompt.get("SHOT_EXAMPLES", "")
-
-            cls.PROMPT_EXAMPLE = prompt_text
+            cls.load_sections(prompt, prompt_text)
 
         except Exception as error:
             raise ValueError(
@@ -155,11 +211,62 @@ class BasePrompt(ABC):
                 f"are {yaml.load(cls.PROMPT_EXAMPLE, Loader=yaml.FullLoader)}"
             ) from error
 
-    def run(
+    @classmethod
+    def load_sections(
+        cls,
+        prompt: Dict[str, str],
+        prompt_text: str,
+    ) -> None:
+        """
+        Sets the prompt sections already parsed from a Promptmeteo prompt
+        string, so prompts read from the precompiled bundle do not need to
+        be parsed again.
+
+
+        Parameters
+        ----------
+
+        prompt : Dict[str, str]
+
+        prompt_text : str
+
+        """
+
+        cls.TEMPLATE = prompt["TEMPLATE"]
+        cls.PROMPT_DOMAIN = prompt.get("PROMPT_DOMAIN", "")
+        cls.PROMPT_LABELS = prompt.get("PROMPT_LABELS", "")
+        cls.PROMPT_DETAIL = prompt.get("PROMPT_DETAIL", "")
+        cls.PROMPT_SAMPLE = prompt.get("PROMPT_SAMPLE", "")
+        cls.ANSWER_FORMAT = prompt.get("ANSWER_FORMAT", "")
+        cls.CHAIN_THOUGHT = prompt.get("CHAIN_THOUGHT", "")
+        cls.SHOT_EXAMPLES = prompt.get("SHOT_EXAMPLES", "")
+
+        cls.PROMPT_EXAMPLE = prompt_text
+
+        # Invalidates the prompts already compiled from the old template
+        cls._REVISION = getattr(cls, "_REVISION", 0) + 1
+
+    def compile(
         self,
-    ) -> PromptTemplate:
+    ) -> CompiledPrompt:
         """
-        Returns the prompt template for the current task.
+        Returns the prompt template for the current task with the domain,
+        labels and detail sections already filled. The result is computed
+        once and reused until the prompt sections or the template change.
+        """
+
+        revision = getattr(self, "_REVISION", 0)
+        if self._compiled is None or self._compiled_revision != revision:
+            self._compiled = self._compile()
+            self._compiled_revision = revision
+
+        return self._compiled
+
+    def _compile(
+        self,
+    ) -> CompiledPrompt:
+        """
+        Fills the prompt sections into the task template.
         """
 
         prompt_variables = dict(
@@ -207,12 +314,33 @@ class BasePrompt(ABC):
             __DETAIL__=prompt_detail
         )
 
-        return PromptTemplate.from_template(
-            PromptTemplate.from_template(self.TEMPLATE).format(
-                **{
-                    k: v
-                    for (k, v) in prompt_variables.items()
-                    if k in [i[1] for i in Formatter().parse(self.TEMPLATE)]
-                }
-            )
+        template_variables = {
+            name for _, name, _, _ in Formatter().parse(self.TEMPLATE) if name
+        }
+        template = PromptTemplate.from_template(self.TEMPLATE).format(
+            **{
+                k: v
+                for (k, v) in prompt_variables.items()
+                if k in template_variables
+            }
+        )
+
+        return CompiledPrompt(
+            template=template,
+            input_variables=frozenset(
+                name for _, name, _, _ in Formatter().parse(template) if name
+            ),
+        )
+
+    def run(
+        self,
+    ) -> PromptTemplate:
+        """
+        Returns the prompt template for the current task.
+        """
+
+        compiled = self.compile()
+        return PromptTemplate(
+            template=compiled.template,
+            input_variables=sorted(compiled.input_variables),
         )
@@ -0,0 +1,348 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+"""
+Precompiled bundle of the prompt files.
+
+The `.prompt` files are parsed and validated once, when the package is
+built, and stored together in a single JSON file. Resolving the prompts
+at runtime is then a single file read instead of a YAML parse per prompt.
+If the bundle is missing, from another version or out of date with the
+prompt files, the prompt files are read as before.
+
+The bundle is built with:
+
+    python -m promptmeteo.prompts
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+from .base import BasePrompt
+
+BUNDLE_FILE = "prompts.json"
+BUNDLE_VERSION = 1
+
+prompts_dir = os.path.abspath(os.path.dirname(__file__))
+
+
+PromptKey = Tuple[str, str, str]
+
+
+def prompt_key(
+    file_name: str,
+    sep: str = "_",
+) -> PromptKey:
+    """
+    Returns the `(model_name, language, task)` of a prompt file named
+    `<model_name>_<language>_<task>.prompt`.
+    """
+
+    fields = os.path.basename(file_name)[: -len(".prompt")].split(sep)
+    if not file_name.endswith(".prompt") or len(fields) != 3:
+        raise ValueError(
+            f"Prompt file `{file_name}` does not follow the naming "
+            f"`<model_name>_<language>_<task>.prompt`."
+        )
+
+    return tuple(fields)
+
+
+def list_prompts(
+    folder: str = prompts_dir,
+) -> Dict[str, os.stat_result]:
+    """
+    Returns the prompt files in the folder with their status.
+    """
+
+    with os.scandir(folder) as entries:
+        return {
+            entry.name: entry.stat()
+            for entry in entries
+            if entry.is_file() and entry.name.endswith(".prompt")
+        }
+
+
+def file_digest(
+    path: str,
+) -> str:
+    """
+    Returns the sha256 checksum of a file.
+    """
+
+    with open(path, "rb") as fin:
+        return hashlib.sha256(fin.read()).hexdigest()
+
+
+def compile_prompt(
+    file_name: str,
+    prompt_text: str,
+) -> Dict[str, str]:
+    """
+    Parses a prompt file and checks that its template can be filled. The
+    prompt is compiled with dummy domain, labels and detail, so errors in
+    the template or in the sections are raised here and not when the prompt
+    is first used.
+
+
+    Parameters
+    ----------
+
+    file_name : str
+
+    prompt_text : str
+
+
+    Returns
+    -------
+
+    Dict[str, str]
+        Prompt sections.
+
+    """
+
+    prompt_cls = type("BundlePrompt", (BasePrompt,), {})
+
+    try:
+        prompt_cls.read_prompt(prompt_text)
+        prompt_cls(
+            prompt_domain="domain",
+            prompt_labels=["label"],
+            prompt_detail="detail",
+        ).compile()
+
+    except Exception as error:
+        raise ValueError(f"Malformed prompt file `{file_name}`.") from error
+
+    sections = {
+        name: getattr(prompt_cls, name)
+        for name in [
+            "TEMPLATE",
+            "PROMPT_DOMAIN",
+            "PROMPT_LABELS",
+            "PROMPT_DETAIL",
+            "PROMPT_SAMPLE",
+            "ANSWER_FORMAT",
+            "CHAIN_THOUGHT",
+            "SHOT_EXAMPLES",
+        ]
+    }
+
+    for name, section in sections.items():
+        if not isinstance(section, str):
+            raise ValueError(
+                f"Malformed prompt file `{file_name}`. Section `{name}` "
+                f"should be a string, not {type(section).__name__}."
+            )
+
+    return sections
+
+
+def build_bundle(
+    folder: str = prompts_dir,
+    target: Optional[str] = None,
+) -> Dict:
+    """
+    Compiles all the prompt files in the folder into a bundle and writes
+    it to `target`, by default `prompts.json` in the same folder. Malformed
+    prompt files raise a `ValueError` and no bundle is written.
+
+
+    Parameters
+    ----------
+
+    folder : str
+
+    target : Optional[str]
+
+
+    Returns
+    -------
+
+    Dict
+        The bundle.
+
+    """
+
+    prompts = {}
+    for file_name in sorted(list_prompts(folder)):
+        model_name, language, task = prompt_key(file_name)
+
+        with open(os.path.join(folder, file_name), "rb") as fin:
+            content = fin.read()
+
+        prompt_text = content.decode("utf-8")
+        prompts[file_name] = {
+            "model": model_name,
+            "language": language,
+            "task": task,
+            "size": len(content),
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "text": prompt_text,
+            "sections": compile_prompt(file_name, prompt_text),
+        }
+
+    bundle = {"version": BUNDLE_VERSION, "prompts": prompts}
+
+    target = target or os.path.join(folder, BUNDLE_FILE)
+    with open(target + ".tmp", "w", encoding="utf-8") as fout:
+        json.dump(bundle, fout, ensure_ascii=False, indent=1, sort_keys=True)
+        fout.write("\n")
+    os.replace(target + ".tmp", target)
+
+    return bundle
+
+
+def read_bundle(
+    folder: str = prompts_dir,
+    source: Optional[str] = None,
+    verify: bool = False,
+) -> Optional[Dict]:
+    """
+    Reads the bundle of the prompt files in the folder. Returns `None` if
+    there is no bundle, if it was written by another version or if it does
+    not match the prompt files, which are compared by name and size. Only
+    the prompt files not modified before the bundle was written are read
+    to compare their checksum, so a prompt edited in place without changing
+    its size is also detected. With `verify`, the checksums of all the
+    prompt files are compared, as `python -m promptmeteo.prompts --check`
+    does.
+
+
+    Parameters
+    ----------
+
+    folder : str
+
+    source : Optional[str]
+        Bundle file, by default `prompts.json` in the same folder.
+
+    verify : bool
+
+
+    Returns
+    -------
+
+    Optional[Dict]
+
+    """
+
+    source = source or os.path.join(folder, BUNDLE_FILE)
+
+    try:
+        with open(source, encoding="utf-8") as fin:
+            bundle = json.load(fin)
+            bundle_mtime = os.fstat(fin.fileno()).st_mtime_ns
+
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(bundle, dict) or bundle.get("version") != BUNDLE_VERSION:
+        return None
+
+    try:
+        prompts = bundle["prompts"]
+        files = list_prompts(folder)
+        if set(files) != set(prompts) or any(
+            files[file_name].st_size != prompt["size"]
+            for file_name, prompt in prompts.items()
+        ):
+            return None
+
+        modified = [
+            file_name
+            for file_name in prompts
+            if verify or files[file_name].st_mtime_ns >= bundle_mtime
+        ]
+        if any(
+            file_digest(os.path.join(folder, file_name))
+            != prompts[file_name]["sha256"]
+            for file_name in modified
+        ):
+            return None
+
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+    return bundle
+
+
+def load_prompts(
+    folder: str = prompts_dir,
+) -> Dict[PromptKey, Dict]:
+    """
+    Returns the prompts in the folder keyed by model name, language and
+    task. Prompts are taken from the bundle when it is up to date, otherwise
+    only their file names are listed and each prompt file is read when
+    its prompt is first built.
+    """
+
+    try:
+        bundle = read_bundle(folder)
+        if bundle is not None:
+            return {
+                (prompt["model"], prompt["language"], prompt["task"]): prompt
+                for prompt in bundle["prompts"].values()
+            }
+
+        return {
+            prompt_key(file_name): {"file": file_name}
+            for file_name in list_prompts(folder)
+        }
+
+    except Exception as error:
+        raise RuntimeError(
+            "Problems with the prompts file structure in directory "
+            "promptmeteo/prompts. The expected naming for the prompts "
+            "is `<model_name>_<language>_<task>.prompt`."
+        ) from error
+
+
+def main(
+    argv: Optional[List[str]] = None,
+) -> int:
+    """
+    Builds the prompt bundle, or checks that it is up to date with `--check`.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m promptmeteo.prompts",
+        description="Compile the prompt files into a single bundle.",
+    )
+    parser.add_argument("--folder", default=prompts_dir)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        if read_bundle(args.folder, args.output, verify=True) is None:
+            print("Prompt bundle is missing or out of date.", file=sys.stderr)
+            return 1
+        return 0
+
+    bundle = build_bundle(args.folder, args.output)
+    print(f"Compiled {len(bundle['prompts'])} prompt files.")
+    return 0
@@ -0,0 +1,459 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from .base import Base
+from .cache import cache_key
+from .models import SharedModels
+from .artifact import CHUNK_SIZE
+from .artifact import read_manifest
+from .document_qa import DocumentQA
+from .code_generator import CodeGenerator
+from .document_classifier import DocumentClassifier
+from .api_generator import APIGenerator
+from .api_formatter import APIFormatter
+from .summarizer import Summarizer
+
+TASK_CLASSES: Dict[str, Type[Base]] = {
+    task_class.TASK_TYPE: task_class
+    for task_class in [
+        DocumentQA,
+        CodeGenerator,
+        DocumentClassifier,
+        APIGenerator,
+        APIFormatter,
+        Summarizer,
+    ]
+}
+
+
+class ModelRegistry:
+    """
+    Registry of loaded models shared by the whole process.
+
+    Artifacts are identified by the hash of their contents, so the same
+    artifact is loaded once however many paths point to it, and every
+    caller gets the same model instance, with its vectorstore. Models loaded
+    from different artifacts share their LLM when they are configured with
+    the same provider, name, token and parameters, and their embeddings when
+    they are created with the same arguments.
+
+    The least recently used models are evicted when the memory of the
+    loaded models, estimated from the size of their artifacts, exceeds
+    `memory_budget`. The models returned are shared, so they must not be
+    trained or modified.
+    """
+
+    def __init__(
+        self,
+        memory_budget: Optional[int] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        memory_budget : Optional[int]
+            Maximum memory of the loaded models, in bytes. The last model
+            loaded is kept even if it exceeds the budget alone. If None, no
+            model is evicted.
+        """
+
+        self.memory_budget = memory_budget
+        self._lock = threading.RLock()
+        self._models: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._hashes: Dict[Tuple, str] = {}
+        self._loading: Dict[str, threading.Lock] = {}
+        self._shared_models = SharedModels()
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def get(
+        self,
+        model_path: str,
+        model_class: Optional[Type[Base]] = None,
+        **kwargs,
+    ) -> Base:
+        """
+        Returns the model saved in `model_path`, loading it if no artifact
+        with the same contents has been loaded with the same arguments.
+
+        Parameters
+        ----------
+        model_path : str
+            Path of the model artifact, or folder where it was extracted.
+        model_class : Optional[Type[Base]]
+            Class of the model. By default, it is the class of the task
+            recorded in the artifact. Artifacts saved by previous versions
+            do not record it.
+        kwargs
+            Arguments of `load_model()`, such as `mmap`.
+
+        Returns
+        -------
+        Base
+            The loaded model.
+        """
+
+        digest = self._content_hash(model_path)
+        key = _load_key(digest, model_class, kwargs)
+
+        model = self._lookup(key, model_path)
+        if model is not None:
+            return model
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        try:
+            with loading:
+                model = self._lookup(key, model_path)
+                if model is not None:
+                    return model
+
+                model_class = model_class or self._model_class(model_path)
+                with self._shared_models.activate():
+                    model = model_class.load_model(model_path, **kwargs)
+
+                with self._lock:
+                    self._misses += 1
+                    self._models[key] = {
+                        "model": model,
+                        "digest": digest,
+                        "size": _artifact_size(model_path),
+                        "paths": {os.path.abspath(model_path)},
+                    }
+                    self._evict()
+
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+        return model
+
+    def remove(
+        self,
+        model_path: str,
+    ) -> None:
+        """
+        Removes from the registry the models loaded from `model_path`,
+        whatever the arguments they were loaded with.
+        """
+
+        digest = self._content_hash(model_path)
+        with self._lock:
+            for key in [
+                key
+                for key, entry in self._models.items()
+                if entry["digest"] == digest
+            ]:
+                del self._models[key]
+
+    def clear(
+        self,
+    ) -> None:
+        """
+        Removes every model from the registry and resets its statistics.
+        """
+
+        with self._lock:
+            self._models.clear()
+            self._hashes.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    @property
+    def stats(
+        self,
+    ) -> Dict[str, Any]:
+        """
+        Statistics of the registry: the number of loaded models and of
+        paths pointing to them, their estimated memory, the hits, misses and
+        evictions, and the number of times an LLM or embeddings were shared
+        instead of created.
+        """
+
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "paths": sum(
+                    len(entry["paths"]) for entry in self._models.values()
+                ),
+                "memory": self.memory,
+                "memory_budget": self.memory_budget,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "shared_llms": self._shared_models.shared_llms,
+                "shared_embeddings": self._shared_models.shared_embeddings,
+            }
+
+    @property
+    def memory(
+        self,
+    ) -> int:
+        """
+        Estimated memory of the loaded models, in bytes.
+        """
+
+        return sum(entry["size"] for entry in self._models.values())
+
+    def _lookup(
+        self,
+        key: str,
+        model_path: str,
+    ) -> Optional[Base]:
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                return None
+
+            self._models.move_to_end(key)
+            entry["paths"].add(os.path.abspath(model_path))
+            self._hits += 1
+
+            return entry["model"]
+
+    def _evict(
+        self,
+    ) -> None:
+        """
+        Evicts the least recently used models until the loaded models fit
+        in the memory budget.
+        """
+
+        if self.memory_budget is None:
+            return
+
+        while len(self._models) > 1 and self.memory > self.memory_budget:
+            _, entry = self._models.popitem(last=False)
+            self._evictions += 1
+            if any(
+                other["digest"] == entry["digest"]
+                for other in self._models.values()
+            ):
+                continue
+            for key in [
+                key
+                for key, value in self._hashes.items()
+                if value == entry["digest"]
+            ]:
+                del self._hashes[key]
+
+    def _content_hash(
+        self,
+        model_path: str,
+    ) -> str:
+        """
+        Hash of the contents of the artifact and of its `.delta` file. The
+        manifest of the format version 2 has the checksums of every member,
+        so only the manifest is hashed. The hash is remembered until the
+        artifact is modified.
+        """
+
+        key = (
+            os.path.abspath(model_path),
+            _stat(model_path),
+            _stat(f"{model_path}.delta"),
+        )
+
+        with self._lock:
+            digest = self._hashes.get(key)
+        if digest is not None:
+            return digest
+
+        hasher = hashlib.sha256()
+        manifest = read_manifest(model_path)
+        if manifest is not None:
+            hasher.update(json.dumps(manifest, sort_keys=True).encode("utf-8"))
+        else:
+            for path in _files(model_path):
+                _update(hasher, path)
+
+        if os.path.exists(f"{model_path}.delta"):
+            _update(hasher, f"{model_path}.delta")
+
+        digest = hasher.hexdigest()
+        with self._lock:
+            self._hashes[key] = digest
+
+        return digest
+
+    @staticmethod
+    def _model_class(
+        model_path: str,
+    ) -> Type[Base]:
+        """
+        Class of the task recorded in the manifest of the artifact.
+        """
+
+        manifest = read_manifest(model_path) or {}
+        task_type = manifest.get("task_type")
+        if task_type not in TASK_CLASSES:
+            raise ValueError(
+                f"ModelRegistry error in `get()`. The artifact "
+                f"{model_path} does not record the class of its model. "
+                f"Please, give its `model_class` (i.e. DocumentClassifier)."
+            )
+
+        return TASK_CLASSES[task_type]
+
+
+def _files(
+    model_path: str,
+) -> List[str]:
+    """
+    Files of an artifact, which is a single file or a folder.
+    """
+
+    if not os.path.isdir(model_path):
+        return [model_path]
+
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(model_path)
+        for name in names
+    )
+
+
+def _stat(
+    path: str,
+) -> Optional[Tuple[int, int]]:
+    """
+    Size and modification time of a file or of the manifest of a folder.
+    """
+
+    if os.path.isdir(path):
+        path = os.path.join(path, "manifest.json")
+    if not os.path.exists(path):
+        return None
+
+    stat = os.stat(path)
+
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _update(
+    hasher: Any,
+    path: str,
+) -> None:
+    with open(path, "rb") as fin:
+        while True:
+            chunk = fin.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+
+
+def _load_key(
+    digest: str,
+    model_class: Optional[Type[Base]],
+    kwargs: Dict[str, Any],
+) -> str:
+    """
+    Key of a loaded model: the hash of the artifact contents and the
+    arguments of `load_model()` with their defaults, so models loaded
+    memory-mapped, lazily or without verification are not returned to
+    callers who asked for a fully loaded model.
+    """
+
+    options = {
+        "mmap": False,
+        "cache_dir": None,
+        "verify": True,
+        "lazy": False,
+        **kwargs,
+    }
+    if options["cache_dir"] is not None:
+        options["cache_dir"] = os.path.abspath(options["cache_dir"])
+
+    return cache_key(
+        digest,
+        (
+            f"{model_class.__module__}.{model_class.__qualname__}"
+            if model_class is not None
+            else None
+        ),
+        options,
+    )
+
+
+def _artifact_size(
+    model_path: str,
+) -> int:
+    return sum(os.path.getsize(path) for path in _files(model_path))
+
+
+def _memory_budget() -> Optional[int]:
+    budget = os.environ.get("PROMPTMETEO_REGISTRY_MEMORY_BUDGET")
+
+    return int(budget) if budget else None
+
+
+_registry = ModelRegistry(memory_budget=_memory_budget())
+
+
+def get(
+    model_path: str,
+    model_class: Optional[Type[Base]] = None,
+    **kwargs,
+) -> Base:
+    """
+    Returns the model saved in `model_path` from the process registry. See
+    `ModelRegistry.get()`. The memory budget of the registry is read from
+    the `PROMPTMETEO_REGISTRY_MEMORY_BUDGET` environment variable, in bytes.
+    """
+
+    return _registry.get(model_path, model_class, **kwargs)
+
+
+def stats() -> Dict[str, Any]:
+    """
+    Statistics of the process registry. See `ModelRegistry.stats`.
+    """
+
+    return _registry.stats
+
+
+def clear() -> None:
+    """
+    Removes every model from the process registry.
+    """
+
+    _registry.clear()
+
+
+def set_memory_budget(
+    memory_budget: Optional[int],
+) -> None:
+    """
+    Sets the memory budget of the process registry, in bytes, evicting the
+    least recently used models that do not fit.
+    """
+
+    with _registry._lock:
+        _registry.memory_budget = memory_budget
+        _registry._evict()
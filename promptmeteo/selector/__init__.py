@@ -24,13 +24,16 @@ import os
 from enum import Enum
 from typing import List
 from typing import Dict
+from typing import Optional
 
-from langchain.embeddings.base import Embeddings
+from langchain_core.embeddings import Embeddings
 
 from .base import BaseSelector
+from .base import BaseSelectorStatic
 from .base import BaseSelectorSupervised
 from .base import BaseSelectorUnsupervised
 from .base import SelectorAlgorithms
+from .index import IndexTypes
 
 
 class SelectorTypes(str, Enum):
@@ -40,6 +43,7 @@ class SelectorTypes(str, Enum):
 
     SUPERVISED: str = "supervised"
     UNSUPERVISED: str = "unsupervised"
+    STATIC: str = "static"
 
 
 class SelectorFactory:
@@ -51,10 +55,13 @@ class SelectorFactory:
     def factory_method(
         cls,
         language: str,
-        embeddings: Embeddings,
+        embeddings: Optional[Embeddings],
         selector_k: int,
         selector_type: str,
         selector_algorithm: str,
+        selector_index: str = IndexTypes.FLAT.value,
+        selector_index_params: Optional[Dict] = None,
+        embedding_options: Optional[Dict] = None,
     ) -> BaseSelector:
         """
         Returns and instance of a BaseSelector object depending on the
@@ -76,6 +83,9 @@ class SelectorFactory:
                 )
             selector_cls = BaseSelectorUnsupervised
 
+        elif selector_type == SelectorTypes.STATIC.value:
+            selector_cls = BaseSelectorStatic
+
         else:
             raise ValueError(
                 f"`{cls.__name__}` error in `factory_method()` . "
@@ -88,4 +98,7 @@ class SelectorFactory:
             embeddings=embeddings,
             selector_k=selector_k,
             selector_algorithm=selector_algorithm,
+            selector_index=selector_index,
+            selector_index_params=selector_index_params,
+            embedding_options=embedding_options,
         )
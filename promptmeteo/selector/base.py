@@ -20,26 +20,97 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
 
+import os
+import json
+import uuid
 from abc import ABC
 from enum import Enum
+from typing import Any
+from typing import Dict
 from typing import List
+from typing import Mapping
 from typing import Optional
+from typing import Tuple
+from typing import Union
 
 try:
     from typing import Self
 except ImportError:
     from typing_extensions import Self
 
-from langchain.vectorstores import FAISS
-from langchain.embeddings.base import Embeddings
+from langchain_core.embeddings import Embeddings
 
-from langchain.prompts import PromptTemplate
-from langchain.prompts import FewShotPromptTemplate
-from langchain.prompts.example_selector import (
+from langchain_core.prompts import PromptTemplate
+from langchain_core.prompts import FewShotPromptTemplate
+from langchain_core.example_selectors import (
     SemanticSimilarityExampleSelector,
-    MaxMarginalRelevanceExampleSelector,
 )
 from .custom_selectors import BalancedSemanticSamplesSelector
+from .custom_selectors import MaxMarginalRelevanceSelector
+from .custom_selectors import sorted_values
+from .embedding import embed_texts
+from .embedding import embed_queries
+from .embedding import check_embedding_options
+from .embedding import embeddings_fingerprint
+from .embedding import check_embeddings_fingerprint
+from .pruning import prune_examples
+from .index import IndexTypes
+from .index import build_index
+from .index import check_index
+from .index import read_index
+from .index import read_vectors
+from .index import remove_rows
+from .index import set_search_params
+from .index import stores_vectors
+from .index import to_mappable
+
+
+def load_array(
+    data: Any,
+) -> Any:
+    """
+    Reads an array saved with `numpy.save()` from the bytes of its file,
+    copying its data once, instead of twice as `numpy.load()` of a
+    `BytesIO` does.
+    """
+
+    import io
+    import numpy as np
+
+    view = memoryview(data).cast("B")
+    header = io.BytesIO(bytes(view[: 1 << 16]))
+    version = np.lib.format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(
+            header
+        )
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(
+            header
+        )
+    else:
+        return np.load(io.BytesIO(view))
+
+    array = np.frombuffer(
+        view,
+        dtype=dtype,
+        count=int(np.prod(shape)),
+        offset=header.tell(),
+    )
+
+    return array.reshape(shape, order="F" if fortran_order else "C").copy()
+
+
+def faiss_vectorstore():
+    """
+    Returns the FAISS vectorstore class. It is imported the first time a
+    selector is trained or loaded, because importing it loads FAISS and the
+    langchain community vectorstores.
+    """
+
+    from langchain.vectorstores import FAISS
+
+    return FAISS
 
 
 class SelectorAlgorithms(str, Enum):
@@ -58,6 +129,8 @@ class BaseSelector(ABC):
     """
 
     SELECTOR = None
+    VECTORS_FILE: str = "vectors.npy"
+    EMBEDDINGS_FILE: str = "embeddings.json"
 
     def __init__(
         self,
@@ -65,16 +138,36 @@ class BaseSelector(ABC):
         embeddings: Embeddings,
         selector_k: int,
         selector_algorithm: str,
+        selector_index: str = IndexTypes.FLAT.value,
+        selector_index_params: Optional[Dict] = None,
+        embedding_options: Optional[Dict] = None,
     ) -> None:
         self._language = language
         self._embeddings = embeddings
         self._selector_k = selector_k
+        self._selector_index = selector_index
+        self._selector_index_params = selector_index_params or {}
+        self._embedding_options = embedding_options or {}
+        self._selector = None
+        self._read_only = False
+        self._vectors: Optional[Any] = None
+        self.train_report: Optional[Dict[str, Any]] = None
+        self._delta_added: Dict[str, Tuple[str, Dict, List[float]]] = {}
+        self._delta_removed: List[str] = []
+
+        try:
+            check_index(selector_index, selector_index_params)
+            check_embedding_options(embedding_options)
+        except ValueError as error:
+            raise ValueError(
+                f"`{self.__class__.__name__}` error in __init__. {error}"
+            ) from error
 
         if selector_algorithm == SelectorAlgorithms.SIMILARITY.value:
             self.selector = SemanticSimilarityExampleSelector
 
         elif selector_algorithm == SelectorAlgorithms.RELEVANCE.value:
-            self.selector = MaxMarginalRelevanceExampleSelector
+            self.selector = MaxMarginalRelevanceSelector
 
         elif (
             selector_algorithm
@@ -105,26 +198,307 @@ class BaseSelector(ABC):
         """
         return self.run("").format(__INPUT__="{__INPUT__}")
 
-    def load_example_selector(self, model_path: str, **kwargs) -> Self:
+    def save_example_selector(
+        self,
+        model_path: str,
+        vectors_dtype: str = "float32",
+    ) -> Self:
+        """
+        Save the vectorstore database to a disk folder, together with the
+        fingerprint of the embeddings that computed its vectors. The raw
+        vectors of the examples are also saved, stored as `vectors_dtype`,
+        when the index does not keep them exactly.
+        """
+
+        import numpy as np
+
+        if vectors_dtype not in ("float32", "float16"):
+            raise ValueError(
+                f"`{self.__class__.__name__}` error in "
+                f"`save_example_selector()`. `vectors_dtype` value "
+                f"`{vectors_dtype}` is not in the available values: "
+                f"['float32', 'float16']"
+            )
+
+        self.vectorstore.save_local(model_path)
+
+        if self.selector == BalancedSemanticSamplesSelector:
+            self._selector.save_partitions(model_path)
+
+        if self._vectors is not None:
+            np.save(
+                os.path.join(model_path, self.VECTORS_FILE),
+                np.asarray(self._vectors, dtype=vectors_dtype),
+            )
+
+        with open(
+            os.path.join(model_path, self.EMBEDDINGS_FILE),
+            "w",
+            encoding="utf-8",
+        ) as fout:
+            json.dump(
+                embeddings_fingerprint(
+                    self._embeddings, self.vectorstore.index.d
+                ),
+                fout,
+            )
+
+        return self
+
+    @property
+    def has_delta(self) -> bool:
         """
-        Load a vectorstore database from a disk file
+        Whether examples have been added or removed since the vectorstore
+        was trained, loaded or saved entirely.
         """
 
-        vectorstore = FAISS.load_local(
+        return bool(self._delta_added or self._delta_removed)
+
+    def reset_delta(self) -> Self:
+        """
+        Forgets the examples added or removed until now.
+        """
+
+        self._delta_added = {}
+        self._delta_removed = []
+        return self
+
+    @staticmethod
+    def prepare_mmap(model_path: str) -> None:
+        """
+        Rewrites a vectorstore folder saved with `save_example_selector()` so
+        it can be loaded with `load_example_selector(mmap=True)`: the indexes
+        are converted to a type FAISS can memory-map and the documents are
+        written in the format of `MmapDocstore`.
+        """
+
+        import pickle
+        import faiss
+        from .docstore import MmapDocstore
+
+        index_path = os.path.join(model_path, "index.faiss")
+        faiss.write_index(to_mappable(faiss.read_index(index_path)), index_path)
+
+        with open(os.path.join(model_path, "index.pkl"), "rb") as fin:
+            docstore, index_to_docstore_id = pickle.load(fin)
+        MmapDocstore.write(
+            docstore,
+            [doc_id for _, doc_id in sorted(index_to_docstore_id.items())],
             model_path,
-            self._embeddings,
+        )
+
+        partitions_path = os.path.join(
+            model_path, BalancedSemanticSamplesSelector.PARTITIONS_FILE
+        )
+        if os.path.exists(partitions_path):
+            with open(partitions_path, encoding="utf-8") as fin:
+                manifest = json.load(fin)
+            for value in manifest.values():
+                path = os.path.join(model_path, value["file"])
+                faiss.write_index(to_mappable(faiss.read_index(path)), path)
+
+    def load_example_selector(
+        self,
+        model_path: Union[str, Mapping[str, Any]],
+        mmap: bool = False,
+        **kwargs,
+    ) -> Self:
+        """
+        Load a vectorstore database from a disk folder, or from the contents
+        of its files read in memory, keyed by file name. With `mmap`, the
+        folder must have been prepared with `prepare_mmap()`, and the index
+        and the documents are memory-mapped read-only instead of read into
+        memory.
+
+        The embeddings of the selector are checked against the fingerprint
+        of the embeddings that computed the saved vectors, if any.
+        """
+
+        import numpy as np
+
+        if not isinstance(model_path, str):
+            import pickle
+
+            docstore, index_to_docstore_id = pickle.loads(
+                model_path["index.pkl"]
+            )
+            vectorstore = faiss_vectorstore()(
+                self._embeddings,
+                read_index(model_path["index.faiss"]),
+                docstore,
+                index_to_docstore_id,
+            )
+        elif mmap:
+            from .docstore import MmapDocstore
+
+            docstore = MmapDocstore(model_path)
+            vectorstore = faiss_vectorstore()(
+                self._embeddings,
+                read_index(os.path.join(model_path, "index.faiss"), mmap=True),
+                docstore,
+                dict(enumerate(docstore.ids)),
+            )
+        else:
+            vectorstore = faiss_vectorstore().load_local(
+                model_path,
+                self._embeddings,
+            )
+        # The raw vectors are only needed when the index approximates them
+        fingerprint, self._vectors = None, None
+        exact = stores_vectors(vectorstore.index)
+        if not isinstance(model_path, str):
+            if self.EMBEDDINGS_FILE in model_path:
+                fingerprint = json.loads(
+                    bytes(model_path[self.EMBEDDINGS_FILE])
+                )
+            if self.VECTORS_FILE in model_path and not exact:
+                self._vectors = load_array(model_path[self.VECTORS_FILE])
+        else:
+            fingerprint_path = os.path.join(model_path, self.EMBEDDINGS_FILE)
+            if os.path.exists(fingerprint_path):
+                with open(fingerprint_path, encoding="utf-8") as fin:
+                    fingerprint = json.load(fin)
+            vectors_path = os.path.join(model_path, self.VECTORS_FILE)
+            if os.path.exists(vectors_path) and not exact:
+                self._vectors = np.load(vectors_path, mmap_mode="r")
+
+        if fingerprint is not None:
+            try:
+                check_embeddings_fingerprint(
+                    fingerprint, self._embeddings, vectorstore.index.d
+                )
+            except ValueError as error:
+                raise ValueError(
+                    f"`{self.__class__.__name__}` error in "
+                    f"`load_example_selector()`. {error}"
+                ) from error
+
+        self._read_only = mmap
+        set_search_params(
+            vectorstore.index,
+            self._selector_index,
+            self._selector_index_params,
         )
 
         if self.selector == BalancedSemanticSamplesSelector:
             self._selector = self.selector(
                 vectorstore=vectorstore, k=self._selector_k, **kwargs
             )
+            self._selector.load_partitions(
+                model_path, mmap=mmap, vectors=self._vectors
+            )
         else:
             self._selector = self.selector(
                 vectorstore=vectorstore, k=self._selector_k
             )
+            if self.selector == MaxMarginalRelevanceSelector:
+                self._selector.reset_vectors(self._vectors)
 
-        return self
+        return self.reset_delta()
+
+    def _build_selector(
+        self,
+        examples: List[Dict],
+        k: int,
+        vectors: Optional[Any] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Embeds the examples, unless their `vectors` are given, and creates
+        the example selector over a FAISS index of the type `selector_index`.
+        """
+
+        import numpy as np
+        from langchain_core.documents import Document
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+
+        self.reset_delta()
+        texts = self._example_texts(examples, kwargs.get("input_keys"))
+
+        if vectors is None:
+            vectors = self._embed_texts(texts)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        index = build_index(
+            vectors, self._selector_index, self._selector_index_params
+        )
+        self._vectors = None if stores_vectors(index) else vectors
+
+        ids = [str(uuid.uuid4()) for _ in texts]
+        vectorstore = faiss_vectorstore()(
+            self._embeddings,
+            index,
+            InMemoryDocstore(
+                {
+                    idx: Document(page_content=text, metadata=example)
+                    for idx, text, example in zip(ids, texts, examples)
+                }
+            ),
+            dict(enumerate(ids)),
+        )
+
+        if self.selector == BalancedSemanticSamplesSelector:
+            return self.selector.from_vectorstore(
+                vectorstore=vectorstore, k=k, vectors=vectors, **kwargs
+            )
+
+        selector = self.selector(vectorstore=vectorstore, k=k)
+        if self.selector == MaxMarginalRelevanceSelector:
+            selector.reset_vectors(self._vectors)
+
+        return selector
+
+    def _raw_vectors(
+        self,
+    ) -> Optional[Any]:
+        """
+        Raw vectors of the examples, in index order. They are read from the
+        index when it keeps them exactly, and they are None when the index
+        approximates them and they were not saved with the model.
+        """
+
+        if self._vectors is not None:
+            return self._vectors
+
+        index = self.vectorstore.index
+        if stores_vectors(index):
+            return read_vectors(index)
+
+        return None
+
+    def _embed_texts(
+        self,
+        texts: List[str],
+    ) -> Any:
+        """
+        Embeds the texts of the examples in chunks, as configured by the
+        `embedding_options` of the selector.
+        """
+
+        return embed_texts(
+            self._embeddings,
+            texts,
+            **check_embedding_options(self._embedding_options),
+        )
+
+    @staticmethod
+    def _example_texts(
+        examples: List[Dict],
+        input_keys: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Texts embedded for the examples, as the example selectors build them.
+        """
+
+        return [
+            " ".join(
+                sorted_values(
+                    {key: example[key] for key in input_keys}
+                    if input_keys
+                    else example
+                )
+            )
+            for example in examples
+        ]
 
 
 class BaseSelectorSupervised(BaseSelector):
@@ -132,9 +506,16 @@ class BaseSelectorSupervised(BaseSelector):
         self,
         examples: List[str],
         annotations: List[str],
+        deduplicate: bool = False,
+        dedup_threshold: Optional[float] = None,
+        coreset_size: Optional[int] = None,
     ) -> Self:
         """
-        Creates the vectorstor with the training samples.
+        Creates the vectorstor with the training samples. Optionally, exact
+        duplicates, near-duplicates with a cosine similarity of at least
+        `dedup_threshold` and the examples left out of a coreset of
+        `coreset_size` examples per annotation are not added. The examples
+        dropped are reported in `train_report`.
         """
 
         examples = [
@@ -142,39 +523,522 @@ class BaseSelectorSupervised(BaseSelector):
             for example, annotation in zip(examples, annotations)
         ]
         if self.selector == BalancedSemanticSamplesSelector:
-            self._selector = self.selector.from_examples(
-                examples=examples,
+            kwargs = dict(
                 class_list=list(set(annotations)),
                 class_key="__OUTPUT__",
-                embeddings=self._embeddings,
-                vectorstore_cls=FAISS,
-                k=self._selector_k,
                 input_keys=["__INPUT__"],
             )
         else:
-            self._selector = self.selector.from_examples(
-                examples=examples,
-                embeddings=self._embeddings,
-                vectorstore_cls=FAISS,
-                k=self._selector_k,
+            kwargs = {}
+
+        vectors = None
+        self.train_report = None
+        if deduplicate or dedup_threshold is not None or coreset_size:
+            pruned = prune_examples(
+                self._example_texts(examples, kwargs.get("input_keys")),
+                annotations,
+                self._embed_texts,
+                deduplicate=deduplicate,
+                dedup_threshold=dedup_threshold,
+                coreset_size=coreset_size,
             )
+            examples = [examples[position] for position in pruned["kept"]]
+            vectors = pruned["vectors"]
+            self.train_report = pruned["report"]
+
+        self._selector = self._build_selector(
+            examples, k=self._selector_k, vectors=vectors, **kwargs
+        )
 
         return self
 
-    def run(self, sample: str) -> FewShotPromptTemplate:
+    def add_examples(
+        self,
+        examples: List[str],
+        annotations: List[str],
+    ) -> List[str]:
         """
-        Creates the FewShotPromptTemplate from the samples of the vectorstore.
+        Adds examples to the trained vectorstore without rebuilding it. Only
+        the new examples are embedded. Examples already in the vectorstore,
+        with the same text and annotation, are not added again.
+
+        Returns
+        -------
+        List[str]
+            Id of each example in the vectorstore, also for the duplicated
+            ones.
         """
 
         if self._selector is None:
             raise RuntimeError(
                 f"`{self.__class__.__name__}` object has no vector store "
-                f"created when executing `run()` method. You should call "
+                f"created when executing `add_examples()` method. You should "
+                f"call method `load_example_selector()` `train()` to create "
+                f"a vector store before."
+            )
+
+        if self._read_only:
+            raise RuntimeError(
+                f"`{self.__class__.__name__}` error in `add_examples()`. The "
+                f"vectorstore has been memory-mapped read-only. Load it "
+                f"without `mmap` to modify its examples."
+            )
+
+        known = {
+            (document.metadata["__INPUT__"], document.metadata["__OUTPUT__"]): (
+                doc_id
+            )
+            for doc_id, document in self._documents()
+        }
+
+        ids, new_ids, new_examples = [], [], []
+        for example, annotation in zip(examples, annotations):
+            key = (example, annotation)
+            if key not in known:
+                known[key] = str(uuid.uuid4())
+                new_ids.append(known[key])
+                new_examples.append(
+                    {"__INPUT__": example, "__OUTPUT__": annotation}
+                )
+            ids.append(known[key])
+
+        if new_examples:
+            texts = self._example_texts(
+                new_examples, getattr(self._selector, "input_keys", None)
+            )
+            vectors = self._embed_texts(texts)
+            self._add_embeddings(new_ids, texts, new_examples, list(vectors))
+
+        return ids
+
+    def remove_examples(
+        self,
+        ids: List[str],
+    ) -> Self:
+        """
+        Removes the examples with the given ids from the vectorstore.
+        """
+
+        import numpy as np
+
+        if self._selector is None:
+            raise RuntimeError(
+                f"`{self.__class__.__name__}` object has no vector store "
+                f"created when executing `remove_examples()` method. You "
+                f"should call method `load_example_selector()` `train()` to "
+                f"create a vector store before."
+            )
+
+        if self._read_only:
+            raise RuntimeError(
+                f"`{self.__class__.__name__}` error in `remove_examples()`. "
+                f"The vectorstore has been memory-mapped read-only. Load it "
+                f"without `mmap` to modify its examples."
+            )
+
+        vectorstore = self.vectorstore
+        rows = {
+            doc_id: row
+            for row, doc_id in vectorstore.index_to_docstore_id.items()
+        }
+        missing = [doc_id for doc_id in ids if doc_id not in rows]
+        if missing:
+            raise ValueError(
+                f"`{self.__class__.__name__}` error in `remove_examples()`. "
+                f"Ids not found in the vectorstore: {missing}"
+            )
+
+        ids = list(dict.fromkeys(ids))
+        removed = set(ids)
+        if self._vectors is not None:
+            self._vectors = np.delete(
+                self._vectors, [rows[doc_id] for doc_id in ids], axis=0
+            )
+        vectorstore.index = remove_rows(
+            vectorstore.index,
+            [rows[doc_id] for doc_id in ids],
+            self._selector_index,
+            self._selector_index_params,
+            vectors=self._vectors,
+        )
+        vectorstore.docstore.delete(ids)
+        vectorstore.index_to_docstore_id = dict(
+            enumerate(
+                doc_id
+                for _, doc_id in sorted(
+                    vectorstore.index_to_docstore_id.items()
+                )
+                if doc_id not in removed
+            )
+        )
+
+        if self.selector == BalancedSemanticSamplesSelector:
+            self._selector.remove_from_partitions(ids)
+        elif self.selector == MaxMarginalRelevanceSelector:
+            self._selector.reset_vectors(self._vectors)
+
+        for doc_id in ids:
+            if self._delta_added.pop(doc_id, None) is None:
+                self._delta_removed.append(doc_id)
+
+        return self
+
+    def reindex(
+        self,
+        selector_index: Optional[str] = None,
+        selector_index_params: Optional[Dict] = None,
+    ) -> Self:
+        """
+        Rebuilds the vectorstore index, and the class sub-indexes of the
+        balanced selector, from the raw vectors of the examples, so no
+        example is embedded again. Indexes that approximate the vectors can
+        only be reindexed when their raw vectors were saved with the model.
+
+        Parameters
+        ----------
+        selector_index : Optional[str]
+            Type of the new index. By default, the current one.
+        selector_index_params : Optional[Dict]
+            Parameters of the new index. By default, the current ones if the
+            index type does not change.
+
+        Returns
+        -------
+        BaseSelector
+            The reindexed selector.
+        """
+
+        import numpy as np
+
+        if self._selector is None:
+            raise RuntimeError(
+                f"`{self.__class__.__name__}` object has no vector store "
+                f"created when executing `reindex()` method. You should "
+                f"call method `load_example_selector()` `train()` to create "
+                f"a vector store before."
+            )
+
+        if self._read_only:
+            raise RuntimeError(
+                f"`{self.__class__.__name__}` error in `reindex()`. The "
+                f"vectorstore has been memory-mapped read-only. Load it "
+                f"without `mmap` to reindex it."
+            )
+
+        if selector_index_params is None:
+            selector_index_params = (
+                self._selector_index_params
+                if selector_index in (None, self._selector_index)
+                else {}
+            )
+        selector_index = selector_index or self._selector_index
+
+        try:
+            check_index(selector_index, selector_index_params)
+        except ValueError as error:
+            raise ValueError(
+                f"`{self.__class__.__name__}` error in `reindex()`. {error}"
+            ) from error
+
+        vectors = self._raw_vectors()
+        if vectors is None:
+            raise ValueError(
+                f"`{self.__class__.__name__}` error in `reindex()`. The "
+                f"raw vectors of the examples were not saved with the "
+                f"model, and the `{self._selector_index}` index does not "
+                f"keep them exactly. Train the model again."
+            )
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.vectorstore.index = build_index(
+            vectors, selector_index, selector_index_params
+        )
+        self._vectors = (
+            None if stores_vectors(self.vectorstore.index) else vectors
+        )
+        self._selector_index = selector_index
+        self._selector_index_params = selector_index_params
+
+        if self.selector == BalancedSemanticSamplesSelector:
+            self._selector.build_partitions(vectors)
+        elif self.selector == MaxMarginalRelevanceSelector:
+            self._selector.reset_vectors(self._vectors)
+
+        return self
+
+    def _documents(self) -> List:
+        """
+        Pairs of id and document of the vectorstore, in index order.
+        """
+
+        vectorstore = self.vectorstore
+        return [
+            (doc_id, vectorstore.docstore.search(doc_id))
+            for _, doc_id in sorted(vectorstore.index_to_docstore_id.items())
+        ]
+
+    def _add_embeddings(
+        self,
+        ids: List[str],
+        texts: List[str],
+        examples: List[Dict],
+        vectors: List[List[float]],
+    ) -> None:
+        """
+        Adds already embedded examples to the vectorstore.
+        """
+
+        import numpy as np
+
+        self.vectorstore.add_embeddings(
+            list(zip(texts, vectors)), metadatas=examples, ids=ids
+        )
+        if self._vectors is not None:
+            self._vectors = np.vstack(
+                [
+                    np.asarray(self._vectors, dtype=np.float32),
+                    np.asarray(vectors, dtype=np.float32),
+                ]
+            )
+
+        if self.selector == BalancedSemanticSamplesSelector:
+            self._selector.add_to_partitions(
+                ids,
+                vectors,
+                [example[self._selector.class_key] for example in examples],
+            )
+        elif self.selector == MaxMarginalRelevanceSelector:
+            self._selector.reset_vectors(self._vectors)
+
+        for doc_id, text, example, vector in zip(ids, texts, examples, vectors):
+            self._delta_added[doc_id] = (text, example, list(vector))
+
+    def save_delta(self, model_path: str) -> Self:
+        """
+        Saves the examples added and removed since the vectorstore was
+        trained, loaded or saved entirely into a disk folder.
+        """
+
+        import numpy as np
+
+        os.makedirs(model_path, exist_ok=True)
+
+        added = [
+            {"id": doc_id, "text": text, "metadata": example}
+            for doc_id, (text, example, _) in self._delta_added.items()
+        ]
+        with open(
+            os.path.join(model_path, "delta.json"), "w", encoding="utf-8"
+        ) as fout:
+            json.dump({"added": added, "removed": self._delta_removed}, fout)
+
+        np.save(
+            os.path.join(model_path, "delta.npy"),
+            np.asarray(
+                [vector for _, _, vector in self._delta_added.values()],
+                dtype=np.float32,
+            ),
+        )
+
+        return self
+
+    def load_delta(self, model_path: Union[str, Mapping[str, Any]]) -> Self:
+        """
+        Applies the examples added and removed saved with `save_delta()`,
+        from their folder or from the contents of its files read in memory.
+        """
+
+        import numpy as np
+
+        if isinstance(model_path, str):
+            with open(
+                os.path.join(model_path, "delta.json"), encoding="utf-8"
+            ) as fin:
+                delta = json.load(fin)
+            vectors = np.load(os.path.join(model_path, "delta.npy"))
+        else:
+            delta = json.loads(bytes(model_path["delta.json"]))
+            vectors = load_array(model_path["delta.npy"])
+
+        if delta["removed"]:
+            self.remove_examples(delta["removed"])
+
+        if delta["added"]:
+            self._add_embeddings(
+                [item["id"] for item in delta["added"]],
+                [item["text"] for item in delta["added"]],
+                [item["metadata"] for item in delta["added"]],
+                vectors.tolist(),
+            )
+
+        return self
+
+    def select(
+        self,
+        sample: str,
+        ordered: bool = False,
+    ) -> List[Dict]:
+        """
+        Selects the examples of the vectorstore for a sample, from the most
+        to the least relevant. The class balanced selector shuffles its
+        examples, unless `ordered` is set: they are then grouped by class,
+        each class from the most to the least relevant.
+        """
+
+        if self._selector is None:
+            raise RuntimeError(
+                f"`{self.__class__.__name__}` object has no vector store "
+                f"created when executing `select()` method. You should call "
                 f"method `load_example_selector()` `train()` to create "
                 f"a vector store before."
             )
 
-        examples = self._selector.select_examples({"__INPUT__": sample})
+        if self.selector is BalancedSemanticSamplesSelector:
+            return self._selector.select_examples(
+                {"__INPUT__": sample}, shuffle=not ordered
+            )
+
+        return self._selector.select_examples({"__INPUT__": sample})
+
+    async def aselect(
+        self,
+        sample: str,
+        ordered: bool = False,
+    ) -> List[Dict]:
+        """
+        Asynchronous version of `select()`. The sample embedding is requested
+        with the asynchronous interface of the embeddings.
+        """
+
+        if self._selector is None:
+            raise RuntimeError(
+                f"`{self.__class__.__name__}` object has no vector store "
+                f"created when executing `aselect()` method. You should call "
+                f"method `load_example_selector()` `train()` to create "
+                f"a vector store before."
+            )
+
+        embedding = await self._embeddings.aembed_query(sample)
+
+        return self._select_by_vector(embedding, ordered)
+
+    def select_batch(
+        self,
+        samples: List[str],
+        chunk_size: int = 256,
+        ordered: bool = False,
+    ) -> List[List[Dict]]:
+        """
+        Batched version of `select()`. The samples of each chunk of
+        `chunk_size` samples are embedded as queries, like `select()` does,
+        with `embed_queries()`, and the vectorstore is searched with the
+        matrix of the chunk embeddings.
+        """
+
+        if self._selector is None:
+            raise RuntimeError(
+                f"`{self.__class__.__name__}` object has no vector store "
+                f"created when executing `select_batch()` method. You should "
+                f"call method `load_example_selector()` `train()` to create "
+                f"a vector store before."
+            )
+
+        results = []
+        for start in range(0, len(samples), chunk_size):
+            embeddings = embed_queries(
+                self._embeddings, samples[start : start + chunk_size]
+            )
+            results.extend(self._select_by_vectors(embeddings, ordered))
+
+        return results
+
+    def run(self, sample: str) -> str:
+        """
+        Creates the few-shot examples of the prompt of a sample.
+        """
+
+        return self.format_examples(self.select(sample))
+
+    async def arun(self, sample: str) -> str:
+        """
+        Asynchronous version of `run()`.
+        """
+
+        return self.format_examples(await self.aselect(sample))
+
+    def run_batch(
+        self,
+        samples: List[str],
+        chunk_size: int = 256,
+    ) -> List[str]:
+        """
+        Batched version of `run()`.
+        """
+
+        return [
+            self.format_examples(examples)
+            for examples in self.select_batch(samples, chunk_size)
+        ]
+
+    def _select_by_vector(
+        self,
+        embedding: List[float],
+        ordered: bool = False,
+    ) -> List[Dict]:
+        """
+        Select the examples for an already embedded sample.
+        """
+
+        return self._select_by_vectors([embedding], ordered)[0]
+
+    def _select_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        ordered: bool = False,
+    ) -> List[List[Dict]]:
+        """
+        Select the examples for already embedded samples with a single
+        search of the FAISS index. For query embeddings, the results are the
+        same as searching every sample through the vectorstore.
+        """
+
+        if self.selector is BalancedSemanticSamplesSelector:
+            return self._selector.select_examples_by_vectors(
+                embeddings, shuffle=not ordered
+            )
+
+        if self.selector is MaxMarginalRelevanceSelector:
+            return self._selector.select_examples_by_vectors(embeddings)
+
+        import numpy as np
+
+        vectorstore = self.vectorstore
+        queries = np.asarray(embeddings, dtype=np.float32)
+
+        if getattr(vectorstore, "_normalize_L2", False):
+            import faiss
+
+            faiss.normalize_L2(queries)
+        _, indices = vectorstore.index.search(queries, self._selector.k)
+        selected = [row[row != -1] for row in indices]
+
+        return [
+            [
+                dict(
+                    vectorstore.docstore.search(
+                        vectorstore.index_to_docstore_id[int(i)]
+                    ).metadata
+                )
+                for i in row
+            ]
+            for row in selected
+        ]
+
+    @staticmethod
+    def format_examples(examples: List[Dict]) -> str:
+        """
+        Join the selected examples into the few-shot string of the prompt.
+        """
 
         return "\n\n".join(
             [
@@ -203,12 +1067,7 @@ class BaseSelectorUnsupervised(BaseSelector):
 
         examples = [{"__INPUT__": example} for example in examples]
 
-        self._selector = self.selector.from_examples(
-            examples=examples,
-            embeddings=self._embeddings,
-            vectorstore_cls=FAISS,
-            k=1,
-        )
+        self._selector = self._build_selector(examples, k=1)
 
         return self
 
@@ -238,3 +1097,90 @@ class BaseSelectorUnsupervised(BaseSelector):
             suffix="Question: {__INPUT__}",
             input_variables=["__INPUT__"],
         )
+
+    async def arun(
+        self,
+    ) -> FewShotPromptTemplate:
+        """
+        Asynchronous version of `run()`.
+        """
+
+        return self.run()
+
+
+class BaseSelectorStatic(BaseSelector):
+    """
+    Selector of the tasks whose prompts do not include examples. It has no
+    vectorstore, so it does not need embeddings to be trained, saved, loaded
+    or run.
+    """
+
+    @property
+    def vectorstore(self):
+        """
+        Selector Vectorstore. Static selectors have none.
+        """
+        return None
+
+    @property
+    def template(
+        self,
+    ) -> str:
+        """
+        Selector Template
+        """
+        return ""
+
+    def train(
+        self,
+        examples: List[str],
+        annotations: Optional[List[str]] = None,
+    ) -> Self:
+        """
+        Static selectors have nothing to learn from the training samples.
+        """
+
+        return self
+
+    def save_example_selector(self, model_path: str, **kwargs) -> Self:
+        """
+        Creates an empty selector folder, so the model artifact keeps the
+        same layout as the models with a vectorstore.
+        """
+
+        os.makedirs(model_path, exist_ok=True)
+
+        return self
+
+    def load_example_selector(self, model_path: str, **kwargs) -> Self:
+        """
+        Static selectors have nothing to load. The vectorstore saved by older
+        versions of the task in `model_path` is ignored.
+        """
+
+        return self
+
+    def reindex(self, *args, **kwargs) -> Self:
+        """
+        Static selectors have no index to rebuild.
+        """
+
+        return self
+
+    def run(
+        self,
+    ) -> str:
+        """
+        Returns the examples of the prompt, which are always empty.
+        """
+
+        return ""
+
+    async def arun(
+        self,
+    ) -> str:
+        """
+        Asynchronous version of `run()`.
+        """
+
+        return self.run()
@@ -1,6 +1,8 @@
 """Custom selectors"""
 
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, ClassVar, Dict, List, Mapping, Optional, Type, Union
+import json
+import os
 import random
 from langchain_core.example_selectors.base import BaseExampleSelector
 from langchain_core.pydantic_v1 import BaseModel
@@ -31,6 +33,12 @@ class BalancedSemanticSamplesSelector(BaseExampleSelector, BaseModel):
     class_list: List[str]
     """element of examples metadata which contains the class"""
     class_key: str
+    partitions: Optional[Dict[str, Any]] = None
+    """FAISS sub-index with the examples of each class."""
+    partition_ids: Optional[Dict[str, List[str]]] = None
+    """Docstore ids of the examples of each sub-index, in index order."""
+
+    PARTITIONS_FILE: ClassVar[str] = "partitions.json"
 
     class Config:
         """Configuration for this pydantic object."""
@@ -46,6 +54,8 @@ class BalancedSemanticSamplesSelector(BaseExampleSelector, BaseModel):
         else:
             string_example = " ".join(sorted_values(example))
         ids = self.vectorstore.add_texts([string_example], metadatas=[example])
+        self.partitions = None
+        self.partition_ids = None
         return ids[0]
 
     @classmethod
@@ -77,13 +87,6 @@ class BalancedSemanticSamplesSelector(BaseExampleSelector, BaseModel):
         Returns:
             The ExampleSelector instantiated, backed by a vector store.
         """
-        if k < len(set(class_list)):
-            raise ValueError(
-                f"k value is {k} and it is expected to"
-                f"be greater than number of classes ({len(class_list)} classes)"
-                f"for balanced examples selection"
-            )
-
         if input_keys:
             string_examples = [
                 " ".join(sorted_values({k: eg[k] for k in input_keys}))
@@ -98,48 +101,489 @@ class BalancedSemanticSamplesSelector(BaseExampleSelector, BaseModel):
             metadatas=examples,
             **vectorstore_cls_kwargs,
         )
-        return cls(
+        return cls.from_vectorstore(
+            vectorstore=vectorstore,
+            class_list=class_list,
+            class_key=class_key,
+            k=k,
+            input_keys=input_keys,
+        )
+
+    @classmethod
+    def from_vectorstore(
+        cls,
+        vectorstore: VectorStore,
+        class_list: List[str],
+        class_key: str,
+        k: int = 6,
+        input_keys: Optional[List[str]] = None,
+        vectors: Optional[Any] = None,
+    ):
+        """Create k-shot example selector from a vector store which already
+        contains the examples, and build its class sub-indexes.
+
+        Args:
+            vectorstore: FAISS vector store with the examples in metadata.
+            class_list: list of classes of the classification problem
+            class_key: key which refers to category field in the example dictionary
+            input_keys: If provided, the search is based on the input variables
+                instead of all variables.
+            vectors: raw vectors of the examples, in index order. By default,
+                they are reconstructed from the vectorstore index, which
+                only approximates them for compressed indexes.
+
+        Returns:
+            The ExampleSelector instantiated, backed by the vector store.
+        """
+        if k < len(set(class_list)):
+            raise ValueError(
+                f"k value is {k} and it is expected to"
+                f"be greater than number of classes ({len(class_list)} classes)"
+                f"for balanced examples selection"
+            )
+
+        selector = cls(
             vectorstore=vectorstore,
             k=k,
             input_keys=input_keys,
             class_list=class_list,
             class_key=class_key,
         )
+        selector.build_partitions(vectors)
+        return selector
 
-    def select_examples(self, input_variables: Dict[str, str]) -> List[dict]:
+    def build_partitions(self, vectors: Optional[Any] = None) -> None:
+        """Build one FAISS sub-index per class from the vectors of the
+        vectorstore index, so each class is searched without filtering.
+
+        Args:
+            vectors: vectors of the examples, in index order. By default,
+                they are reconstructed from the vectorstore index.
+        """
+        import faiss
+        import numpy as np
+
+        index = self.vectorstore.index
+        if vectors is None:
+            vectors = index.reconstruct_n(0, index.ntotal)
+
+        rows: Dict[str, List[int]] = {}
+        for row in range(index.ntotal):
+            doc_id = self.vectorstore.index_to_docstore_id[row]
+            metadata = self.vectorstore.docstore.search(doc_id).metadata
+            rows.setdefault(metadata[self.class_key], []).append(row)
+
+        self.partitions = {}
+        self.partition_ids = {}
+        for cl, cl_rows in rows.items():
+            partition = faiss.IndexFlat(index.d, index.metric_type)
+            partition.add(np.ascontiguousarray(vectors[cl_rows]))
+            self.partitions[cl] = partition
+            self.partition_ids[cl] = [
+                self.vectorstore.index_to_docstore_id[row] for row in cl_rows
+            ]
+
+    def add_to_partitions(
+        self, ids: List[str], vectors: Any, classes: List[str]
+    ) -> None:
+        """Add already embedded examples to the class sub-indexes.
+
+        Args:
+            ids: docstore ids of the examples.
+            vectors: matrix with the vectors of the examples.
+            classes: class of each example.
+        """
+        import faiss
+        import numpy as np
+
+        if self.partitions is None:
+            self.build_partitions()
+            return
+
+        index = self.vectorstore.index
+        vectors = np.asarray(vectors, dtype=np.float32)
+        for cl in dict.fromkeys(classes):
+            rows = [row for row, value in enumerate(classes) if value == cl]
+            if cl not in self.partitions:
+                self.partitions[cl] = faiss.IndexFlat(
+                    index.d, index.metric_type
+                )
+                self.partition_ids[cl] = []
+            if cl not in self.class_list:
+                self.class_list.append(cl)
+            self.partitions[cl].add(np.ascontiguousarray(vectors[rows]))
+            self.partition_ids[cl].extend(ids[row] for row in rows)
+
+    def remove_from_partitions(self, ids: List[str]) -> None:
+        """Remove examples from the class sub-indexes.
+
+        Args:
+            ids: docstore ids of the examples.
+        """
+        import numpy as np
+
+        if self.partitions is None:
+            self.build_partitions()
+            return
+
+        removed = set(ids)
+        for cl, cl_ids in self.partition_ids.items():
+            rows = [row for row, value in enumerate(cl_ids) if value in removed]
+            if rows:
+                self.partitions[cl].remove_ids(np.asarray(rows, dtype=np.int64))
+                self.partition_ids[cl] = [
+                    value for value in cl_ids if value not in removed
+                ]
+
+    def save_partitions(self, folder_path: str) -> None:
+        """Save the class sub-indexes next to the vectorstore files.
+
+        Args:
+            folder_path: folder where the vectorstore has been saved.
+        """
+        import faiss
+
+        if self.partitions is None:
+            self.build_partitions()
+
+        manifest = {}
+        for number, (cl, partition) in enumerate(self.partitions.items()):
+            file_name = f"partition_{number}.faiss"
+            faiss.write_index(partition, os.path.join(folder_path, file_name))
+            manifest[cl] = {"file": file_name, "ids": self.partition_ids[cl]}
+
+        with open(
+            os.path.join(folder_path, self.PARTITIONS_FILE),
+            "w",
+            encoding="utf-8",
+        ) as fout:
+            json.dump(manifest, fout)
+
+    def load_partitions(
+        self,
+        folder_path: Union[str, Mapping[str, Any]],
+        mmap: bool = False,
+        vectors: Optional[Any] = None,
+    ) -> None:
+        """Load the class sub-indexes saved with `save_partitions()`. They
+        are rebuilt from the vectorstore if the folder has none, as in the
+        models saved before the sub-indexes existed.
+
+        Args:
+            folder_path: folder where the vectorstore has been saved, or the
+                contents of its files read in memory, keyed by file name.
+            mmap: memory-map the sub-indexes read-only.
+            vectors: raw vectors of the examples, used if the sub-indexes
+                are rebuilt.
+        """
+        from .index import read_index
+
+        if isinstance(folder_path, str):
+            manifest_path = os.path.join(folder_path, self.PARTITIONS_FILE)
+            if not os.path.exists(manifest_path):
+                self.build_partitions(vectors)
+                return
+
+            with open(manifest_path, encoding="utf-8") as fin:
+                manifest = json.load(fin)
+            self.partitions = {
+                cl: read_index(
+                    os.path.join(folder_path, value["file"]), mmap=mmap
+                )
+                for cl, value in manifest.items()
+            }
+
+        else:
+            if self.PARTITIONS_FILE not in folder_path:
+                self.build_partitions(vectors)
+                return
+
+            manifest = json.loads(bytes(folder_path[self.PARTITIONS_FILE]))
+            self.partitions = {
+                cl: read_index(folder_path[value["file"]])
+                for cl, value in manifest.items()
+            }
+
+        self.partition_ids = {
+            cl: value["ids"] for cl, value in manifest.items()
+        }
+
+    def select_examples(
+        self, input_variables: Dict[str, str], shuffle: bool = True
+    ) -> List[dict]:
         """Select which examples to use based on semantic similarity."""
-        final_examples = []
-        new_class_list = self.class_list.copy()
-        random.shuffle(new_class_list)
+        if self.input_keys:
+            input_variables = {
+                key: input_variables[key] for key in self.input_keys
+            }
+        query = " ".join(sorted_values(input_variables))
+        embedding = self.vectorstore.embeddings.embed_query(query)
+
+        return self.select_examples_by_vectors([embedding], shuffle)[0]
+
+    def select_examples_by_vectors(
+        self, embeddings: List[List[float]], shuffle: bool = True
+    ) -> List[List[dict]]:
+        """Select the examples of already embedded queries. Every class
+        sub-index is searched once with the matrix of all the queries.
+
+        Args:
+            embeddings: embeddings of the queries.
+            shuffle: shuffle the examples of each query. Otherwise they are
+                grouped by class, from the most to the least relevant.
+
+        Returns:
+            The selected examples of each query.
+        """
+        import numpy as np
+
+        if self.partitions is None:
+            self.build_partitions()
+
         new_class_list = (
             self.class_list * ceil(self.k / len(set(self.class_list)))
         )[: self.k]
 
         dict_k_per_class = {i: new_class_list.count(i) for i in new_class_list}
 
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if getattr(self.vectorstore, "_normalize_L2", False):
+            import faiss
+
+            faiss.normalize_L2(queries)
+
+        final_examples: List[List[dict]] = [[] for _ in embeddings]
+
         # Get the docs with the highest similarity.
         for cl, k in dict_k_per_class.items():
-            if self.input_keys:
-                input_variables = {
-                    key: input_variables[key] for key in self.input_keys
-                }
-            vectorstore_kwargs = self.vectorstore_kwargs or {}
-            query = " ".join(sorted_values(input_variables))
-            example_docs = self.vectorstore.similarity_search(
-                query,
-                k=k,
-                **vectorstore_kwargs,
-                filter={self.class_key: cl},
+            if cl not in self.partitions:
+                continue
+
+            _, indices = self.partitions[cl].search(queries, k)
+            ids = self.partition_ids[cl]
+            for query_examples, rows in zip(final_examples, indices):
+                # Get the examples from the metadata.
+                # This assumes that examples are stored in metadata.
+                examples = [
+                    dict(self.vectorstore.docstore.search(ids[row]).metadata)
+                    for row in rows
+                    if row != -1
+                ]
+                # If example keys are provided, filter examples to those keys.
+                if self.example_keys:
+                    examples = [
+                        {k: eg[k] for k in self.example_keys} for eg in examples
+                    ]
+                query_examples.extend(examples)
+
+        if shuffle:
+            for query_examples in final_examples:
+                random.shuffle(query_examples)
+
+        return final_examples
+
+
+def maximal_marginal_relevance(
+    relevance: Any,
+    similarity: Any,
+    valid: Any,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> Any:
+    """Greedy Maximal Marginal Relevance of a batch of queries. Every step
+    picks, for all the queries at once, the candidate with the best trade-off
+    between its similarity to the query and its similarity to the candidates
+    already picked.
+
+    Args:
+        relevance: (queries, candidates) cosine similarity of each candidate
+            to its query.
+        similarity: (queries, candidates, candidates) cosine similarity
+            between the candidates of each query.
+        valid: (queries, candidates) mask of the candidates that exist.
+        k: number of candidates to pick.
+        lambda_mult: weight of the relevance against the diversity.
+
+    Returns:
+        (queries, k) positions of the picked candidates, in pick order, or -1
+        when a query has fewer than `k` candidates.
+    """
+    import numpy as np
+
+    n_queries, n_candidates = relevance.shape
+    rows = np.arange(n_queries)
+    available = valid.copy()
+    redundancy = np.full(relevance.shape, -np.inf, dtype=np.float32)
+    picks = np.full((n_queries, k), -1, dtype=np.int64)
+
+    for step in range(min(k, n_candidates)):
+        if step == 0:
+            scores = relevance.copy()
+        else:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+
+        pick = scores.argmax(axis=1)
+        picked = available[rows, pick]
+        picks[:, step] = np.where(picked, pick, -1)
+
+        available[rows, pick] = False
+        redundancy = np.maximum(redundancy, similarity[rows, pick])
+
+    return picks
+
+
+class MaxMarginalRelevanceSelector(BaseExampleSelector, BaseModel):
+    """Example selector that selects examples with Maximal Marginal Relevance.
+
+    The vectors of the candidates of all the queries are gathered in one
+    float32 array, so their similarities are computed with one matrix
+    product, and MMR is run for all of them at once. The candidates are
+    taken from the raw vectors of the examples when the index approximates
+    them, and otherwise read from the index, only for the rows fetched.
+    """
+
+    vectorstore: VectorStore
+    """Vectorstore"""
+    k: int = 4
+    """Number of examples to select."""
+    fetch_k: int = 20
+    """Number of candidates fetched from the vectorstore to rerank."""
+    lambda_mult: float = 0.5
+    """Weight of the relevance against the diversity of the examples."""
+    example_keys: Optional[List[str]] = None
+    """Optional keys to filter examples to."""
+    input_keys: Optional[List[str]] = None
+    """Optional keys to filter input to. If provided, the search is based on
+    the input variables instead of all variables."""
+    vectors: Optional[Any] = None
+    """Matrix with the raw vectors of the examples, in index order."""
+    vectors_index: Optional[Any] = None
+    """Index from which `vectors` was read."""
+
+    class Config:
+        """Configuration for this pydantic object."""
+
+        arbitrary_types_allowed = True
+
+    def add_example(self, example: Dict[str, str]) -> str:
+        """Add new example to vectorstore."""
+        if self.input_keys:
+            string_example = " ".join(
+                sorted_values({key: example[key] for key in self.input_keys})
             )
+        else:
+            string_example = " ".join(sorted_values(example))
+        ids = self.vectorstore.add_texts([string_example], metadatas=[example])
+        self.reset_vectors()
+        return ids[0]
+
+    def reset_vectors(self, vectors: Optional[Any] = None) -> None:
+        """Forget the matrix of vectors. `vectors` are the raw vectors of the
+        examples in index order, given when the index approximates them.
+        Otherwise, the vectors of the candidates are read from the index."""
+        import numpy as np
+
+        if vectors is None:
+            self.vectors = None
+            self.vectors_index = None
+        else:
+            self.vectors = np.asarray(vectors, dtype=np.float32)
+            self.vectors_index = self.vectorstore.index
+
+    def load_vectors(self, rows: Optional[Any] = None) -> Any:
+        """Vectors of the examples in the given rows of the index, by default
+        all of them. They are the raw vectors given in `reset_vectors()`, or
+        copies read from the index, so they stay valid when the index is
+        modified or freed. Only indexes without raw vectors return their
+        approximations."""
+        from .index import read_rows
+
+        index = self.vectorstore.index
+        if (
+            self.vectors is not None
+            and self.vectors_index is index
+            and len(self.vectors) == index.ntotal
+        ):
+            return self.vectors if rows is None else self.vectors[rows]
+
+        if rows is None:
+            rows = range(index.ntotal)
+
+        return read_rows(index, rows)
+
+    def select_examples(self, input_variables: Dict[str, str]) -> List[dict]:
+        """Select which examples to use based on semantic similarity and
+        diversity."""
+        if self.input_keys:
+            input_variables = {
+                key: input_variables[key] for key in self.input_keys
+            }
+        query = " ".join(sorted_values(input_variables))
+        embedding = self.vectorstore.embeddings.embed_query(query)
+
+        return self.select_examples_by_vectors([embedding])[0]
+
+    def select_examples_by_vectors(
+        self, embeddings: List[List[float]]
+    ) -> List[List[dict]]:
+        """Select the examples of already embedded queries. The index is
+        searched once with the matrix of all the queries and their candidates
+        are reranked together.
+
+        Args:
+            embeddings: embeddings of the queries.
+
+        Returns:
+            The selected examples of each query.
+        """
+        import numpy as np
+
+        index = self.vectorstore.index
+        queries = np.asarray(embeddings, dtype=np.float32)
+        fetch_k = min(max(self.fetch_k, self.k), index.ntotal)
+        if len(queries) == 0 or fetch_k == 0 or self.k <= 0:
+            return [[] for _ in embeddings]
+
+        _, indices = index.search(queries, fetch_k)
+        valid = indices != -1
+
+        candidates = np.array(
+            self.load_vectors(np.where(valid, indices, 0)), dtype=np.float32
+        )
+        candidates /= np.maximum(
+            np.linalg.norm(candidates, axis=2, keepdims=True), 1e-12
+        )
+        queries = queries / np.maximum(
+            np.linalg.norm(queries, axis=1, keepdims=True), 1e-12
+        )
+
+        relevance = np.einsum("qcd,qd->qc", candidates, queries)
+        similarity = np.matmul(candidates, candidates.transpose(0, 2, 1))
+        picks = maximal_marginal_relevance(
+            relevance, similarity, valid, self.k, self.lambda_mult
+        )
+
+        docstore = self.vectorstore.docstore
+        index_to_docstore_id = self.vectorstore.index_to_docstore_id
+        final_examples = []
+        for query_indices, query_picks in zip(indices, picks):
             # Get the examples from the metadata.
             # This assumes that examples are stored in metadata.
-            examples = [dict(e.metadata) for e in example_docs]
+            examples = [
+                dict(
+                    docstore.search(
+                        index_to_docstore_id[int(query_indices[pick])]
+                    ).metadata
+                )
+                for pick in query_picks
+                if pick != -1
+            ]
             # If example keys are provided, filter examples to those keys.
             if self.example_keys:
                 examples = [
                     {k: eg[k] for k in self.example_keys} for eg in examples
                 ]
-            final_examples = final_examples + examples
+            final_examples.append(examples)
 
-        random.shuffle(final_examples)
         return final_examples
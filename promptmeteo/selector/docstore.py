@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import os
+import json
+import mmap
+from typing import Dict
+from typing import List
+from typing import Union
+
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+
+class MmapDocstore(Docstore):
+    """
+    Read-only docstore whose documents are read from a memory-mapped file,
+    so processes loading the same files share their pages instead of each
+    holding its own copy of the documents.
+    """
+
+    DATA_FILE = "docstore.jsonl"
+    OFFSETS_FILE = "docstore.offsets.npy"
+    IDS_FILE = "docstore.ids.json"
+
+    def __init__(
+        self,
+        folder_path: str,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        folder_path : str
+            Folder with the files written by `MmapDocstore.write()`.
+        """
+
+        import numpy as np
+
+        with open(
+            os.path.join(folder_path, self.IDS_FILE), encoding="utf-8"
+        ) as fin:
+            self._ids: List[str] = json.load(fin)
+        self._rows: Dict[str, int] = {
+            doc_id: row for row, doc_id in enumerate(self._ids)
+        }
+
+        self._offsets = np.load(
+            os.path.join(folder_path, self.OFFSETS_FILE), mmap_mode="r"
+        )
+        with open(os.path.join(folder_path, self.DATA_FILE), "rb") as fin:
+            self._data = (
+                mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+                if self._ids
+                else b""
+            )
+
+    @property
+    def ids(
+        self,
+    ) -> List[str]:
+        """Ids of the documents, in the order they were written."""
+        return self._ids
+
+    def search(
+        self,
+        search: str,
+    ) -> Union[str, Document]:
+        """
+        Returns the document with the given id, or an error message if it is
+        not found, as `InMemoryDocstore` does.
+        """
+
+        row = self._rows.get(search)
+        if row is None:
+            return f"ID {search} not found."
+
+        document = json.loads(
+            self._data[int(self._offsets[row]) : int(self._offsets[row + 1])]
+        )
+        return Document(
+            page_content=document["page_content"],
+            metadata=document["metadata"],
+        )
+
+    @classmethod
+    def write(
+        cls,
+        docstore: Docstore,
+        ids: List[str],
+        folder_path: str,
+    ) -> None:
+        """
+        Writes the documents of `docstore` with the given ids into the files
+        read by `MmapDocstore`.
+        """
+
+        import numpy as np
+
+        offsets = [0]
+        with open(os.path.join(folder_path, cls.DATA_FILE), "wb") as fout:
+            for doc_id in ids:
+                document = docstore.search(doc_id)
+                data = json.dumps(
+                    {
+                        "page_content": document.page_content,
+                        "metadata": document.metadata,
+                    }
+                ).encode("utf-8")
+                fout.write(data)
+                offsets.append(offsets[-1] + len(data))
+
+        np.save(
+            os.path.join(folder_path, cls.OFFSETS_FILE),
+            np.asarray(offsets, dtype=np.int64),
+        )
+        with open(
+            os.path.join(folder_path, cls.IDS_FILE), "w", encoding="utf-8"
+        ) as fout:
+            json.dump(ids, fout)
@@ -0,0 +1,444 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import os
+import json
+import time
+import hashlib
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+from ..tools import bounded_map_unordered
+from ..cache.embeddings_cache import embeddings_id
+from ..cache.embeddings_cache import CachedEmbeddings
+
+EMBEDDING_OPTIONS = {
+    "chunk_size": 256,
+    "max_concurrency": None,
+    "max_retries": 3,
+    "retry_delay": 1.0,
+    "checkpoint_path": None,
+    "progress_callback": None,
+}
+
+# Embeddings models that run in the local process. They already use all the
+# cores for each chunk, so their chunks are embedded one at a time.
+LOCAL_EMBEDDINGS = {
+    "HuggingFaceEmbeddings",
+    "HuggingFaceInstructEmbeddings",
+    "HuggingFaceBgeEmbeddings",
+    "SentenceTransformerEmbeddings",
+    "FakeEmbeddings",
+    "DeterministicFakeEmbedding",
+}
+
+# Chunks embedded at the same time by remote embeddings models.
+REMOTE_MAX_CONCURRENCY = 4
+
+# Embeddings whose `embed_query()` is `embed_documents([text])[0]`, so the
+# queries of a batch can be embedded with a single `embed_documents()` call.
+QUERY_AS_DOCUMENT_EMBEDDINGS = {
+    "OpenAIEmbeddings",
+    "AzureOpenAIEmbeddings",
+    "HuggingFaceEmbeddings",
+    "HuggingFaceHubEmbeddings",
+    "FakeEmbeddings",
+    "DeterministicFakeEmbedding",
+}
+
+
+def check_embedding_options(
+    options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Checks the options of `embed_texts()` and returns them completed with
+    the default values.
+    """
+
+    options = options or {}
+
+    wrong_options = set(options) - set(EMBEDDING_OPTIONS)
+    if wrong_options:
+        raise ValueError(
+            f"`embedding_options` keys {sorted(wrong_options)} are not valid. "
+            f"Valid keys are: {list(EMBEDDING_OPTIONS)}"
+        )
+
+    options = {**EMBEDDING_OPTIONS, **options}
+    for name in ["chunk_size", "max_concurrency"]:
+        if name == "max_concurrency" and options[name] is None:
+            continue
+        if not isinstance(options[name], int) or options[name] < 1:
+            raise ValueError(
+                f"`embedding_options` value `{name}` is expected to be a "
+                f"positive integer. Instead it got: {options[name]}"
+            )
+    if options["max_retries"] < 0:
+        raise ValueError(
+            f"`embedding_options` value `max_retries` is expected to be a "
+            f"non negative integer. Instead it got: {options['max_retries']}"
+        )
+
+    return options
+
+
+class EmbeddingCheckpoint:
+    """
+    Folder where the vectors of the chunks already embedded are saved, so an
+    interrupted embedding can be resumed. The chunks are only reused for the
+    same texts, chunk size and embeddings model.
+    """
+
+    MANIFEST_FILE: str = "manifest.json"
+
+    def __init__(
+        self,
+        checkpoint_path: str,
+        fingerprint: str,
+    ) -> None:
+        self._path = checkpoint_path
+        self._fingerprint = fingerprint
+
+        os.makedirs(checkpoint_path, exist_ok=True)
+        manifest_path = os.path.join(checkpoint_path, self.MANIFEST_FILE)
+
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as fin:
+                manifest = json.load(fin)
+
+        if manifest.get("fingerprint") != fingerprint:
+            self.clear()
+            os.makedirs(checkpoint_path, exist_ok=True)
+            with open(manifest_path, "w", encoding="utf-8") as fout:
+                json.dump({"fingerprint": fingerprint}, fout)
+
+    def _chunk_path(
+        self,
+        chunk: int,
+    ) -> str:
+        return os.path.join(self._path, f"chunk_{chunk:06d}.npy")
+
+    def load(
+        self,
+        chunk: int,
+    ) -> Optional[Any]:
+        """
+        Vectors of a chunk, or None if it has not been embedded yet.
+        """
+
+        import numpy as np
+
+        path = self._chunk_path(chunk)
+        return np.load(path) if os.path.exists(path) else None
+
+    def save(
+        self,
+        chunk: int,
+        vectors: Any,
+    ) -> None:
+        """
+        Saves the vectors of a chunk. The file is written under a temporary
+        name and renamed, so a chunk is never read half written.
+        """
+
+        import numpy as np
+
+        tmp_path = f"{self._chunk_path(chunk)}.tmp"
+        with open(tmp_path, "wb") as fout:
+            np.save(fout, vectors)
+        os.replace(tmp_path, self._chunk_path(chunk))
+
+    def clear(
+        self,
+    ) -> None:
+        """
+        Removes the files of the checkpoint, and its folder if it is left
+        empty.
+        """
+
+        for file_name in os.listdir(self._path):
+            if file_name == self.MANIFEST_FILE or file_name.startswith(
+                "chunk_"
+            ):
+                os.remove(os.path.join(self._path, file_name))
+
+        if not os.listdir(self._path):
+            os.rmdir(self._path)
+
+
+def texts_fingerprint(
+    embeddings: Embeddings,
+    texts: List[str],
+    chunk_size: int,
+) -> str:
+    """
+    Hash of the texts, the chunk size and the embeddings model.
+    """
+
+    model_id = getattr(embeddings, "model_id", None) or embeddings_id(
+        embeddings
+    )
+
+    digest = hashlib.sha256(f"{model_id}:{chunk_size}".encode("utf-8"))
+    for text in texts:
+        digest.update(hashlib.sha256(text.encode("utf-8")).digest())
+
+    return digest.hexdigest()
+
+
+def embeddings_fingerprint(
+    embeddings: Embeddings,
+    dimension: int,
+) -> Dict[str, Any]:
+    """
+    Fingerprint of the embeddings model that computed the vectors of a
+    vectorstore: the class of the embeddings, their model name and the
+    dimension of the vectors. Cached embeddings are identified by the
+    embeddings they wrap.
+    """
+
+    if isinstance(embeddings, CachedEmbeddings):
+        embeddings = embeddings.embeddings
+
+    provider, _, model = embeddings_id(embeddings).partition(":")
+
+    return {"provider": provider, "model": model, "dimension": int(dimension)}
+
+
+def check_embeddings_fingerprint(
+    fingerprint: Dict[str, Any],
+    embeddings: Embeddings,
+    dimension: int,
+) -> None:
+    """
+    Checks that the embeddings and the vectors of a vectorstore, of the
+    given dimension, match the fingerprint saved with them. The dimension of
+    the embeddings is only compared when the embeddings expose it, so no
+    text is embedded.
+
+    Raises
+    ------
+    ValueError
+        If the fingerprint does not match.
+    """
+
+    current = embeddings_fingerprint(embeddings, dimension)
+    if isinstance(embeddings, CachedEmbeddings):
+        embeddings = embeddings.embeddings
+    size = getattr(embeddings, "dimensions", None) or getattr(
+        embeddings, "size", None
+    )
+    if isinstance(size, int):
+        current["dimension"] = size
+
+    mismatch = {
+        key: (value, current[key])
+        for key, value in fingerprint.items()
+        if key in current and current[key] != value
+    }
+    if mismatch:
+        raise ValueError(
+            f"The vectors were embedded with {fingerprint}, but the "
+            f"embeddings used do not match: "
+            + ", ".join(
+                f"{key} `{saved}` != `{used}`"
+                for key, (saved, used) in mismatch.items()
+            )
+            + ". Load the model with the same embeddings it was trained "
+            f"with."
+        )
+
+
+def _defining_class(
+    embeddings: Embeddings,
+    method: str,
+) -> type:
+    return next(cls for cls in type(embeddings).__mro__ if method in vars(cls))
+
+
+def embed_queries(
+    embeddings: Embeddings,
+    texts: List[str],
+) -> List[List[float]]:
+    """
+    Embeds the texts as queries, with the same vectors as calling
+    `embed_query()` on each text. The texts are embedded with a single call
+    when the embeddings have a batched query interface, or when their
+    `embed_query()` is known to embed queries as documents. Otherwise they
+    are embedded one by one.
+    """
+
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+
+    query_class = _defining_class(embeddings, "embed_query")
+    if query_class.__name__ == "VertexAIEmbeddings":
+        return embeddings.embed(texts, 0, "RETRIEVAL_QUERY")
+
+    if (
+        query_class.__name__ in QUERY_AS_DOCUMENT_EMBEDDINGS
+        and _defining_class(embeddings, "embed_documents") is query_class
+    ):
+        return embeddings.embed_documents(texts)
+
+    return [embeddings.embed_query(text) for text in texts]
+
+
+def default_max_concurrency(
+    embeddings: Embeddings,
+) -> int:
+    """
+    Default number of chunks embedded at the same time: one for local
+    embeddings models and `REMOTE_MAX_CONCURRENCY` for the remote ones.
+    """
+
+    if isinstance(embeddings, CachedEmbeddings):
+        embeddings = embeddings.embeddings
+
+    return (
+        1
+        if any(
+            cls.__name__ in LOCAL_EMBEDDINGS for cls in type(embeddings).__mro__
+        )
+        else REMOTE_MAX_CONCURRENCY
+    )
+
+
+def embed_texts(
+    embeddings: Embeddings,
+    texts: List[str],
+    chunk_size: int = 256,
+    max_concurrency: Optional[int] = None,
+    max_retries: int = 3,
+    retry_delay: float = 1.0,
+    checkpoint_path: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> Any:
+    """
+    Embeds the texts in chunks, embedding up to `max_concurrency` chunks at
+    the same time.
+
+    Parameters
+    ----------
+    embeddings : Embeddings
+        Embeddings model.
+    texts : List[str]
+        Texts to embed.
+    chunk_size : int
+        Number of texts embedded in each call.
+    max_concurrency : Optional[int]
+        Maximum number of chunks embedded at the same time. By default it
+        is given by `default_max_concurrency()`.
+    max_retries : int
+        Number of times a chunk is retried after an error, waiting
+        `retry_delay` seconds, doubled after each attempt.
+    retry_delay : float
+        Seconds waited before the first retry of a chunk.
+    checkpoint_path : Optional[str]
+        Folder where the vectors of each chunk are saved once embedded. If
+        the embedding is interrupted, calling it again with the same texts
+        only embeds the chunks missing. The files are removed when all the
+        texts have been embedded.
+    progress_callback : Optional[Callable[[int, int], None]]
+        Function called with the number of texts embedded and the total
+        number of texts each time a chunk is finished.
+
+    Returns
+    -------
+    np.ndarray
+        Matrix of float32 vectors, one row per text.
+    """
+
+    import numpy as np
+
+    chunks = [
+        texts[start : start + chunk_size]
+        for start in range(0, len(texts), chunk_size)
+    ]
+
+    checkpoint = (
+        EmbeddingCheckpoint(
+            checkpoint_path,
+            texts_fingerprint(embeddings, texts, chunk_size),
+        )
+        if checkpoint_path
+        else None
+    )
+
+    vectors: List[Optional[Any]] = [
+        checkpoint.load(chunk) if checkpoint else None
+        for chunk in range(len(chunks))
+    ]
+    pending = [chunk for chunk, value in enumerate(vectors) if value is None]
+
+    done = sum(
+        len(chunks[chunk])
+        for chunk, value in enumerate(vectors)
+        if value is not None
+    )
+    if progress_callback is not None and done:
+        progress_callback(done, len(texts))
+
+    def embed_chunk(chunk: int) -> Any:
+        for attempt in range(max_retries + 1):
+            try:
+                return np.asarray(
+                    embeddings.embed_documents(chunks[chunk]),
+                    dtype=np.float32,
+                )
+
+            except Exception as error:
+                if attempt == max_retries:
+                    raise RuntimeError(
+                        f"Error embedding the texts {chunk * chunk_size} to "
+                        f"{chunk * chunk_size + len(chunks[chunk]) - 1} after "
+                        f"{max_retries + 1} attempts."
+                    ) from error
+                time.sleep(retry_delay * 2**attempt)
+
+    for position, chunk_vectors in bounded_map_unordered(
+        embed_chunk,
+        pending,
+        max_concurrency or default_max_concurrency(embeddings),
+    ):
+        chunk = pending[position]
+        vectors[chunk] = chunk_vectors
+        if checkpoint is not None:
+            checkpoint.save(chunk, chunk_vectors)
+
+        done += len(chunks[chunk])
+        if progress_callback is not None:
+            progress_callback(done, len(texts))
+
+    if checkpoint is not None:
+        checkpoint.clear()
+
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    return np.concatenate(vectors, axis=0)
@@ -0,0 +1,336 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import math
+from enum import Enum
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+
+
+class IndexTypes(str, Enum):
+    """
+    Enum with the available FAISS index types of the selectors.
+    """
+
+    FLAT: str = "flat"
+    IVF_FLAT: str = "ivf_flat"
+    HNSW: str = "hnsw"
+    IVF_PQ: str = "ivf_pq"
+
+
+INDEX_PARAMS = {
+    IndexTypes.FLAT: [],
+    IndexTypes.IVF_FLAT: ["nlist", "nprobe"],
+    IndexTypes.HNSW: ["M", "efConstruction", "efSearch"],
+    IndexTypes.IVF_PQ: ["nlist", "nprobe", "pq_m", "pq_nbits"],
+}
+
+
+def check_index(
+    index_type: str,
+    index_params: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Checks that the index type and its parameters are supported.
+    """
+
+    if index_type not in [i.value for i in IndexTypes]:
+        raise ValueError(
+            f"`selector_index` value `{index_type}` is not in the available "
+            f"values: {[i.value for i in IndexTypes]}"
+        )
+
+    wrong_params = set(index_params or {}) - set(
+        INDEX_PARAMS[IndexTypes(index_type)]
+    )
+    if wrong_params:
+        raise ValueError(
+            f"`selector_index_params` keys {sorted(wrong_params)} are not "
+            f"valid for the index `{index_type}`. Valid keys are: "
+            f"{INDEX_PARAMS[IndexTypes(index_type)]}"
+        )
+
+
+def build_index(
+    vectors: Any,
+    index_type: str = IndexTypes.FLAT.value,
+    index_params: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    Builds a FAISS index of the given type with the training vectors. The
+    quantizers of the IVF indexes are trained with the same vectors, and the
+    parameters not given are chosen from the number of vectors.
+
+    Parameters
+    ----------
+    vectors : np.ndarray
+        Matrix of float32 vectors, one row per example.
+    index_type : str
+        One of `IndexTypes`.
+    index_params : Optional[Dict[str, Any]]
+        Parameters of the index: `nlist` and `nprobe` for the IVF indexes,
+        `M`, `efConstruction` and `efSearch` for HNSW, and `pq_m` and
+        `pq_nbits` for the product quantizer of IVF-PQ.
+
+    Returns
+    -------
+    faiss.Index
+        Index with the vectors added.
+    """
+
+    import faiss
+
+    check_index(index_type, index_params)
+    params = dict(index_params or {})
+    size, dim = vectors.shape
+
+    if index_type == IndexTypes.FLAT.value:
+        index = faiss.IndexFlatL2(dim)
+
+    elif index_type == IndexTypes.HNSW.value:
+        index = faiss.IndexHNSWFlat(dim, params.get("M", 32))
+        index.hnsw.efConstruction = params.get("efConstruction", 40)
+
+    else:
+        nlist = min(params.get("nlist", int(4 * math.sqrt(size))), size)
+        nlist = max(nlist, 1)
+        quantizer = faiss.IndexFlatL2(dim)
+
+        if index_type == IndexTypes.IVF_FLAT.value:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+
+        else:
+            pq_m = params.get("pq_m", _default_pq_m(dim))
+            if dim % pq_m:
+                raise ValueError(
+                    f"`selector_index_params` value `pq_m`={pq_m} must "
+                    f"divide the embeddings dimension {dim}."
+                )
+            pq_nbits = min(
+                params.get("pq_nbits", 8), max(int(math.log2(size)), 1)
+            )
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits)
+
+        index.train(vectors)
+
+    index.add(vectors)
+    set_search_params(index, index_type, params)
+
+    return index
+
+
+def set_search_params(
+    index: Any,
+    index_type: str = IndexTypes.FLAT.value,
+    index_params: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    Sets the search time parameters of the index, which are not always
+    stored with it. IVF indexes also get a direct map so their vectors can
+    be reconstructed by the selectors.
+    """
+
+    import faiss
+
+    params = index_params or {}
+
+    if index_type == IndexTypes.HNSW.value:
+        index.hnsw.efSearch = params.get("efSearch", 64)
+
+    elif index_type in (IndexTypes.IVF_FLAT.value, IndexTypes.IVF_PQ.value):
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(params.get("nprobe", 8), ivf.nlist)
+        if ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+
+    return index
+
+
+def remove_rows(
+    index: Any,
+    rows: List[int],
+    index_type: str = IndexTypes.FLAT.value,
+    index_params: Optional[Dict[str, Any]] = None,
+    vectors: Optional[Any] = None,
+) -> Any:
+    """
+    Removes the vectors in the positions `rows` of the index, keeping the
+    remaining vectors in consecutive positions as the vectorstore expects.
+    Only the flat index supports it natively, so the other indexes are
+    refilled with the remaining vectors, keeping their trained quantizers.
+
+    Parameters
+    ----------
+    index : faiss.Index
+    rows : List[int]
+    index_type : str
+    index_params : Optional[Dict[str, Any]]
+    vectors : Optional[np.ndarray]
+        Raw vectors of the examples left, in index order. They are required
+        by the indexes which do not store the vectors exactly, so their
+        codes are not computed again from approximated vectors.
+
+    Returns
+    -------
+    faiss.Index
+    """
+
+    import faiss
+    import numpy as np
+
+    if index_type == IndexTypes.FLAT.value:
+        index.remove_ids(np.asarray(rows, dtype=np.int64))
+        return index
+
+    if vectors is None:
+        if not stores_vectors(index):
+            raise ValueError(
+                f"The `{index_type}` index does not keep the vectors "
+                f"exactly, so their raw vectors are required to remove "
+                f"examples from it."
+            )
+        removed = set(rows)
+        keep = [row for row in range(index.ntotal) if row not in removed]
+        vectors = index.reconstruct_n(0, index.ntotal)[keep]
+
+    new_index = faiss.clone_index(index)
+    new_index.reset()
+    new_index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    set_search_params(new_index, index_type, index_params)
+
+    return new_index
+
+
+def stores_vectors(
+    index: Any,
+) -> bool:
+    """
+    Whether the index keeps the vectors exactly, so they can be read back
+    from it instead of being stored apart.
+    """
+
+    import faiss
+
+    return isinstance(
+        index, (faiss.IndexFlat, faiss.IndexIVFFlat, faiss.IndexHNSWFlat)
+    )
+
+
+def read_vectors(
+    index: Any,
+) -> Any:
+    """
+    Returns a copy of the vectors of an index which keeps them exactly, in
+    index order.
+    """
+
+    import numpy as np
+
+    return np.ascontiguousarray(
+        index.reconstruct_n(0, index.ntotal), dtype=np.float32
+    )
+
+
+def read_rows(
+    index: Any,
+    rows: Any,
+) -> Any:
+    """
+    Returns a copy of the vectors of the given rows of an index, without
+    reading the other vectors, so memory-mapped indexes are not copied into
+    memory. IVF indexes get a direct map of their rows the first time.
+    """
+
+    import faiss
+    import numpy as np
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+    rows = np.asarray(rows, dtype=np.int64)
+    vectors = index.reconstruct_batch(rows.ravel())
+
+    return vectors.reshape(rows.shape + (index.d,))
+
+
+def to_mappable(
+    index: Any,
+) -> Any:
+    """
+    Returns an index that FAISS can memory-map. Only the inverted lists of
+    the IVF indexes can be memory-mapped, so a flat index is converted into
+    an IVF index with a single list, which is searched exhaustively and
+    returns the same results. Other indexes are returned as they are.
+    """
+
+    import faiss
+    import numpy as np
+
+    if not isinstance(index, faiss.IndexFlat):
+        return index
+
+    quantizer = faiss.IndexFlat(index.d, index.metric_type)
+    quantizer.add(np.zeros((1, index.d), dtype=np.float32))
+
+    mappable = faiss.IndexIVFFlat(quantizer, index.d, 1, index.metric_type)
+    mappable.is_trained = True
+    mappable.add(index.reconstruct_n(0, index.ntotal))
+    mappable.make_direct_map()
+
+    return mappable
+
+
+def read_index(
+    path: Union[str, Any],
+    mmap: bool = False,
+) -> Any:
+    """
+    Reads a FAISS index from disk, or from its serialized bytes. With `mmap`,
+    its data is memory-mapped read-only instead of being copied into memory,
+    when the index supports it.
+    """
+
+    import faiss
+
+    if not isinstance(path, str):
+        import numpy as np
+
+        return faiss.deserialize_index(np.frombuffer(path, dtype=np.uint8))
+
+    if not mmap:
+        return faiss.read_index(path)
+
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+
+def _default_pq_m(
+    dim: int,
+) -> int:
+    """
+    Largest number of sub-quantizers up to 64 that divides the dimension.
+    """
+
+    return max(m for m in range(1, min(dim, 64) + 1) if dim % m == 0)
@@ -0,0 +1,284 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import hashlib
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+def exact_duplicates(
+    texts: List[str],
+    labels: List[str],
+) -> Dict[int, int]:
+    """
+    Finds the examples with the same text and label as a previous example.
+
+    Returns
+    -------
+    Dict[int, int]
+        Position of each duplicate and position of the example it repeats.
+    """
+
+    first: Dict[str, int] = {}
+    duplicates: Dict[int, int] = {}
+    for position, (text, label) in enumerate(zip(texts, labels)):
+        key = hashlib.sha256(
+            f"{label}\x1f{text.strip()}".encode("utf-8")
+        ).hexdigest()
+        if key in first:
+            duplicates[position] = first[key]
+        else:
+            first[key] = position
+
+    return duplicates
+
+
+def _normalize(vectors: Any) -> Any:
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(
+        np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+    )
+
+
+def near_duplicates(
+    vectors: Any,
+    labels: List[str],
+    threshold: float,
+    block_size: int = 1024,
+) -> Dict[int, Any]:
+    """
+    Finds the examples whose cosine similarity with a previous example of
+    the same label, not itself a duplicate, is at least `threshold`.
+
+    The examples are compared in blocks: each block is searched against the
+    examples already kept with a flat FAISS index, and against the previous
+    examples of the block with one matrix product.
+
+    Returns
+    -------
+    Dict[int, Tuple[int, float]]
+        Position of each near-duplicate and the position and similarity of
+        the example it repeats.
+    """
+
+    import numpy as np
+    import faiss
+
+    vectors = _normalize(vectors)
+    duplicates = {}
+
+    for label in dict.fromkeys(labels):
+        positions = np.array(
+            [
+                position
+                for position, value in enumerate(labels)
+                if value == label
+            ]
+        )
+        kept_index = faiss.IndexFlatIP(vectors.shape[1])
+        kept_positions: List[int] = []
+
+        for start in range(0, len(positions), block_size):
+            block_positions = positions[start : start + block_size]
+            block = vectors[block_positions]
+
+            if kept_index.ntotal:
+                previous_sim, previous_row = kept_index.search(block, 1)
+                previous_sim, previous_row = (
+                    previous_sim[:, 0],
+                    previous_row[:, 0],
+                )
+            else:
+                previous_sim = np.full(len(block), -np.inf, dtype=np.float32)
+                previous_row = np.zeros(len(block), dtype=np.int64)
+
+            block_sim = block @ block.T
+            block_kept: List[int] = []
+            for row, position in enumerate(block_positions):
+                if previous_sim[row] >= threshold:
+                    duplicates[int(position)] = (
+                        kept_positions[previous_row[row]],
+                        float(previous_sim[row]),
+                    )
+                    continue
+
+                if block_kept:
+                    similarities = block_sim[row, block_kept]
+                    best = int(similarities.argmax())
+                    if similarities[best] >= threshold:
+                        duplicates[int(position)] = (
+                            int(block_positions[block_kept[best]]),
+                            float(similarities[best]),
+                        )
+                        continue
+
+                block_kept.append(row)
+
+            kept_index.add(block[block_kept])
+            kept_positions.extend(
+                int(block_positions[row]) for row in block_kept
+            )
+
+    return duplicates
+
+
+def coreset(
+    vectors: Any,
+    labels: List[str],
+    size: int,
+) -> List[int]:
+    """
+    Chooses at most `size` examples of each label that cover the space of
+    its examples, with the greedy k-center algorithm: starting from the
+    example closest to the centroid, it repeatedly adds the example farthest
+    from the ones already chosen.
+
+    Returns
+    -------
+    List[int]
+        Positions of the chosen examples, in their original order.
+    """
+
+    import numpy as np
+
+    vectors = _normalize(vectors)
+    chosen: List[int] = []
+
+    for label in dict.fromkeys(labels):
+        positions = np.array(
+            [
+                position
+                for position, value in enumerate(labels)
+                if value == label
+            ]
+        )
+        if len(positions) <= size:
+            chosen.extend(positions.tolist())
+            continue
+
+        group = vectors[positions]
+        centroid = group.mean(axis=0)
+        first = int(((group - centroid) ** 2).sum(axis=1).argmin())
+
+        picks = [first]
+        distances = ((group - group[first]) ** 2).sum(axis=1)
+        for _ in range(size - 1):
+            pick = int(distances.argmax())
+            picks.append(pick)
+            distances = np.minimum(
+                distances, ((group - group[pick]) ** 2).sum(axis=1)
+            )
+
+        chosen.extend(positions[picks].tolist())
+
+    return sorted(chosen)
+
+
+def prune_examples(
+    texts: List[str],
+    labels: List[str],
+    embed: Any,
+    deduplicate: bool = False,
+    dedup_threshold: Optional[float] = None,
+    coreset_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Removes from the training examples the exact duplicates, the
+    near-duplicates and, optionally, the examples left out of a coreset of
+    `coreset_size` examples per label.
+
+    Parameters
+    ----------
+    texts : List[str]
+        Embedded texts of the examples.
+    labels : List[str]
+        Labels of the examples.
+    embed : Callable[[List[str]], np.ndarray]
+        Function that embeds a list of texts. Exact duplicates are removed
+        before embedding the texts.
+    deduplicate : bool
+        Remove the examples with the same text and label as a previous one.
+    dedup_threshold : Optional[float]
+        Remove the examples with a cosine similarity of at least this value
+        with a previous example of the same label.
+    coreset_size : Optional[int]
+        Maximum number of examples kept for each label.
+
+    Returns
+    -------
+    Dict[str, Any]
+        `kept`, the positions of the examples kept, `vectors`, their
+        embeddings, and `report`, the examples dropped at each step.
+    """
+
+    import numpy as np
+
+    positions = np.arange(len(texts))
+    report = {
+        "examples": len(texts),
+        "kept": len(texts),
+        "exact_duplicates": [],
+        "near_duplicates": [],
+        "coreset": [],
+    }
+
+    if deduplicate:
+        duplicates = exact_duplicates(texts, labels)
+        report["exact_duplicates"] = [
+            {"index": index, "duplicate_of": original}
+            for index, original in duplicates.items()
+        ]
+        positions = np.array(
+            [position for position in positions if position not in duplicates],
+            dtype=np.int64,
+        )
+
+    vectors = embed([texts[position] for position in positions])
+    kept_labels = [labels[position] for position in positions]
+
+    if dedup_threshold is not None:
+        duplicates = near_duplicates(vectors, kept_labels, dedup_threshold)
+        report["near_duplicates"] = [
+            {
+                "index": int(positions[row]),
+                "duplicate_of": int(positions[original]),
+                "similarity": similarity,
+            }
+            for row, (original, similarity) in duplicates.items()
+        ]
+        rows = [row for row in range(len(positions)) if row not in duplicates]
+        positions, vectors = positions[rows], vectors[rows]
+        kept_labels = [kept_labels[row] for row in rows]
+
+    if coreset_size is not None:
+        rows = coreset(vectors, kept_labels, coreset_size)
+        removed = sorted(set(range(len(positions))) - set(rows))
+        report["coreset"] = [int(positions[row]) for row in removed]
+        positions, vectors = positions[rows], vectors[rows]
+
+    report["kept"] = len(positions)
+
+    return {"kept": positions.tolist(), "vectors": vectors, "report": report}
@@ -19,10 +19,8 @@
 #  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
-import tarfile
-import tempfile
-import json
-import os
+
+from typing import BinaryIO, Union
 
 try:
     from typing import Self
@@ -31,6 +29,7 @@ except ImportError:
 
 from .base import BaseUnsupervised
 from .tasks import TaskTypes
+from .selector import SelectorTypes
 from .tools import add_docstring_from
 
 
@@ -54,6 +53,7 @@ class Summarizer(BaseUnsupervised):
     """
 
     TASK_TYPE = TaskTypes.SUMMARIZATION.value
+    SELECTOR_TYPE = SelectorTypes.STATIC.value
 
     @add_docstring_from(BaseUnsupervised.__init__)
     def __init__(
@@ -91,15 +91,19 @@ class Summarizer(BaseUnsupervised):
     @add_docstring_from(BaseUnsupervised.load_model)
     def load_model(
         cls,
-        model_path: str,
+        model_path: Union[str, bytes, BinaryIO],
+        **kwargs,
     ) -> Self:
         """
         Loads a model artifact to make new predictions.
 
         Parameters
         ----------
-        model_path : str
-            The path to the saved model artifact.
+        model_path : Union[str, bytes, BinaryIO]
+            The path to the saved model artifact, or its contents as
+            bytes or a binary file object.
+        kwargs
+            Arguments of `Base.load_model()`, such as `lazy`.
 
         Returns
         -------
@@ -107,42 +111,4 @@ class Summarizer(BaseUnsupervised):
             The loaded Summarizer model.
         """
 
-        model_dir = os.path.dirname(model_path)
-        model_name = os.path.basename(model_path)
-
-        if not model_name.endswith(".meteo"):
-            raise ValueError(
-                f"{cls.__name__} error in `load_model()`. "
-                f'model_path="{model_path}" has a bad model name extension. '
-                f"Model name must end with `.meteo` (i.e. `./model.meteo`)"
-            )
-
-        if not os.path.exists(model_path):
-            raise ValueError(
-                f"{cls.__name__} error in `load_model()`. "
-                f"directory {model_dir} does not exists."
-            )
-
-        with tempfile.TemporaryDirectory() as tmp:
-            with tarfile.open(model_path, "r:gz") as tar:
-                tar.extractall(tmp)
-
-            init_tmp_path = os.path.join(
-                tmp, f"{os.path.splitext(model_name)[0]}.init"
-            )
-
-            with open(init_tmp_path) as f_init:
-                params = json.load(f_init)
-
-            self = cls(**params)
-
-            self.builder.build_selector_by_load(
-                model_path=os.path.join(tmp, model_name),
-                selector_type=self.SELECTOR_TYPE,
-                selector_k=self._selector_k,
-                selector_algorithm=self._selector_algorithm,
-            )
-
-            self._is_trained = True
-
-        return self
+        return super(Summarizer, cls).load_model(model_path, **kwargs)
@@ -20,6 +20,11 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
 
+import random
+from typing import Dict
+from typing import List
+from typing import Optional
+
 from ..models import BaseModel
 from ..prompts import BasePrompt
 from ..parsers import BaseParser
@@ -28,6 +33,9 @@ from ..selector import (
     BaseSelectorSupervised,
     BaseSelectorUnsupervised,
 )
+from ..selector.custom_selectors import BalancedSemanticSamplesSelector
+from .token_budget import TokenBudget
+from .token_budget import round_robin
 
 
 class Task:
@@ -45,6 +53,7 @@ class Task:
         self._parser = None
         self._prompt = None
         self._selector = None
+        self._token_budget = None
         self._verbose = verbose
         self._language = language
         self._task_type = task_type
@@ -95,6 +104,15 @@ class Task:
         """
         return self._selector
 
+    @property
+    def token_budget(
+        self,
+    ) -> Optional[TokenBudget]:
+        """
+        Get Task Token Budget.
+        """
+        return self._token_budget
+
     @property
     def parser(
         self,
@@ -135,6 +153,16 @@ class Task:
         """
         self._selector = selector
 
+    @token_budget.setter
+    def token_budget(
+        self,
+        token_budget: Optional[TokenBudget],
+    ) -> None:
+        """
+        Set Task Token Budget.
+        """
+        self._token_budget = token_budget
+
     @parser.setter
     def parser(
         self,
@@ -154,26 +182,138 @@ class Task:
         FewShotPromptTemplate.
         """
 
-        intro_prompt = self.prompt.run()
-
         if isinstance(self.selector, BaseSelectorSupervised):
-            examples = self.selector.run(sample)
+            examples = self._pack_examples(
+                sample, self.selector.select(sample, self._ordered_examples)
+            )
         elif isinstance(self.selector, BaseSelectorUnsupervised):
             examples = self.selector.run()
         else:
             examples = ""
 
-        variables = dict(__SAMPLE__=sample, __EXAMPLES__=examples)
+        return self._format_prompt(sample, examples)
+
+    def _get_prompts(
+        self,
+        samples: List[str],
+    ) -> List[str]:
+        """
+        Batched version of `_get_prompt()`. The examples of all the samples
+        are selected at once.
+        """
+
+        if isinstance(self.selector, BaseSelectorSupervised):
+            examples = [
+                self._pack_examples(sample, sample_examples)
+                for sample, sample_examples in zip(
+                    samples,
+                    self.selector.select_batch(
+                        samples, ordered=self._ordered_examples
+                    ),
+                )
+            ]
+        elif isinstance(self.selector, BaseSelectorUnsupervised):
+            examples = [self.selector.run()] * len(samples)
+        else:
+            examples = [""] * len(samples)
+
+        return [
+            self._format_prompt(sample, sample_examples)
+            for sample, sample_examples in zip(samples, examples)
+        ]
+
+    def get_prompts(
+        self,
+        examples: List[str],
+    ) -> List[str]:
+        """
+        Given a list of text samples, return their prompts.
+        """
+
+        return self._get_prompts(
+            [
+                example.replace("{", "{{").replace("}", "}}")
+                for example in examples
+            ]
+        )
+
+    async def _aget_prompt(
+        self,
+        sample: str,
+    ) -> str:
+        """
+        Asynchronous version of `_get_prompt()`.
+        """
+
+        if isinstance(self.selector, BaseSelectorSupervised):
+            examples = self._pack_examples(
+                sample,
+                await self.selector.aselect(sample, self._ordered_examples),
+            )
+        elif isinstance(self.selector, BaseSelectorUnsupervised):
+            examples = await self.selector.arun()
+        else:
+            examples = ""
+
+        return self._format_prompt(sample, examples)
 
-        final_prompt = intro_prompt.format(
-            **{
-                k: v
-                for (k, v) in variables.items()
-                if k in intro_prompt.input_variables
-            }
+    def _pack_examples(
+        self,
+        sample: str,
+        examples: List[Dict],
+    ) -> str:
+        """
+        Join the selected examples of a sample. With a token budget, only the
+        most relevant examples that fit in the tokens left by the prompt
+        instructions, the sample and the model output are kept. The examples
+        of the class balanced selector are then selected grouped by class,
+        in relevance order, so they are taken one class at a time, the
+        budget drops the least relevant examples of every class, and the
+        examples kept are shuffled afterwards.
+        """
+
+        if self.token_budget is None:
+            return self.selector.format_examples(examples)
+
+        balanced = self.selector.selector is BalancedSemanticSamplesSelector
+        order = (
+            round_robin([example.get("__OUTPUT__") for example in examples])
+            if balanced
+            else None
         )
+        kept = self.token_budget.pack(
+            [self.selector.format_examples([example]) for example in examples],
+            self.token_budget.available(self._format_prompt(sample, "")),
+            order,
+        )
+        examples = [examples[i] for i in kept]
+        if balanced:
+            random.shuffle(examples)
+
+        return self.selector.format_examples(examples)
 
-        return final_prompt
+    @property
+    def _ordered_examples(
+        self,
+    ) -> bool:
+        """
+        Whether the examples are selected in relevance order, to be packed
+        in the token budget.
+        """
+        return self.token_budget is not None
+
+    def _format_prompt(
+        self,
+        sample: str,
+        examples: str,
+    ) -> str:
+        """
+        Fill the task prompt with the sample and its selected examples.
+        """
+
+        return self.prompt.compile().format(
+            __SAMPLE__=sample, __EXAMPLES__=examples
+        )
 
     def run(
         self,
@@ -185,7 +325,17 @@ class Task:
 
         sample = example.replace("{", "{{").replace("}", "}}")
 
-        prompt = self._get_prompt(sample)
+        return self.run_prompt(self._get_prompt(sample))
+
+    def run_prompt(
+        self,
+        prompt: str,
+    ) -> str:
+        """
+        Given a prompt built with `get_prompts()`, return the text predicted
+        by Promptmeteo.
+        """
+
         if self._verbose:
             print("\n\nPROMPT INPUT\n\n", prompt)
 
@@ -198,3 +348,71 @@ class Task:
             print("\n\nPARSE RESULT\n\n", result)
 
         return result
+
+    def run_batch(
+        self,
+        examples: List[str],
+        batch_size: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Given a list of text samples, return the texts predicted by
+        Promptmeteo. The prompts are sent to the model in batches of
+        `batch_size` samples.
+        """
+
+        return self.run_prompts(
+            self.get_prompts(examples), batch_size=batch_size
+        )
+
+    def run_prompts(
+        self,
+        prompts: List[str],
+        batch_size: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Given a list of prompts built with `get_prompts()`, return the texts
+        predicted by Promptmeteo. The prompts are sent to the model in
+        batches of `batch_size` prompts.
+        """
+
+        if self._verbose:
+            for prompt in prompts:
+                print("\n\nPROMPT INPUT\n\n", prompt)
+
+        outputs = self.model.run_batch(prompts, batch_size=batch_size)
+        if self._verbose:
+            for output in outputs:
+                print("\n\nMODEL OUTPUT\n\n", output)
+
+        results = [self.parser.run(output) for output in outputs]
+        if self._verbose:
+            for result in results:
+                print("\n\nPARSE RESULT\n\n", result)
+
+        return results
+
+    async def arun(
+        self,
+        example: str,
+    ) -> str:
+        """
+        Asynchronous version of `run()`. Both the examples selection and the
+        LLM call are awaited, so many samples can be in flight in the same
+        event loop.
+        """
+
+        sample = example.replace("{", "{{").replace("}", "}}")
+
+        prompt = await self._aget_prompt(sample)
+        if self._verbose:
+            print("\n\nPROMPT INPUT\n\n", prompt)
+
+        output = await self.model.arun(prompt)
+        if self._verbose:
+            print("\n\nMODEL OUTPUT\n\n", output)
+
+        result = self.parser.run(output)
+        if self._verbose:
+            print("\n\nPARSE RESULT\n\n", result)
+
+        return result
@@ -27,15 +27,22 @@ from typing import (
     Optional,
 )
 
+from langchain_core.embeddings import Embeddings
+
 try:
     from typing import Self
 except ImportError:
     from typing_extensions import Self
 
 from .task import Task
+from .token_budget import TokenBudget
+from ..cache import cache_key
+from ..cache import CacheFactory
+from ..cache import CachedEmbeddings
 from ..models import ModelFactory
 from ..prompts import PromptFactory
 from ..parsers import ParserFactory
+from ..selector import SelectorTypes
 from ..selector import SelectorFactory
 
 
@@ -105,9 +112,14 @@ class TaskBuilder:
         selector_k: int,
         selector_type: str,
         selector_algorithm: str,
+        selector_index: str = "flat",
+        selector_index_params: Optional[Dict] = None,
+        embedding_options: Optional[Dict] = None,
+        **kwargs,
     ) -> Self:
         """
-        Builds the selector for the task by training a new selector.
+        Builds the selector for the task by training a new selector. Extra
+        keyword arguments are passed to the `train()` method of the selector.
         """
 
         if not self._task.model:
@@ -117,13 +129,18 @@ class TaskBuilder:
                 "`build_model()` before calling `build_selector()`."
             )
 
-        if not self._task.model.embeddings:
+        # Static selectors do not use embeddings, so they are not loaded
+        if selector_type == SelectorTypes.STATIC.value:
+            embeddings = None
+
+        elif not self._task.model.embeddings:
             raise RuntimeError(
                 "Selector algorithm is trying yo be built but there is no"
                 "embeddings for model {self._task._model.__name__}."
             )
 
-        embeddings = self._task.model.embeddings
+        else:
+            embeddings = self._task.model.embeddings
 
         self._task.selector = SelectorFactory.factory_method(
             language=self._task.language,
@@ -131,9 +148,13 @@ class TaskBuilder:
             selector_k=selector_k,
             selector_type=selector_type,
             selector_algorithm=selector_algorithm,
+            selector_index=selector_index,
+            selector_index_params=selector_index_params,
+            embedding_options=embedding_options,
         ).train(
             examples=examples,
             annotations=annotations,
+            **kwargs,
         )
 
         return self
@@ -158,6 +179,108 @@ class TaskBuilder:
 
         return self
 
+    def build_cache(
+        self,
+        model_name: str,
+        model_provider_name: str,
+        cache: Optional[bool] = None,
+        cache_size: int = 1024,
+        cache_path: Optional[str] = None,
+        cache_ttl: Optional[float] = None,
+        cache_disk_size: Optional[int] = None,
+    ) -> Self:
+        """
+        Builds the response cache of the task model. When `cache` is None,
+        responses are only cached if the model is deterministic.
+        """
+
+        if not self._task.model:
+            raise RuntimeError(
+                "Response cache is trying to be built but there is no "
+                "LLM model loaded. You need to call function "
+                "`build_model()` before calling `build_cache()`."
+            )
+
+        if cache is None:
+            cache = self._task.model.is_deterministic
+
+        if not cache:
+            self._task.model.set_cache(None)
+            return self
+
+        self._task.model.set_cache(
+            CacheFactory.factory_method(
+                cache_size=cache_size,
+                cache_path=cache_path,
+                cache_ttl=cache_ttl,
+                cache_disk_size=cache_disk_size,
+            ),
+            namespace=cache_key(
+                model_provider_name,
+                model_name,
+                self._task.model.params,
+            ),
+        )
+
+        return self
+
+    def build_embeddings_cache(
+        self,
+        cache_size: int = 10000,
+        cache_path: Optional[str] = None,
+    ) -> Self:
+        """
+        Wraps the embeddings of the task model so the vectors of the texts
+        already embedded are reused instead of computed again.
+        """
+
+        if not self._task.model:
+            raise RuntimeError(
+                "Embeddings cache is trying to be built but there is no "
+                "LLM model loaded. You need to call function "
+                "`build_model()` before calling `build_embeddings_cache()`."
+            )
+
+        def wrap(embeddings: Embeddings) -> Embeddings:
+            if isinstance(embeddings, CachedEmbeddings):
+                return embeddings
+            return CachedEmbeddings(
+                embeddings,
+                cache_size=cache_size,
+                cache_path=cache_path,
+            )
+
+        self._task.model.wrap_embeddings(wrap)
+
+        return self
+
+    def build_token_budget(
+        self,
+        max_tokens: int,
+        model_name: str = "",
+    ) -> Self:
+        """
+        Builds the token budget of the task prompts. The tokens reserved for
+        the output are read from the model parameters.
+        """
+
+        if not self._task.model:
+            raise RuntimeError(
+                "Token budget is trying to be built but there is no "
+                "LLM model loaded. You need to call function "
+                "`build_model()` before calling `build_token_budget()`."
+            )
+
+        self._task.token_budget = TokenBudget(
+            max_tokens=max_tokens,
+            output_tokens=TokenBudget.output_tokens_from_params(
+                self._task.model.params
+            ),
+            model_name=model_name,
+        )
+
+        return self
+
     def build_parser(
         self,
         prompt_labels: List[str],
@@ -179,6 +302,9 @@ class TaskBuilder:
         selector_k: int,
         selector_type: str,
         selector_algorithm: str,
+        selector_index: str = "flat",
+        selector_index_params: Optional[Dict] = None,
+        embedding_options: Optional[Dict] = None,
         **kwargs,
     ) -> Self:
         """
@@ -192,13 +318,18 @@ class TaskBuilder:
                 "`build_model()` before calling `load_selector()`."
             )
 
-        if not self._task.model.embeddings:
+        # Static selectors do not use embeddings, so they are not loaded
+        if selector_type == SelectorTypes.STATIC.value:
+            embeddings = None
+
+        elif not self._task.model.embeddings:
             raise RuntimeError(
                 "Selector algorithm is trying to be built but there is no"
                 "embeddings for model {self._task._model.__name__}."
             )
 
-        embeddings = self._task.model.embeddings
+        else:
+            embeddings = self._task.model.embeddings
 
         self._task.selector = SelectorFactory.factory_method(
             language=self._task.language,
@@ -206,6 +337,9 @@ class TaskBuilder:
             selector_k=selector_k,
             selector_type=selector_type,
             selector_algorithm=selector_algorithm,
+            selector_index=selector_index,
+            selector_index_params=selector_index_params,
+            embedding_options=embedding_options,
         ).load_example_selector(model_path=model_path, **kwargs)
 
         return self
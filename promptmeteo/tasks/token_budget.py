@@ -0,0 +1,211 @@
+#!/usr/bin/python3
+
+#  Copyright (c) 2023 Paradigma Digital S.L.
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+
+import math
+import warnings
+from functools import lru_cache
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+OUTPUT_TOKENS_PARAMS = [
+    "max_tokens",
+    "max_new_tokens",
+    "max_tokens_to_sample",
+    "max_output_tokens",
+]
+
+
+@lru_cache(maxsize=None)
+def tiktoken_counter(
+    model_name: str = "",
+) -> Callable[[str], int]:
+    """
+    Returns a function that counts the tokens of a text with the tiktoken
+    encoding of the model, or with `cl100k_base` if tiktoken does not know
+    the model. If the encoding can not be loaded, for example because its
+    file can not be downloaded, tokens are estimated as one every four
+    characters.
+    """
+
+    import tiktoken
+
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+
+    except Exception as error:
+        warnings.warn(
+            f"The tiktoken encoding for the model `{model_name}` could not "
+            f"be loaded, so the tokens are estimated from the length of the "
+            f"texts. {error}"
+        )
+        return lambda text: math.ceil(len(text) / 4)
+
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenBudget:
+    """
+    Maximum number of tokens of the prompts of a task, including the tokens
+    reserved for the output of the model. The examples of the prompt are
+    chosen to fit in the tokens left by the instructions and the sample.
+    """
+
+    DEFAULT_OUTPUT_TOKENS: int = 256
+    EXAMPLES_SEPARATOR: str = "\n\n"
+
+    def __init__(
+        self,
+        max_tokens: int,
+        output_tokens: Optional[int] = None,
+        model_name: str = "",
+        count_tokens: Optional[Callable[[str], int]] = None,
+        cache_size: int = 4096,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        max_tokens : int
+            Maximum number of tokens of the prompt and the model output.
+        output_tokens : Optional[int]
+            Tokens reserved for the model output. By default
+            `DEFAULT_OUTPUT_TOKENS`.
+        model_name : str
+            Name of the model, used to choose the tiktoken encoding.
+        count_tokens : Optional[Callable[[str], int]]
+            Function that counts the tokens of a text. By default the
+            tiktoken encoding of the model is used.
+        cache_size : int
+            Number of token counts of texts kept in memory, so the examples
+            selected often are not encoded again.
+        """
+
+        if not isinstance(max_tokens, int) or max_tokens < 1:
+            raise ValueError(
+                f"`max_tokens` is expected to be a positive integer. "
+                f"Instead it got: {max_tokens}"
+            )
+
+        self._max_tokens = max_tokens
+        self._output_tokens = (
+            self.DEFAULT_OUTPUT_TOKENS
+            if output_tokens is None
+            else output_tokens
+        )
+        self._count_tokens = count_tokens or tiktoken_counter(model_name)
+        self.count = lru_cache(maxsize=cache_size)(self._count_tokens)
+
+    @staticmethod
+    def output_tokens_from_params(
+        params: Dict,
+    ) -> Optional[int]:
+        """
+        Maximum number of output tokens configured in the model parameters,
+        if any.
+        """
+
+        for params_dict in [params, params.get("model_kwargs") or {}]:
+            for name in OUTPUT_TOKENS_PARAMS:
+                if params_dict.get(name) is not None:
+                    return int(params_dict[name])
+
+        return None
+
+    @property
+    def max_tokens(
+        self,
+    ) -> int:
+        """Maximum number of tokens of the prompt and the model output."""
+        return self._max_tokens
+
+    @property
+    def output_tokens(
+        self,
+    ) -> int:
+        """Tokens reserved for the model output."""
+        return self._output_tokens
+
+    def available(
+        self,
+        prompt: str,
+    ) -> int:
+        """
+        Tokens left for the examples in a prompt without examples.
+        """
+
+        return self._max_tokens - self._output_tokens - self.count(prompt)
+
+    def pack(
+        self,
+        examples: List[str],
+        max_tokens: int,
+        order: Optional[List[int]] = None,
+    ) -> List[int]:
+        """
+        Positions of the examples that fit in `max_tokens`, sorted. The
+        examples are taken in `order`, by default their own order, from the
+        most to the least relevant, and the ones that do not fit in the
+        tokens left are skipped.
+        """
+
+        separator_tokens = self.count(self.EXAMPLES_SEPARATOR)
+
+        selected = []
+        for position in range(len(examples)) if order is None else order:
+            tokens = self.count(examples[position]) + (
+                separator_tokens if selected else 0
+            )
+            if tokens <= max_tokens:
+                selected.append(position)
+                max_tokens -= tokens
+
+        return sorted(selected)
+
+
+def round_robin(
+    groups: List[Any],
+) -> List[int]:
+    """
+    Positions of the items of the given groups taking one item of each group
+    in turn, in the order the groups first appear. The items of a group keep
+    their order.
+
+    >>> round_robin(["a", "a", "b", "a", "c"])
+    [0, 2, 4, 1, 3]
+    """
+
+    positions: Dict[Any, List[int]] = {}
+    for position, group in enumerate(groups):
+        positions.setdefault(group, []).append(position)
+
+    queues = list(positions.values())
+    return [
+        queue[turn]
+        for turn in range(max(map(len, queues), default=0))
+        for queue in queues
+        if turn < len(queue)
+    ]
@@ -20,6 +20,17 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 #  THE SOFTWARE.
 
+import os
+import shutil
+import hashlib
+import tempfile
+from collections import deque
+from concurrent.futures import wait
+from concurrent.futures import Executor
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
 
 def add_docstring_from(parent_function):
     """
@@ -66,3 +77,234 @@ def add_docstring_from(parent_function):
         return inherit_function
 
     return decorator
+
+
+def bounded_map(
+    function: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_concurrency: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> Iterator[Any]:
+    """
+    Lazily apply `function` to every item of `items` running at most
+    `max_concurrency` calls at the same time, yielding the results in the same
+    order as the input items.
+
+    Parameters
+    ----------
+    function : Callable[[Any], Any]
+        Function applied to each item.
+    items : Iterable[Any]
+        Items to process. They are consumed lazily.
+    max_concurrency : Optional[int]
+        Maximum number of items in flight. If it is not given, the number of
+        workers of `executor` is used.
+    executor : Optional[Executor]
+        Executor where the calls are submitted. If it is not given, a
+        `ThreadPoolExecutor` with `max_concurrency` workers is created and
+        shut down when the iteration finishes.
+
+    Returns
+    -------
+    Iterator[Any]
+        Results of `function` in the order of `items`.
+
+    Example
+    -------
+    >>> list(bounded_map(lambda x: x * 2, [1, 2, 3], max_concurrency=2))
+    [2, 4, 6]
+    """
+
+    if max_concurrency is not None and max_concurrency < 1:
+        raise ValueError(
+            f"`max_concurrency` is expected to be a positive integer. "
+            f"Instead it got: {max_concurrency}"
+        )
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    window = max_concurrency or getattr(executor, "_max_workers", None) or 1
+
+    futures = deque()
+    try:
+        for item in items:
+            futures.append(executor.submit(function, item))
+            if len(futures) >= window:
+                yield futures.popleft().result()
+
+        while futures:
+            yield futures.popleft().result()
+
+    finally:
+        for future in futures:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+def bounded_map_unordered(
+    function: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_concurrency: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Lazily apply `function` to every item of `items`, yielding the results as
+    soon as they are completed together with the position of their item.
+    Items are only read from `items` when there is room in the window of
+    in-flight items, so the memory used does not depend on the number of
+    items.
+
+    Parameters
+    ----------
+    function : Callable[[Any], Any]
+        Function applied to each item.
+    items : Iterable[Any]
+        Items to process. They are consumed lazily.
+    max_concurrency : Optional[int]
+        Maximum number of calls running at the same time. If it is not given,
+        the number of workers of `executor` is used.
+    executor : Optional[Executor]
+        Executor where the calls are submitted. If it is not given, a
+        `ThreadPoolExecutor` with `max_concurrency` workers is created and
+        shut down when the iteration finishes.
+    max_in_flight : Optional[int]
+        Size of the window of submitted items that have not been yielded yet.
+        By default it is equal to `max_concurrency`.
+
+    Returns
+    -------
+    Iterator[Tuple[int, Any]]
+        Tuples `(index, result)` in completion order.
+
+    Example
+    -------
+    >>> sorted(bounded_map_unordered(lambda x: x * 2, [1, 2], 2))
+    [(0, 2), (1, 4)]
+    """
+
+    for name, value in [
+        ("max_concurrency", max_concurrency),
+        ("max_in_flight", max_in_flight),
+    ]:
+        if value is not None and value < 1:
+            raise ValueError(
+                f"`{name}` is expected to be a positive integer. "
+                f"Instead it got: {value}"
+            )
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    window = (
+        max_in_flight
+        or max_concurrency
+        or getattr(executor, "_max_workers", None)
+        or 1
+    )
+
+    pending = {}
+    try:
+        for idx, item in enumerate(items):
+            pending[executor.submit(function, item)] = idx
+            if len(pending) >= window:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+def extract_cached(
+    archive_path: str,
+    extract: Callable[[str, str], Any],
+    cache_dir: Optional[str] = None,
+    prepare: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Extract an archive into a persistent cache folder and return the
+    folder path. The folder is keyed by the path, size and modification time
+    of the archive, so later calls, from this or any other process, reuse the
+    extracted files until the archive changes. When a new version of the
+    archive is extracted, the folders of its previous versions are removed.
+
+    The archive is extracted into a staging folder where `prepare` is run, and
+    then the staging folder is renamed to its final name. Readers never see a
+    partially extracted folder and concurrent extractions of the same archive
+    keep the first one that finishes.
+
+    Parameters
+    ----------
+    archive_path : str
+        Path of the archive.
+    extract : Callable[[str, str], Any]
+        Function called with the archive path and the staging folder to
+        extract the archive. It must check the member paths, as
+        `artifact.extract_artifact` does.
+    cache_dir : Optional[str]
+        Folder where the extracted archives are kept. By default it is the
+        `PROMPTMETEO_CACHE_DIR` environment variable or
+        `~/.cache/promptmeteo`.
+    prepare : Optional[Callable[[str], None]]
+        Function called with the staging folder after the extraction, to
+        rewrite the extracted files before they are published.
+
+    Returns
+    -------
+    str
+        Folder with the extracted files.
+    """
+
+    cache_dir = cache_dir or os.environ.get(
+        "PROMPTMETEO_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "promptmeteo"),
+    )
+    stat = os.stat(archive_path)
+    source = hashlib.sha256(
+        os.path.abspath(archive_path).encode("utf-8")
+    ).hexdigest()[:32]
+    version = hashlib.sha256(
+        f"{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")
+    ).hexdigest()[:32]
+    key = f"{source}-{version}"
+
+    target = os.path.join(cache_dir, key)
+    if os.path.isdir(target):
+        return target
+
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{key}.", dir=cache_dir)
+    try:
+        extract(archive_path, staging)
+        if prepare is not None:
+            prepare(staging)
+        os.rename(staging, target)
+
+    except OSError:
+        if not os.path.isdir(target):
+            raise
+
+    finally:
+        if os.path.isdir(staging):
+            shutil.rmtree(staging, ignore_errors=True)
+
+    # Processes which already use a previous version keep reading its files
+    # while they are open.
+    for name in os.listdir(cache_dir):
+        if name.startswith(f"{source}-") and name != key:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+    return target
@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+from promptmeteo import APIFormatter
+from promptmeteo.selector import BaseSelectorStatic
+
+API_CODE = """
+openapi: 3.0.3
+info:
+  title: Pets
+  version: 1.0.0
+paths: {}
+components:
+  schemas:
+    Pet:
+      type: object
+      properties:
+        name:
+          type: string
+"""
+
+
+class TestAPIFormatter:
+    def test_static_selector(self):
+        """
+        Test that the APIFormatter does not load the model embeddings to be
+        trained, saved, loaded or to predict, because its prompts do not
+        include examples.
+        """
+
+        model = APIFormatter(
+            language="en",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            api_version="3.0.3",
+            api_protocol="REST",
+        ).train(api_codes=[API_CODE])
+
+        assert isinstance(model.task.selector, BaseSelectorStatic)
+        assert not model.task.model.embeddings_loaded
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, "model.meteo")
+            model.save_model(model_path)
+            load_model = APIFormatter.load_model(model_path)
+
+        assert isinstance(load_model.task.selector, BaseSelectorStatic)
+        assert load_model._entities == model._entities
+        assert load_model.task.get_prompts(["openapi: 3.0.3"])
+        assert not load_model.task.model.embeddings_loaded
@@ -0,0 +1,277 @@
+import os
+import time
+import tempfile
+
+import numpy as np
+
+from langchain.embeddings import FakeEmbeddings
+
+from promptmeteo import DocumentClassifier
+from promptmeteo.cache import cache_key
+from promptmeteo.cache import CacheFactory
+from promptmeteo.cache import CachedEmbeddings
+from promptmeteo.cache import MemoryCache
+from promptmeteo.cache import SQLiteCache
+from promptmeteo.cache import TieredCache
+from promptmeteo.models.fake_llm import FakePromptCopyLLM
+
+
+class TestCache:
+    def test_cache_key(self):
+        assert cache_key("a", {"x": 1, "y": 2}) == cache_key(
+            "a", {"y": 2, "x": 1}
+        )
+        assert cache_key("a", "b") != cache_key("a", "c")
+
+    def test_memory_cache(self):
+        cache = MemoryCache(max_size=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        assert cache.get("a") == "1"
+
+        # "b" is the least recently used value
+        cache.set("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+        assert cache.stats == {"hits": 3, "misses": 1}
+
+        cache = MemoryCache(max_size=2, ttl=0.01)
+        cache.set("a", "1")
+        time.sleep(0.02)
+        assert cache.get("a") is None
+
+    def test_sqlite_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+
+            cache = SQLiteCache(path, max_size=2)
+            cache.set("a", "1")
+            cache.set("b", "2")
+            cache.set("c", "3")
+            assert len(cache) == 2
+            assert cache.get("a") is None
+
+            assert SQLiteCache(path).get("c") == "3"
+
+            cache = SQLiteCache(path, ttl=0.01)
+            time.sleep(0.02)
+            assert cache.get("c") is None
+
+            cache = SQLiteCache(path, max_size=20)
+            for idx in range(21):
+                cache.set(str(idx), str(idx))
+            assert len(cache) == 21
+            cache.set("21", "21")
+            assert len(cache) == 20
+            assert cache.get("0") is None and cache.get("21") == "21"
+
+            # Reads only update the access times older than the granularity
+            changes = cache._connection.total_changes
+            assert cache.get("21") == "21"
+            assert cache._connection.total_changes == changes
+            cache.ACCESS_GRANULARITY = 0.0
+            assert cache.get("21") == "21"
+            assert cache._connection.total_changes == changes + 1
+
+    def test_async_cache(self):
+        import asyncio
+        import threading
+
+        with tempfile.TemporaryDirectory() as tmp:
+            threads = []
+
+            class ThreadCache(SQLiteCache):
+                def _get(self, key):
+                    threads.append(threading.get_ident())
+                    return super()._get(key)
+
+            cache = ThreadCache(os.path.join(tmp, "cache.sqlite"))
+            tiered = TieredCache([MemoryCache(), cache])
+            assert cache.blocking and tiered.blocking
+            assert not MemoryCache().blocking
+
+            async def run():
+                await tiered.aset("a", "1")
+                return await cache.aget("a"), await tiered.aget("b")
+
+            assert asyncio.run(run()) == ("1", None)
+            assert threads and threading.get_ident() not in threads
+
+    def test_tiered_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+
+            cache = CacheFactory.factory_method(cache_size=10, cache_path=path)
+            assert isinstance(cache, TieredCache)
+            cache.set("a", "1")
+
+            cache = CacheFactory.factory_method(cache_size=10, cache_path=path)
+            memory, disk = cache.tiers
+            assert memory.get("a") is None
+            assert cache.get("a") == "1"
+            assert memory.get("a") == "1"
+
+    def test_response_cache(self):
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            prompt_labels=["positive", "negative"],
+        )
+        assert model.task.model.cache is None
+        assert model.cache_stats == {"responses": None, "embeddings": None}
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            prompt_labels=["positive", "negative"],
+            response_cache=True,
+        )
+
+        calls = []
+
+        class CountingLLM(FakePromptCopyLLM):
+            def _call(self, prompt, *args, **kwargs):
+                calls.append(prompt)
+                return "positive"
+
+        model.task.model._llm = CountingLLM()
+
+        assert model.predict(["uno", "dos", "uno"]) == [["positive"]] * 3
+        assert len(calls) == 2
+        assert model.cache_stats["responses"] == {"hits": 1, "misses": 2}
+
+        assert (
+            model.predict(["uno", "tres"], batch_size=2) == [["positive"]] * 2
+        )
+        assert len(calls) == 3
+
+    def test_embeddings_cache(self):
+        calls = []
+
+        class CountingEmbeddings(FakeEmbeddings):
+            def embed_documents(self, texts):
+                calls.extend(texts)
+                return super().embed_documents(texts)
+
+            def embed_query(self, text):
+                calls.append(text)
+                return super().embed_query(text)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            embeddings = CachedEmbeddings(
+                CountingEmbeddings(size=8), cache_path=tmp
+            )
+            vectors = embeddings.embed_documents(["a", "b", "a"])
+            assert calls == ["a", "b"]
+            assert vectors[0] == vectors[2]
+
+            query = embeddings.embed_query("a")
+            assert embeddings.embed_query("a") == query
+            assert calls == ["a", "b", "a"]
+
+            # A new instance reuses the vectors stored on disk
+            embeddings = CachedEmbeddings(
+                CountingEmbeddings(size=8), cache_path=tmp
+            )
+            extended = embeddings.embed_documents(["a", "b", "c"])
+            assert calls == ["a", "b", "a", "c"]
+            assert np.allclose(extended[:2], vectors[:2], atol=1e-6)
+
+    def test_embeddings_cache_async(self):
+        """
+        Test that the async methods read and write the vectors stored on
+        disk outside the event loop thread.
+        """
+
+        import asyncio
+        import threading
+        from promptmeteo.cache.embeddings_cache import EmbeddingsStore
+
+        threads = []
+
+        class ThreadStore(EmbeddingsStore):
+            def get(self, keys):
+                threads.append(threading.get_ident())
+                return super().get(keys)
+
+            def set(self, keys, vectors):
+                threads.append(threading.get_ident())
+                return super().set(keys, vectors)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            embeddings = CachedEmbeddings(FakeEmbeddings(size=8))
+            embeddings._store = ThreadStore(tmp)
+
+            async def run():
+                documents = await embeddings.aembed_documents(["a", "b"])
+                query = await embeddings.aembed_query("a")
+                return documents, query, await embeddings.aembed_query("a")
+
+            documents, query, cached = asyncio.run(run())
+            assert len(documents) == 2 and query == cached
+            assert len(threads) == 4
+            assert threading.get_ident() not in threads
+
+    def test_embeddings_store_shared(self):
+        """
+        Test that stores opened on the same folder, as several processes do,
+        see the vectors written by the others and never duplicate a key.
+        """
+
+        import threading
+        from promptmeteo.cache.embeddings_cache import EmbeddingsStore
+
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = EmbeddingsStore(tmp), EmbeddingsStore(tmp)
+
+            first.set(["a"], [[1.0, 1.0]])
+            assert second.get(["a", "b"]) == [[1.0, 1.0], None]
+
+            second.set(["a", "b"], [[2.0, 2.0], [3.0, 3.0]])
+            assert first.get(["a", "b"]) == [[1.0, 1.0], [3.0, 3.0]]
+
+            def write(store, offset):
+                for idx in range(50):
+                    key = str(idx)
+                    store.set([key], [[float(idx), float(offset)]])
+
+            threads = [
+                threading.Thread(target=write, args=(store, offset))
+                for offset, store in enumerate([first, second, first])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            with open(os.path.join(tmp, EmbeddingsStore.KEYS_FILE)) as fin:
+                keys = [line.split()[0] for line in fin]
+            assert len(keys) == len(set(keys)) == 52
+
+            store = EmbeddingsStore(tmp)
+            vectors = store.get([str(idx) for idx in range(50)])
+            assert [vector[0] for vector in vectors] == list(range(50))
+            assert vectors == first.get([str(idx) for idx in range(50)])
+
+    def test_embeddings_cache_model(self):
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            prompt_labels=["positive", "negative"],
+            embeddings_cache=True,
+        )
+        assert isinstance(model.task.model.embeddings, CachedEmbeddings)
+
+        model.train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positive", "negative", "negative"],
+        )
+        model.task.model._llm = FakePromptCopyLLM()
+        model.predict(["estoy feliz"])
+        assert model.cache_stats["embeddings"]["hits"] == 0
+        model.predict(["estoy feliz"])
+        assert model.cache_stats["embeddings"]["hits"] == 1
@@ -1,10 +1,15 @@
 import os
+import json
+import asyncio
 import tarfile
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
 from promptmeteo import DocumentClassifier
+from promptmeteo.models.fake_llm import FakePromptCopyLLM
+from promptmeteo.parsers.dummy_parser import DummyParser
 
 
 class TestDocumentClassifier:
@@ -68,10 +73,13 @@ class TestDocumentClassifier:
         with tempfile.TemporaryDirectory() as tmp:
             model.save_model(os.path.join(tmp, "model.meteo"))
             assert os.path.exists(os.path.join(tmp, "model.meteo"))
-            tar = tarfile.open(os.path.join(tmp, "model.meteo"), "r:gz")
+            tar = tarfile.open(os.path.join(tmp, "model.meteo"), "r:")
             items = [t.path for t in list(tar)]
-            assert "model.meteo" in items
-            assert "model.init" in items
+            assert items[0] == "manifest.json"
+            assert "selector/index.faiss" in items
+            manifest = json.load(tar.extractfile("manifest.json"))
+            assert manifest["version"] == 2
+            assert manifest["init_params"] == model.init_params
 
     def test_load_model(self):
         model = DocumentClassifier(
@@ -94,3 +102,571 @@ class TestDocumentClassifier:
             assert load_model.model_provider_name == model.model_provider_name
             assert load_model.model_name == model.model_name
             assert load_model.verbose == model.verbose
+
+    def test_load_model_sources(self):
+        """
+        Test that a model is loaded from bytes, a file object and an
+        extracted folder, that its members are compressed and verified, and
+        that the models saved in the previous format are still loaded.
+        """
+
+        import mmap
+        from promptmeteo.artifact import extract_artifact
+        from promptmeteo.artifact import read_artifact
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            selector_algorithm="similarity_class_balanced",
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positivo", "neutral", "negativo"],
+        )
+
+        def examples(model):
+            vectorstore = model.task.selector.vectorstore
+            return sorted(
+                vectorstore.docstore.search(doc_id).metadata["__INPUT__"]
+                for doc_id in vectorstore.index_to_docstore_id.values()
+            )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, "model.meteo")
+            model.save_model(model_path, compression="zlib")
+
+            with open(model_path, "rb") as fin:
+                data = fin.read()
+            with open(model_path, "rb") as fin:
+                from_file = DocumentClassifier.load_model(fin)
+            from_bytes = DocumentClassifier.load_model(data)
+            from_folder = DocumentClassifier.load_model(
+                extract_artifact(model_path, os.path.join(tmp, "folder"))
+            )
+
+            for load_model in (from_file, from_bytes, from_folder):
+                assert examples(load_model) == examples(model)
+                assert load_model.init_params == model.init_params
+                assert load_model.task.selector._selector.partitions
+
+            with tarfile.open(model_path) as tar:
+                offset = tar.getmember("selector/index.faiss").offset_data
+            corrupted = bytearray(data)
+            corrupted[offset] ^= 0xFF
+            with pytest.raises(ValueError):
+                DocumentClassifier.load_model(bytes(corrupted))
+
+            # Uncompressed members are read in place, without copying them
+            model.save_model(model_path)
+            artifact = read_artifact(model_path)
+            assert isinstance(artifact.selector["index.faiss"], memoryview)
+            assert isinstance(artifact.selector["index.faiss"].obj, mmap.mmap)
+            del artifact
+            assert examples(DocumentClassifier.load_model(model_path)) == (
+                examples(model)
+            )
+
+            with tarfile.open(model_path) as tar:
+                offset = tar.getmember("selector/index.faiss").offset_data
+            with open(model_path, "rb") as fin:
+                corrupted = bytearray(fin.read())
+            corrupted[offset] ^= 0xFF
+            with pytest.raises(ValueError):
+                DocumentClassifier.load_model(bytes(corrupted))
+
+            # Format of the previous versions: a gzipped tarball with the
+            # vectorstore folder and the parameters of the model.
+            legacy_path = os.path.join(tmp, "legacy.meteo")
+            model.task.selector.save_example_selector(
+                os.path.join(tmp, "legacy")
+            )
+            with open(os.path.join(tmp, "legacy.init"), "w") as fout:
+                json.dump(model.init_params, fout)
+            with tarfile.open(legacy_path, mode="w:gz") as tar:
+                tar.add(os.path.join(tmp, "legacy"), arcname="legacy.meteo")
+                tar.add(os.path.join(tmp, "legacy.init"), arcname="legacy.init")
+
+            load_model = DocumentClassifier.load_model(legacy_path)
+            assert examples(load_model) == examples(model)
+
+    def test_reindex(self):
+        """
+        Test that a loaded model is reindexed without embedding its examples
+        again, and that the new index is saved with it.
+        """
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positivo", "neutral", "negativo"],
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, "model.meteo")
+            model.save_model(model_path)
+            load_model = DocumentClassifier.load_model(model_path)
+
+            def fail(texts):
+                raise AssertionError("The examples must not be embedded")
+
+            load_model.task.selector._embed_texts = fail
+            load_model.reindex("ivf_flat", {"nlist": 1})
+            assert load_model.init_params["selector_index"] == "ivf_flat"
+
+            load_model.save_model(model_path)
+            reload_model = DocumentClassifier.load_model(model_path)
+            assert reload_model._selector_index == "ivf_flat"
+            assert reload_model.task.selector.vectorstore.index.ntotal == 3
+
+    def test_load_model_lazy(self):
+        """
+        Test that a model loaded with `lazy=True` only reads its parameters,
+        and that its task is built once, on its first use or by `warmup()`,
+        also when it is used from several threads.
+        """
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positivo", "neutral", "negativo"],
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, "model.meteo")
+            model.save_model(model_path)
+
+            load_model = DocumentClassifier.load_model(model_path, lazy=True)
+            assert not load_model.is_loaded
+            assert load_model.is_trained
+            assert load_model.init_params == model.init_params
+
+            builds = []
+            create_builder = load_model.create_builder
+            load_model.create_builder = lambda: builds.append(1) or (
+                create_builder()
+            )
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                tasks = list(executor.map(lambda _: load_model.task, range(8)))
+
+            assert len(builds) == 1
+            assert all(task is tasks[0] for task in tasks)
+            assert load_model.is_loaded
+            assert load_model.task.selector.vectorstore.index.ntotal == 3
+
+            with open(model_path, "rb") as fin:
+                load_model = DocumentClassifier.load_model(fin, lazy=True)
+            assert load_model.warmup().is_loaded
+            load_model.task.model._llm = FakePromptCopyLLM()
+            load_model.task.parser = DummyParser(prompt_labels=[])
+            assert "estoy feliz" in load_model.predict(["hola"])[0][0]
+
+    def test_load_model_selector_index(self):
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            selector_index="hnsw",
+            selector_index_params={"M": 8, "efSearch": 16},
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positivo", "neutral", "negativo"],
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model.save_model(os.path.join(tmp, "model.meteo"))
+            load_model = DocumentClassifier.load_model(
+                os.path.join(tmp, "model.meteo")
+            )
+
+        index = load_model.task.selector.vectorstore.index
+        assert type(index).__name__ == "IndexHNSWFlat"
+        assert index.hnsw.efSearch == 16
+
+    def test_add_remove_examples(self):
+        for selector_algorithm, selector_index in [
+            ("relevance", "flat"),
+            ("similarity", "hnsw"),
+            ("similarity_class_balanced", "flat"),
+        ]:
+            model = DocumentClassifier(
+                language="es",
+                model_provider_name="fake-llm",
+                model_name="fake-static",
+                selector_k=3,
+                selector_algorithm=selector_algorithm,
+                selector_index=selector_index,
+            )
+
+            with pytest.raises(RuntimeError):
+                model.add_examples(["estoy feliz"], ["positivo"])
+
+            model.train(
+                examples=["estoy feliz", "me da igual", "no me gusta"],
+                annotations=["positivo", "neutral", "negativo"],
+            )
+            vectorstore = model.task.selector.vectorstore
+
+            ids = model.add_examples(
+                ["me encanta", "estoy feliz", "me encanta"],
+                ["positivo", "positivo", "positivo"],
+            )
+            assert ids[0] == ids[2]
+            assert vectorstore.index.ntotal == 4
+            assert vectorstore.docstore.search(ids[0]).metadata == {
+                "__INPUT__": "me encanta",
+                "__OUTPUT__": "positivo",
+            }
+
+            model.remove_examples([ids[1]])
+            assert vectorstore.index.ntotal == 3
+            assert len(vectorstore.index_to_docstore_id) == 3
+            assert ids[1] not in vectorstore.index_to_docstore_id.values()
+
+            with pytest.raises(ValueError):
+                model.remove_examples([ids[1]])
+
+            model.task.model._llm = FakePromptCopyLLM()
+            model.task.parser = DummyParser(prompt_labels=[])
+            assert "me encanta" in model.predict(["hola"])[0][0]
+
+    def test_save_model_delta(self):
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            selector_algorithm="similarity_class_balanced",
+            selector_k=3,
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positivo", "neutral", "negativo"],
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, "model.meteo")
+            model.save_model(model_path)
+            base_mtime = os.path.getmtime(model_path)
+
+            ids = model.add_examples(["me encanta"], ["positivo"])
+            original_id = model.task.selector.vectorstore.index_to_docstore_id[
+                0
+            ]
+            model.remove_examples([original_id])
+            model.save_model(model_path)
+
+            # Only the changes are written
+            assert os.path.exists(f"{model_path}.delta")
+            assert os.path.getmtime(model_path) == base_mtime
+            with tarfile.open(f"{model_path}.delta") as tar:
+                assert tar.getnames() == [
+                    "manifest.json",
+                    "selector/delta.json",
+                    "selector/delta.npy",
+                ]
+
+            load_model = DocumentClassifier.load_model(model_path)
+            documents = load_model.task.selector.vectorstore.docstore
+            assert (
+                documents.search(ids[0]).metadata["__INPUT__"] == "me encanta"
+            )
+            assert load_model.task.selector.vectorstore.index.ntotal == 3
+            assert original_id not in (
+                load_model.task.selector.vectorstore.index_to_docstore_id.values()
+            )
+
+            # Further changes are saved on top of the loaded ones
+            load_model.add_examples(["odio esto"], ["negativo"])
+            load_model.save_model(model_path)
+            assert (
+                DocumentClassifier.load_model(
+                    model_path
+                ).task.selector.vectorstore.index.ntotal
+                == 4
+            )
+
+            load_model.save_model(model_path, compact=True)
+            assert not os.path.exists(f"{model_path}.delta")
+            assert (
+                DocumentClassifier.load_model(
+                    model_path
+                ).task.selector.vectorstore.index.ntotal
+                == 4
+            )
+
+    def test_train_embedding_options(self):
+        """
+        Test that the examples are embedded in chunks when training, and that
+        the progress callback is not saved with the model.
+        """
+
+        progress = []
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            embeddings_chunk_size=2,
+            embeddings_max_concurrency=2,
+            embeddings_progress_callback=lambda done, total: progress.append(
+                (done, total)
+            ),
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positivo", "neutral", "negativo"],
+        )
+
+        assert len(progress) == 2 and progress[-1] == (3, 3)
+        assert "embeddings_progress_callback" not in model.init_params
+        assert model.init_params["embeddings_chunk_size"] == 2
+
+    def test_train_deduplicate(self):
+        """
+        Test that the duplicated training examples are not indexed and are
+        reported in `train_report`.
+        """
+
+        with pytest.raises(ValueError):
+            DocumentClassifier(
+                language="es",
+                model_provider_name="fake-llm",
+                model_name="fake-static",
+                train_dedup_threshold=1.5,
+            )
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            train_deduplicate=True,
+            train_coreset_size=2,
+        ).train(
+            examples=["estoy feliz", "estoy feliz", "me da igual", "genial"],
+            annotations=["positivo", "positivo", "neutral", "positivo"],
+        )
+
+        report = model.train_report
+        assert report["exact_duplicates"] == [{"index": 1, "duplicate_of": 0}]
+        assert report["kept"] == 3
+        assert model.task.selector.vectorstore.index.ntotal == 3
+        assert model.init_params["train_coreset_size"] == 2
+
+    def test_selector_max_tokens(self):
+        """
+        Test that `selector_max_tokens` builds the token budget of the task,
+        which is restored when the model is loaded.
+        """
+
+        with pytest.raises(ValueError):
+            DocumentClassifier(
+                language="es",
+                model_provider_name="fake-llm",
+                model_name="fake-static",
+                selector_max_tokens=0,
+            )
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+            selector_max_tokens=1024,
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positivo", "neutral", "negativo"],
+        )
+        assert model.task.token_budget.max_tokens == 1024
+        assert model.task.token_budget.output_tokens == 256
+        assert len(model.task.get_prompts(["hola"])) == 1
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model.save_model(os.path.join(tmp, "model.meteo"))
+            load_model = DocumentClassifier.load_model(
+                os.path.join(tmp, "model.meteo")
+            )
+        assert load_model.task.token_budget.max_tokens == 1024
+
+    def test_load_model_mmap(self):
+        """
+        Test that a model loaded memory-mapped is extracted once into the
+        cache folder and predicts like a model loaded in memory.
+        """
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positivo", "neutral", "negativo"],
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, "model.meteo")
+            cache_dir = os.path.join(tmp, "cache")
+            model.save_model(model_path)
+
+            load_model = DocumentClassifier.load_model(
+                model_path, mmap=True, cache_dir=cache_dir
+            )
+            DocumentClassifier.load_model(
+                model_path, mmap=True, cache_dir=cache_dir
+            )
+            assert len(os.listdir(cache_dir)) == 1
+
+            vectorstore = load_model.task.selector.vectorstore
+            assert vectorstore.index.ntotal == 3
+            assert sorted(
+                vectorstore.docstore.search(doc_id).metadata["__INPUT__"]
+                for doc_id in vectorstore.index_to_docstore_id.values()
+            ) == ["estoy feliz", "me da igual", "no me gusta"]
+
+            load_model.task.model._llm = FakePromptCopyLLM()
+            load_model.task.parser = DummyParser(prompt_labels=[])
+            assert "estoy feliz" in load_model.predict(["hola"])[0][0]
+
+            with pytest.raises(RuntimeError):
+                load_model.add_examples(["me encanta"], ["positivo"])
+
+            # A new version of the model replaces the extracted folder
+            extracted = os.listdir(cache_dir)
+            os.utime(model_path, ns=(0, 0))
+            DocumentClassifier.load_model(
+                model_path, mmap=True, cache_dir=cache_dir
+            )
+            assert len(os.listdir(cache_dir)) == 1
+            assert os.listdir(cache_dir) != extracted
+
+            # Pending changes must be compacted before mapping the model
+            model.add_examples(["me encanta"], ["positivo"])
+            model.save_model(model_path)
+            with pytest.raises(ValueError):
+                DocumentClassifier.load_model(
+                    model_path, mmap=True, cache_dir=cache_dir
+                )
+
+    def test_predict_concurrent(self):
+        """
+        Test that concurrent predictions keep the order of the input samples
+        and that errors can be captured per sample.
+        """
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positive", "neutral", "negative"],
+        )
+        model.task.model._llm = FakePromptCopyLLM()
+        model.task.parser = DummyParser(prompt_labels=[])
+
+        examples = [f"sample number {idx}" for idx in range(20)]
+
+        def assert_ordered(preds):
+            assert len(preds) == len(examples)
+            for example, pred in zip(examples, preds):
+                assert pred[0].strip().endswith(example)
+
+        assert_ordered(model.predict(examples))
+        assert_ordered(model.predict(examples, max_concurrency=4))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert_ordered(model.predict(examples, executor=executor))
+
+        assert_ordered(model.predict(examples, batch_size=8))
+        assert_ordered(model.predict(examples, batch_size=8, max_concurrency=2))
+
+        original_run = model.task.run_prompt
+
+        def failing_run(prompt):
+            if prompt.strip().endswith(examples[3]):
+                raise RuntimeError("LLM error")
+            return original_run(prompt)
+
+        model.task.run_prompt = failing_run
+
+        with pytest.raises(RuntimeError):
+            model.predict(examples, max_concurrency=4)
+
+        preds = model.predict(
+            examples, max_concurrency=4, return_exceptions=True
+        )
+        assert isinstance(preds[3], RuntimeError)
+        for example, pred in zip(examples[4:], preds[4:]):
+            assert pred[0].strip().endswith(example)
+
+    def test_apredict(self):
+        """
+        Test that the asynchronous prediction returns the same predictions as
+        `predict()` keeping the order of the input samples.
+        """
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positive", "neutral", "negative"],
+        )
+
+        assert asyncio.run(model.apredict(["positive"])) == [["positive"]]
+
+        model.task.model._llm = FakePromptCopyLLM()
+        model.task.parser = DummyParser(prompt_labels=[])
+
+        examples = [f"sample number {idx}" for idx in range(20)]
+        preds = asyncio.run(model.apredict(examples, max_concurrency=4))
+
+        assert len(preds) == len(examples)
+        for example, pred in zip(examples, preds):
+            assert pred[0].strip().endswith(example)
+
+        with pytest.raises(ValueError):
+            asyncio.run(model.apredict("Wrong type this is expected a list"))
+
+    def test_predict_iter(self):
+        """
+        Test that the predictions over a stream of samples are yielded lazily
+        with the index of their sample.
+        """
+
+        model = DocumentClassifier(
+            language="es",
+            model_provider_name="fake-llm",
+            model_name="fake-static",
+        ).train(
+            examples=["estoy feliz", "me da igual", "no me gusta"],
+            annotations=["positive", "neutral", "negative"],
+        )
+        model.task.model._llm = FakePromptCopyLLM()
+        model.task.parser = DummyParser(prompt_labels=[])
+
+        consumed = []
+
+        def stream():
+            for idx in range(20):
+                consumed.append(idx)
+                yield f"sample number {idx}"
+
+        preds = model.predict_iter(stream(), max_concurrency=4, with_index=True)
+        idx, pred = next(preds)
+        assert len(consumed) < 20
+        assert pred[0].strip().endswith(f"sample number {idx}")
+
+        for idx, pred in preds:
+            assert pred[0].strip().endswith(f"sample number {idx}")
+        assert len(consumed) == 20
+
+        preds = list(model.predict_iter(iter(["uno", "dos"])))
+        assert preds[0][0].strip().endswith("uno")
+        assert preds[1][0].strip().endswith("dos")
+
+        preds = list(
+            model.predict_iter(["uno", 2, "tres"], return_exceptions=True)
+        )
+        assert isinstance(preds[1], ValueError)
@@ -1,3 +1,5 @@
+import subprocess
+import sys
 from unittest.mock import MagicMock
 
 import pytest
@@ -34,16 +36,41 @@ class TestModels:
 
         assert error.value.args[0] == invalid_provider
 
+    def test_model_factory_lazy_import(self):
+        from promptmeteo.models.fake_llm import FakeLLM
+
+        assert ModelFactory.get_model_class("fake-llm") is FakeLLM
+
+        # Providers and FAISS are not imported with the package
+        modules = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, promptmeteo; print(' '.join(sys.modules))",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+
+        assert "promptmeteo.models.bedrock" not in modules
+        assert "promptmeteo.models.openai" not in modules
+        assert "boto3" not in modules
+        assert "faiss" not in modules
+
     def test_model_openai(self):
         from promptmeteo.models.openai import ModelTypes
         from promptmeteo.models.openai import OpenAILLM
 
         for model_name in ModelTypes:
-            OpenAILLM(
+            model = OpenAILLM(
                 model_name=model_name.value,
                 model_params={},
                 model_provider_token="TEST_TOKEN",
             )
+            assert model.is_deterministic == (
+                model_name == ModelTypes.GPT35Turbo
+            )
 
         with pytest.raises(ValueError) as error:
             OpenAILLM(
@@ -58,6 +85,190 @@ class TestModels:
         assert error.value.args[0] == invalid_provider
 
 
+    def test_model_openai_client_pool(self, monkeypatch):
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler
+        from http.server import ThreadingHTTPServer
+
+        import openai
+
+        from promptmeteo.models import clients
+        from promptmeteo.models.openai import OpenAILLM
+
+        ports = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                request = json.loads(
+                    self.rfile.read(int(self.headers["Content-Length"]))
+                )
+                prompts = request["prompt"]
+                ports.append(self.client_address[1])
+                body = json.dumps(
+                    {
+                        "id": "cmpl-test",
+                        "object": "text_completion",
+                        "created": 0,
+                        "model": "gpt-3.5-turbo-instruct",
+                        "choices": [
+                            {
+                                "text": "positive",
+                                "index": index,
+                                "logprobs": None,
+                                "finish_reason": "stop",
+                            }
+                            for index in range(
+                                len(prompts) if isinstance(prompts, list) else 1
+                            )
+                        ],
+                        "usage": {
+                            "prompt_tokens": 1,
+                            "completion_tokens": 1,
+                            "total_tokens": 2,
+                        },
+                    }
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+        monkeypatch.setattr(openai, "requestssession", None)
+        monkeypatch.setattr(clients, "_pool", clients.ClientPool())
+
+        try:
+            model_params = {
+                "model_name": "gpt-3.5-turbo-instruct",
+                "temperature": 0.0,
+                "max_retries": 1,
+                "openai_api_base": f"http://127.0.0.1:{server.server_port}/v1",
+            }
+
+            # By default the models keep the timeout and the session of the
+            # openai package
+            model = OpenAILLM(
+                model_name="gpt-3.5-turbo-instruct",
+                model_params=model_params,
+                model_provider_token="TOKEN_1",
+            )
+            assert model.llm.request_timeout is None
+            assert model.run("sample") == "positive"
+            assert openai.requestssession is None
+
+            clients.configure(
+                max_connections=2,
+                timeout=5.0,
+                connect_timeout=1.0,
+                share_session=True,
+            )
+            stats = clients.stats()
+            ports.clear()
+
+            models = [
+                OpenAILLM(
+                    model_name="gpt-3.5-turbo-instruct",
+                    model_params=model_params,
+                    model_provider_token=token,
+                )
+                for token in ["TOKEN_1", "TOKEN_1", "TOKEN_2"]
+            ]
+
+            assert models[0].llm is models[1].llm
+            assert models[0].llm is not models[2].llm
+            assert models[0].llm.request_timeout == (1.0, 5.0)
+            assert clients.stats() == {
+                "clients": 2,
+                "created": stats["created"] + 2,
+                "reused": stats["reused"] + 1,
+                "evicted": 0,
+            }
+
+            for model in models:
+                assert model.run("sample") == "positive"
+                assert model.run_batch(["sample", "sample"]) == [
+                    "positive",
+                    "positive",
+                ]
+
+            assert len(ports) == 6
+            assert len(set(ports)) == 1
+            assert isinstance(openai.requestssession, clients.PooledSession)
+
+            clients.clear()
+            assert openai.requestssession is None
+
+        finally:
+            clients.clear()
+            server.shutdown()
+            server.server_close()
+
+    def test_client_pool_eviction(self):
+        """
+        Test that the pool keeps the most recently used clients and closes
+        the connections of the evicted ones once no model uses them.
+        """
+
+        import gc
+
+        from promptmeteo.models import clients
+
+        class Connections:
+            def __init__(self):
+                self.closed = False
+
+            def close(self):
+                self.closed = True
+
+        class Resource:
+            def __init__(self):
+                self._client = Connections()
+
+        class Client:
+            def __init__(self, **kwargs):
+                self.client = Resource()
+
+        pool = clients.ClientPool(max_clients=2)
+
+        def get(token):
+            return pool.get("openai", Client, "url", {"token": token}, {})
+
+        first = get("TOKEN_1")
+        second = get("TOKEN_2")
+        connections = second.client._client
+        assert get("TOKEN_1") is first
+
+        # The least recently used client is evicted, and only closed when
+        # it is released
+        third = get("TOKEN_3")
+        assert pool.stats == {
+            "clients": 2,
+            "created": 3,
+            "reused": 1,
+            "evicted": 1,
+        }
+        assert get("TOKEN_1") is first
+        assert not connections.closed
+        del second
+        gc.collect()
+        assert connections.closed
+
+        get("TOKEN_4")
+        assert get("TOKEN_1") is first
+        assert not first.client._client.closed
+        assert not third.client._client.closed
+
     def test_model_bedrock(self):
         from promptmeteo.models.bedrock import BedrockLLM
         from promptmeteo.models.bedrock import ModelTypes
@@ -109,6 +320,44 @@ class TestModels:
         )
         assert error.value.args[0] == invalid_provider
 
+    def test_model_run_batch(self):
+        from langchain.chat_models.fake import FakeListChatModel
+        from promptmeteo.models.fake_llm import FakeLLM
+        from promptmeteo.models.fake_llm import FakePromptCopyLLM
+
+        model = FakeLLM(model_name="fake-static")
+        model._llm = FakePromptCopyLLM()
+        samples = [f"sample {idx}" for idx in range(7)]
+
+        assert model.supports_batch
+        assert model.run_batch(samples) == samples
+        assert model.run_batch(samples, batch_size=3) == samples
+
+        model._llm = FakeListChatModel(responses=["uno", "dos", "tres"])
+        assert not model.supports_batch
+        assert model.run_batch(samples[:3], batch_size=2) == [
+            "uno",
+            "dos",
+            "tres",
+        ]
+
+    def test_model_lazy_embeddings(self):
+        from langchain.embeddings import FakeEmbeddings
+        from promptmeteo.cache import CachedEmbeddings
+        from promptmeteo.models.fake_llm import FakeLLM
+
+        model = FakeLLM(model_name="fake-static")
+        assert not model.embeddings_loaded
+
+        model.wrap_embeddings(CachedEmbeddings)
+        assert not model.embeddings_loaded
+
+        embeddings = model.embeddings
+        assert model.embeddings_loaded
+        assert isinstance(embeddings, CachedEmbeddings)
+        assert isinstance(embeddings.embeddings, FakeEmbeddings)
+        assert model.embeddings is embeddings
+
     def test_model_hf_hub_api(self, mocker):
         from promptmeteo.models.hf_hub_api import ModelTypes
         from promptmeteo.models.hf_hub_api import HFHubApiLLM
@@ -1,11 +1,18 @@
 import os
 import yaml
+import shutil
 import pytest
 from tests.tools import DictionaryChecker
 
 from promptmeteo.prompts import BasePrompt
 from promptmeteo.prompts import PromptFactory
+from promptmeteo.prompts import PromptRegistry
 from promptmeteo.prompts import module_dir
+from promptmeteo.prompts.bundle import BUNDLE_FILE
+from promptmeteo.prompts.bundle import build_bundle
+from promptmeteo.prompts.bundle import load_prompts
+from promptmeteo.prompts.bundle import main
+from promptmeteo.prompts.bundle import read_bundle
 
 
 class TestPrompts:
@@ -159,3 +166,194 @@ class TestPrompts:
                         f"Error in {model_name}_{language}_{task_type}.prompt "
                         f"the word `{word}` is not in the dictionary"
                     )
+
+    def test_prompt_compile(self):
+        """
+        Test that the prompt is compiled once and recompiled when its
+        sections change.
+        """
+
+        prompt = PromptFactory.factory_method(
+            language="es",
+            task_type="classification",
+            model_name="fake-static",
+            prompt_domain="TEST DOMAIN",
+            prompt_labels=["true", "false"],
+            prompt_detail="TEST PROMPT DETAIL",
+        )
+
+        compiled = prompt.compile()
+        assert prompt.compile() is compiled
+        assert "__SAMPLE__" in compiled.input_variables
+        assert compiled.format(
+            __SAMPLE__="sample", __EXAMPLES__="examples"
+        ) == prompt.run().format(__SAMPLE__="sample", __EXAMPLES__="examples")
+
+        prompt.domain = "OTHER DOMAIN"
+        assert prompt.compile() is not compiled
+        assert "OTHER DOMAIN" in prompt.template
+
+    def test_prompt_registry(self):
+        """
+        Test that the prompt classes are built once and rebuilt after a
+        refresh.
+        """
+
+        def build():
+            return PromptFactory.factory_method(
+                language="es",
+                task_type="ner",
+                model_name="fake-static",
+                prompt_domain="TEST DOMAIN",
+                prompt_labels=["true", "false"],
+                prompt_detail="TEST PROMPT DETAIL",
+            )
+
+        prompt = build()
+        assert type(build()) is type(prompt)
+        assert PromptRegistry.taxonomy() is PromptRegistry.taxonomy()
+
+        PromptRegistry.refresh()
+        assert type(build()) is not type(prompt)
+        assert build().template == prompt.template
+
+    def test_prompt_bundle(self):
+        """
+        Test that the shipped prompt bundle is up to date and is used by the
+        prompt registry.
+        """
+
+        assert read_bundle(verify=True) is not None, (
+            "The prompt bundle is out of date, run "
+            "`python -m promptmeteo.prompts` to build it again."
+        )
+
+        PromptRegistry.refresh()
+        prompt = PromptRegistry.prompts()[("fake-static", "es", "ner")]
+        assert "sections" in prompt
+
+        with open(
+            os.path.join(module_dir, "fake-static_es_ner.prompt"),
+            encoding="utf-8",
+        ) as fin:
+            BasePrompt.read_prompt(fin.read())
+        assert prompt["sections"]["TEMPLATE"] == BasePrompt.TEMPLATE
+
+    def test_prompt_bundle_fallback(self, tmp_path):
+        """
+        Test that the prompt files are read when the bundle is missing or
+        out of date.
+        """
+
+        for file_name in [
+            "fake-static_es_ner.prompt",
+            "fake-static_en_qa.prompt",
+        ]:
+            shutil.copy(os.path.join(module_dir, file_name), tmp_path)
+
+        assert read_bundle(str(tmp_path)) is None
+        assert load_prompts(str(tmp_path)) == {
+            ("fake-static", "es", "ner"): {"file": "fake-static_es_ner.prompt"},
+            ("fake-static", "en", "qa"): {"file": "fake-static_en_qa.prompt"},
+        }
+
+        bundle = build_bundle(str(tmp_path))
+        assert read_bundle(str(tmp_path)) == bundle
+        prompts = load_prompts(str(tmp_path))
+        assert "sections" in prompts[("fake-static", "en", "qa")]
+
+        with open(tmp_path / "fake-static_en_qa.prompt", "a") as fout:
+            fout.write("\n")
+        assert read_bundle(str(tmp_path)) is None
+
+        with open(tmp_path / "fake-static_en_qa.prompt", "r+") as fout:
+            fout.write("#")
+        build_bundle(str(tmp_path))
+        with open(tmp_path / "fake-static_en_qa.prompt", "r+") as fout:
+            fout.write("%")
+        assert read_bundle(str(tmp_path)) is None
+        assert "sections" not in load_prompts(str(tmp_path))[
+            ("fake-static", "en", "qa")
+        ]
+
+    def test_prompt_bundle_reads(self, tmp_path, monkeypatch):
+        """
+        Test that only the prompt files modified after the bundle was
+        written are read to compare their checksum.
+        """
+
+        from promptmeteo.prompts import bundle
+
+        for file_name in [
+            "fake-static_es_ner.prompt",
+            "fake-static_en_qa.prompt",
+        ]:
+            shutil.copy(os.path.join(module_dir, file_name), tmp_path)
+            os.utime(tmp_path / file_name, (0, 0))
+        build_bundle(str(tmp_path))
+
+        digests = []
+        monkeypatch.setattr(
+            bundle,
+            "file_digest",
+            lambda path: digests.append(path) or bundle.hashlib.sha256(
+                open(path, "rb").read()
+            ).hexdigest(),
+        )
+
+        assert read_bundle(str(tmp_path)) is not None
+        assert digests == []
+
+        bundle_mtime = os.stat(tmp_path / BUNDLE_FILE).st_mtime
+        os.utime(
+            tmp_path / "fake-static_en_qa.prompt",
+            (bundle_mtime + 10, bundle_mtime + 10),
+        )
+        assert read_bundle(str(tmp_path)) is not None
+        assert digests == [str(tmp_path / "fake-static_en_qa.prompt")]
+
+        assert read_bundle(str(tmp_path), verify=True) is not None
+        assert len(digests) == 3
+
+    def test_prompt_bundle_check(self, tmp_path):
+        """
+        Test that `python -m promptmeteo.prompts --check` fails when the
+        bundle is missing or out of date.
+        """
+
+        assert main(["--check"]) == 0
+
+        shutil.copy(
+            os.path.join(module_dir, "fake-static_es_ner.prompt"), tmp_path
+        )
+        assert main(["--check", "--folder", str(tmp_path)]) == 1
+        assert main(["--folder", str(tmp_path)]) == 0
+        assert main(["--check", "--folder", str(tmp_path)]) == 0
+
+        with open(tmp_path / "fake-static_es_ner.prompt", "r+") as fout:
+            fout.write("%")
+        assert main(["--check", "--folder", str(tmp_path)]) == 1
+
+    def test_prompt_bundle_malformed(self, tmp_path):
+        """
+        Test that malformed prompt files are caught when the bundle is built.
+        """
+
+        for prompt_text in [
+            "PROMPT_SAMPLE: 'Missing template'",
+            "TEMPLATE: '{__PROMPT_DOMAIN__}'\nPROMPT_DOMAIN: '{__UNKNOWN__}'",
+            "TEMPLATE: [1, 2]",
+        ]:
+            with open(tmp_path / "fake_es_ner.prompt", "w") as fout:
+                fout.write(prompt_text)
+
+            with pytest.raises(ValueError):
+                build_bundle(str(tmp_path))
+            assert not os.path.exists(tmp_path / BUNDLE_FILE)
+
+        with open(tmp_path / "fake_es_ner.prompt", "w") as fout:
+            fout.write("TEMPLATE: 'Valid template'")
+        os.rename(tmp_path / "fake_es_ner.prompt", tmp_path / "fake_ner.prompt")
+
+        with pytest.raises(ValueError):
+            build_bundle(str(tmp_path))
@@ -0,0 +1,164 @@
+import os
+import json
+import shutil
+import tarfile
+import tempfile
+
+import pytest
+
+from promptmeteo import DocumentClassifier
+from promptmeteo.registry import ModelRegistry
+
+
+def train_model(examples):
+    return DocumentClassifier(
+        language="es",
+        model_provider_name="fake-llm",
+        model_name="fake-static",
+    ).train(
+        examples=examples,
+        annotations=["positivo", "neutral", "negativo"][: len(examples)],
+    )
+
+
+class TestRegistry:
+    def test_registry_dedup(self):
+        """
+        Test that artifacts with the same contents are loaded once, and that
+        models of different artifacts share their LLM and embeddings.
+        """
+
+        registry = ModelRegistry()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path_a = os.path.join(tmp, "a.meteo")
+            path_b = os.path.join(tmp, "b.meteo")
+            path_c = os.path.join(tmp, "c.meteo")
+            train_model(["estoy feliz", "me da igual"]).save_model(path_a)
+            shutil.copy(path_a, path_b)
+            train_model(["no me gusta", "genial", "vale"]).save_model(path_c)
+
+            model_a = registry.get(path_a)
+            assert isinstance(model_a, DocumentClassifier)
+            assert registry.get(path_b) is model_a
+            assert registry.get(path_a) is model_a
+
+            model_c = registry.get(path_c)
+            assert model_c is not model_a
+            assert model_c.task.model.llm is model_a.task.model.llm
+            assert (
+                model_c.task.model.embeddings is model_a.task.model.embeddings
+            )
+            assert model_c.task.model is not model_a.task.model
+
+            stats = registry.stats
+            assert stats["models"] == 2
+            assert stats["paths"] == 3
+            assert stats["hits"] == 2
+            assert stats["misses"] == 2
+            assert stats["shared_llms"] == 1
+
+    def test_registry_lazy_shared(self):
+        """
+        Test that lazy models loaded through the registry share their LLM
+        and embeddings when they are built.
+        """
+
+        registry = ModelRegistry()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path_a = os.path.join(tmp, "a.meteo")
+            path_b = os.path.join(tmp, "b.meteo")
+            train_model(["estoy feliz", "me da igual"]).save_model(path_a)
+            train_model(["no me gusta", "genial"]).save_model(path_b)
+
+            model_a = registry.get(path_a, lazy=True)
+            model_b = registry.get(path_b, lazy=True)
+            assert not model_a.is_loaded and not model_b.is_loaded
+            assert registry.stats["shared_llms"] == 0
+
+            assert model_a.task.model.llm is model_b.task.model.llm
+            assert (
+                model_a.task.model.embeddings is model_b.task.model.embeddings
+            )
+            assert registry.stats["shared_llms"] == 1
+
+    def test_registry_memory_budget(self):
+        """
+        Test that the least recently used models are evicted when they do
+        not fit in the memory budget, and that modified artifacts are
+        loaded again.
+        """
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path_a = os.path.join(tmp, "a.meteo")
+            path_b = os.path.join(tmp, "b.meteo")
+            train_model(["estoy feliz", "me da igual"]).save_model(path_a)
+            train_model(["no me gusta", "genial"]).save_model(path_b)
+
+            registry = ModelRegistry(
+                memory_budget=int(os.path.getsize(path_a) * 1.5)
+            )
+            model_a = registry.get(path_a)
+            registry.get(path_b)
+            assert registry.stats["evictions"] == 1
+            assert registry.stats["models"] == 1
+            assert registry.get(path_a) is not model_a
+
+            model = registry.get(path_a)
+            train_model(["vale", "bien"]).save_model(path_a)
+            assert registry.get(path_a) is not model
+
+    def test_registry_model_class(self):
+        """
+        Test that the class of the models saved by previous versions, which
+        do not record it, must be given.
+        """
+
+        registry = ModelRegistry()
+        model = train_model(["estoy feliz", "me da igual"])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model.task.selector.save_example_selector(
+                os.path.join(tmp, "legacy")
+            )
+            with open(os.path.join(tmp, "legacy.init"), "w") as fout:
+                json.dump(model.init_params, fout)
+            path = os.path.join(tmp, "legacy.meteo")
+            with tarfile.open(path, mode="w:gz") as tar:
+                tar.add(os.path.join(tmp, "legacy"), arcname="legacy.meteo")
+                tar.add(os.path.join(tmp, "legacy.init"), arcname="legacy.init")
+
+            with pytest.raises(ValueError):
+                registry.get(path)
+            assert isinstance(
+                registry.get(path, DocumentClassifier), DocumentClassifier
+            )
+
+    def test_registry_load_arguments(self):
+        """
+        Test that models loaded with different arguments are not shared,
+        and that a failed load can be retried.
+        """
+
+        registry = ModelRegistry()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.meteo")
+            train_model(["estoy feliz", "me da igual"]).save_model(path)
+
+            model = registry.get(path)
+            assert registry.get(path, verify=True) is model
+
+            lazy_model = registry.get(path, lazy=True)
+            assert lazy_model is not model
+            assert not lazy_model.is_loaded
+            assert model.is_loaded
+            assert registry.get(path, lazy=True) is lazy_model
+
+            registry.remove(path)
+            assert registry.stats["models"] == 0
+
+            with pytest.raises(TypeError):
+                registry.get(path, unknown_argument=True)
+            assert registry._loading == {}
@@ -1,6 +1,10 @@
+import os
+import tempfile
+
 import pytest
 
 from langchain.embeddings import FakeEmbeddings
+from langchain.embeddings import DeterministicFakeEmbedding
 
 from promptmeteo.selector import SelectorTypes
 from promptmeteo.selector import SelectorFactory
@@ -86,3 +90,630 @@ class TestSelectors:
                     1:
                 ]
             )
+
+    def test_supervised_selector_run_batch(self):
+        """
+        Test that selecting the examples of a batch returns the same
+        examples as selecting them sample by sample.
+        """
+
+        examples = [f"example {idx}" for idx in range(30)]
+        annotations = [f"label {idx % 3}" for idx in range(30)]
+        samples = [f"sample {idx}" for idx in range(7)]
+
+        for selector_algorithm in [
+            SelectorAlgorithms.SIMILARITY,
+            SelectorAlgorithms.RELEVANCE,
+        ]:
+            selector = BaseSelectorSupervised(
+                language="es",
+                embeddings=DeterministicFakeEmbedding(size=16),
+                selector_k=3,
+                selector_algorithm=selector_algorithm,
+            ).train(examples=examples, annotations=annotations)
+
+            assert selector.run_batch(samples, chunk_size=3) == [
+                selector.run(sample) for sample in samples
+            ]
+
+    def test_selector_batch_query_embeddings(self):
+        """
+        Test that the samples of a batch are embedded as queries, also with
+        embeddings whose queries are embedded differently from documents.
+        """
+
+        from promptmeteo.cache.embeddings_cache import CachedEmbeddings
+        from promptmeteo.selector.embedding import embed_queries
+
+        class QueryEmbedding(DeterministicFakeEmbedding):
+            def embed_query(self, text):
+                return super().embed_query(f"query: {text}")
+
+        examples = [f"example {idx}" for idx in range(30)]
+        annotations = [f"label {idx % 3}" for idx in range(30)]
+        samples = [f"example {idx}" for idx in range(0, 30, 4)]
+
+        embeddings = QueryEmbedding(size=16)
+        assert embed_queries(embeddings, samples) == [
+            embeddings.embed_query(sample) for sample in samples
+        ]
+        assert embed_queries(embeddings, samples) != (
+            embeddings.embed_documents(samples)
+        )
+        cached = CachedEmbeddings(embeddings)
+        assert embed_queries(cached, samples) == [
+            embeddings.embed_query(sample) for sample in samples
+        ]
+
+        for selector_algorithm in [
+            SelectorAlgorithms.SIMILARITY,
+            SelectorAlgorithms.RELEVANCE,
+        ]:
+            selector = BaseSelectorSupervised(
+                language="es",
+                embeddings=embeddings,
+                selector_k=3,
+                selector_algorithm=selector_algorithm,
+            ).train(examples=examples, annotations=annotations)
+
+            assert selector.select_batch(samples, chunk_size=3) == [
+                selector.select(sample) for sample in samples
+            ]
+
+    def test_balanced_selector_partitions(self):
+        """
+        Test that the balanced selector searches one sub-index per class,
+        and that the sub-indexes are saved and loaded with the selector.
+        """
+
+        examples = [f"example {idx}" for idx in range(20)] + ["rare example"]
+        annotations = ["common"] * 10 + ["other"] * 10 + ["rare"]
+        samples = [f"sample {idx}" for idx in range(5)]
+
+        selector = BaseSelectorSupervised(
+            language="es",
+            embeddings=DeterministicFakeEmbedding(size=16),
+            selector_k=6,
+            selector_algorithm=SelectorAlgorithms.SIMILARITY_CLASS_BALANCED,
+        ).train(examples=examples, annotations=annotations)
+
+        assert set(selector._selector.partitions) == {"common", "other", "rare"}
+
+        # Rare classes are not left short by filtering
+        for sample_examples in selector._selector.select_examples_by_vectors(
+            DeterministicFakeEmbedding(size=16).embed_documents(samples)
+        ):
+            labels = [example["__OUTPUT__"] for example in sample_examples]
+            assert labels.count("rare") == 1
+            assert labels.count("common") == 2 or labels.count("other") == 2
+            assert len(labels) == 5
+
+        with tempfile.TemporaryDirectory() as tmp:
+            selector.save_example_selector(tmp)
+            assert os.path.exists(os.path.join(tmp, "partitions.json"))
+
+            loaded = BaseSelectorSupervised(
+                language="es",
+                embeddings=DeterministicFakeEmbedding(size=16),
+                selector_k=6,
+                selector_algorithm=SelectorAlgorithms.SIMILARITY_CLASS_BALANCED,
+            ).load_example_selector(
+                tmp,
+                input_keys=["__INPUT__"],
+                class_list=["common", "other", "rare"],
+                class_key="__OUTPUT__",
+            )
+            assert loaded._selector.partition_ids == (
+                selector._selector.partition_ids
+            )
+
+            # Models saved without sub-indexes rebuild them when loaded
+            os.remove(os.path.join(tmp, "partitions.json"))
+            loaded.load_example_selector(
+                tmp,
+                input_keys=["__INPUT__"],
+                class_list=["common", "other", "rare"],
+                class_key="__OUTPUT__",
+            )
+            assert loaded._selector.partition_ids == (
+                selector._selector.partition_ids
+            )
+
+        # Examples are shuffled, so only the selected sets are compared
+        for batch_examples, sample in zip(selector.run_batch(samples), samples):
+            assert set(batch_examples.split("\n\n")) == set(
+                selector.run(sample).split("\n\n")
+            )
+
+    def test_supervised_selector_index(self):
+        """
+        Test the approximate index types of the selectors and that their
+        search parameters are restored when they are loaded.
+        """
+
+        import faiss
+
+        examples = [f"example {idx}" for idx in range(300)]
+        annotations = [f"label {idx % 3}" for idx in range(300)]
+
+        for selector_index, selector_index_params, index_cls in [
+            ("flat", None, faiss.IndexFlat),
+            ("ivf_flat", {"nlist": 16, "nprobe": 4}, faiss.IndexIVFFlat),
+            ("hnsw", {"M": 16, "efSearch": 32}, faiss.IndexHNSWFlat),
+            ("ivf_pq", {"nlist": 8, "pq_m": 4}, faiss.IndexIVFPQ),
+        ]:
+            for selector_algorithm in SelectorAlgorithms:
+
+                def build():
+                    return BaseSelectorSupervised(
+                        language="es",
+                        embeddings=DeterministicFakeEmbedding(size=16),
+                        selector_k=3,
+                        selector_algorithm=selector_algorithm,
+                        selector_index=selector_index,
+                        selector_index_params=selector_index_params,
+                    )
+
+                selector = build().train(
+                    examples=examples, annotations=annotations
+                )
+                index = selector.vectorstore.index
+                assert isinstance(index, index_cls)
+                assert len(selector.run("sample").split("\n\n")) == 3
+
+                with tempfile.TemporaryDirectory() as tmp:
+                    selector.save_example_selector(tmp)
+                    loaded = build().load_example_selector(
+                        tmp,
+                        input_keys=["__INPUT__"],
+                        class_list=["label 0", "label 1", "label 2"],
+                        class_key="__OUTPUT__",
+                    )
+
+                loaded_index = loaded.vectorstore.index
+                assert isinstance(loaded_index, index_cls)
+                if selector_index == "ivf_flat":
+                    assert loaded_index.nprobe == 4
+                if selector_index == "hnsw":
+                    assert loaded_index.hnsw.efSearch == 32
+
+                if selector_index == "ivf_pq" and selector_algorithm == (
+                    SelectorAlgorithms.SIMILARITY_CLASS_BALANCED
+                ):
+                    # The class sub-indexes are built from the raw vectors,
+                    # not from their approximations
+                    rows = [
+                        row
+                        for row, (_, document) in enumerate(
+                            selector._documents()
+                        )
+                        if document.metadata["__OUTPUT__"] == "label 1"
+                    ]
+                    partition = selector._selector.partitions["label 1"]
+                    assert (
+                        partition.reconstruct_n(0, partition.ntotal)
+                        == selector._vectors[rows]
+                    ).all()
+
+                if selector_index == "ivf_pq" and selector_algorithm == (
+                    SelectorAlgorithms.SIMILARITY
+                ):
+                    # The codes of the examples left are computed from
+                    # their raw vectors, so they do not change
+                    approximations = index.reconstruct_n(10, 290)
+                    ids = [doc_id for doc_id, _ in selector._documents()]
+                    selector.remove_examples(ids[:5])
+                    selector.remove_examples(ids[5:10])
+                    assert selector._vectors.shape == (290, 16)
+                    assert (
+                        selector.vectorstore.index.reconstruct_n(0, 290)
+                        == approximations
+                    ).all()
+
+        with pytest.raises(ValueError):
+            BaseSelectorSupervised(
+                language="es",
+                embeddings=DeterministicFakeEmbedding(size=16),
+                selector_k=3,
+                selector_algorithm="similarity",
+                selector_index="hnsw",
+                selector_index_params={"nlist": 16},
+            )
+
+        with pytest.raises(ValueError):
+            BaseSelectorSupervised(
+                language="es",
+                embeddings=DeterministicFakeEmbedding(size=16),
+                selector_k=3,
+                selector_algorithm="similarity",
+                selector_index="WRONG_INDEX",
+            )
+
+    def test_supervised_selector_mmap(self):
+        """
+        Test that a vectorstore prepared with `prepare_mmap()` and loaded
+        memory-mapped selects the same examples as the original one.
+        """
+
+        examples = [f"example {idx}" for idx in range(60)]
+        annotations = [f"label {idx % 3}" for idx in range(60)]
+
+        for selector_index, selector_index_params, selector_algorithm in [
+            ("flat", None, "relevance"),
+            ("flat", None, "similarity"),
+            ("ivf_flat", {"nlist": 4, "nprobe": 4}, "relevance"),
+            ("flat", None, "similarity_class_balanced"),
+        ]:
+
+            def build():
+                return BaseSelectorSupervised(
+                    language="es",
+                    embeddings=DeterministicFakeEmbedding(size=16),
+                    selector_k=3,
+                    selector_algorithm=selector_algorithm,
+                    selector_index=selector_index,
+                    selector_index_params=selector_index_params,
+                )
+
+            selector = build().train(examples=examples, annotations=annotations)
+
+            with tempfile.TemporaryDirectory() as tmp:
+                selector.save_example_selector(tmp)
+                BaseSelectorSupervised.prepare_mmap(tmp)
+                loaded = build().load_example_selector(
+                    tmp,
+                    mmap=True,
+                    input_keys=["__INPUT__"],
+                    class_list=["label 0", "label 1", "label 2"],
+                    class_key="__OUTPUT__",
+                )
+
+                # The balanced selector does not keep the order of classes
+                for sample in ["example 7", "example 42", "other"]:
+                    assert sorted(loaded.run(sample).split("\n\n")) == sorted(
+                        selector.run(sample).split("\n\n")
+                    )
+
+                docstore = loaded.vectorstore.docstore
+                doc_id = loaded.vectorstore.index_to_docstore_id[5]
+                assert (
+                    docstore.search(doc_id).page_content
+                    == selector.vectorstore.docstore.search(doc_id).page_content
+                )
+                assert docstore.search("missing") == "ID missing not found."
+
+                with pytest.raises(RuntimeError):
+                    loaded.add_examples(["example"], ["label 0"])
+
+    def test_embed_texts(self):
+        """
+        Test the chunked embedding of the examples, with retries, progress
+        and a checkpoint to resume it after an error.
+        """
+
+        import numpy as np
+        from promptmeteo.selector.embedding import embed_texts
+
+        class FlakyEmbedding(DeterministicFakeEmbedding):
+            calls: list = []
+            fail_on: set = set()
+
+            def embed_documents(self, texts):
+                self.calls.append(texts[0])
+                if texts[0] in self.fail_on:
+                    self.fail_on.discard(texts[0])
+                    raise ConnectionError("Transient error")
+                return super().embed_documents(texts)
+
+        texts = [f"example {idx}" for idx in range(10)]
+        expected = np.asarray(
+            DeterministicFakeEmbedding(size=8).embed_documents(texts),
+            dtype=np.float32,
+        )
+
+        embeddings = FlakyEmbedding(size=8)
+        progress = []
+        embeddings.fail_on = {"example 3"}
+        vectors = embed_texts(
+            embeddings,
+            texts,
+            chunk_size=3,
+            max_concurrency=2,
+            retry_delay=0.0,
+            progress_callback=lambda done, total: progress.append(done),
+        )
+        assert np.allclose(vectors, expected)
+        assert len(progress) == 4 and progress[-1] == 10
+        assert embeddings.calls.count("example 3") == 2
+
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint_path = os.path.join(tmp, "checkpoint")
+            embeddings.calls = []
+            embeddings.fail_on = {"example 6"}
+            with pytest.raises(RuntimeError):
+                embed_texts(
+                    embeddings,
+                    texts,
+                    chunk_size=3,
+                    max_concurrency=1,
+                    max_retries=0,
+                    checkpoint_path=checkpoint_path,
+                )
+
+            # Only the chunks missing are embedded when resuming
+            embeddings.calls = []
+            vectors = embed_texts(
+                embeddings,
+                texts,
+                chunk_size=3,
+                max_concurrency=1,
+                checkpoint_path=checkpoint_path,
+            )
+            assert np.allclose(vectors, expected)
+            assert embeddings.calls == ["example 6", "example 9"]
+            assert not os.path.exists(checkpoint_path)
+
+        with pytest.raises(ValueError):
+            BaseSelectorSupervised(
+                language="es",
+                embeddings=DeterministicFakeEmbedding(size=16),
+                selector_k=3,
+                selector_algorithm="relevance",
+                embedding_options={"batch": 10},
+            )
+
+    def test_embedding_default_concurrency(self):
+        """
+        Test that local embeddings models embed one chunk at a time by
+        default and remote ones several.
+        """
+
+        from langchain.embeddings import OpenAIEmbeddings
+        from promptmeteo.cache import CachedEmbeddings
+        from promptmeteo.models.base import sentence_transformers_loader
+        from promptmeteo.selector.embedding import check_embedding_options
+        from promptmeteo.selector.embedding import default_max_concurrency
+        from promptmeteo.selector.embedding import REMOTE_MAX_CONCURRENCY
+
+        local = DeterministicFakeEmbedding(size=8)
+        assert default_max_concurrency(local) == 1
+        assert default_max_concurrency(CachedEmbeddings(local)) == 1
+        assert (
+            default_max_concurrency(OpenAIEmbeddings(openai_api_key="key"))
+            == REMOTE_MAX_CONCURRENCY
+        )
+        assert check_embedding_options()["max_concurrency"] is None
+
+        loader = sentence_transformers_loader("all-MiniLM-L6-v2")
+        assert loader.func.__name__ == "HuggingFaceEmbeddings"
+        assert default_max_concurrency(loader.func.construct()) == 1
+
+    def test_mmr_selector(self):
+        """
+        Test that the native MMR selector selects the same examples as the
+        MMR search of the LangChain vectorstore, for single and batched
+        queries, and after adding examples, and that it reranks with copies
+        of the exact vectors.
+        """
+
+        import numpy as np
+        from langchain_community.vectorstores.utils import (
+            maximal_marginal_relevance,
+        )
+        from promptmeteo.selector.custom_selectors import (
+            MaxMarginalRelevanceSelector,
+        )
+
+        embeddings = DeterministicFakeEmbedding(size=16)
+        selector = BaseSelectorSupervised(
+            language="es",
+            embeddings=embeddings,
+            selector_k=5,
+            selector_algorithm="relevance",
+        ).train(
+            examples=[f"example {idx}" for idx in range(100)],
+            annotations=[f"label {idx % 3}" for idx in range(100)],
+        )
+        assert isinstance(selector._selector, MaxMarginalRelevanceSelector)
+
+        def expected(sample):
+            import numpy as np
+
+            vectorstore = selector.vectorstore
+            query = np.asarray([embeddings.embed_query(sample)], "float32")
+            _, indices = vectorstore.index.search(query, 20)
+            candidates = [i for i in indices[0] if i != -1]
+            return [
+                vectorstore.docstore.search(
+                    vectorstore.index_to_docstore_id[int(candidates[i])]
+                ).metadata
+                for i in maximal_marginal_relevance(
+                    query,
+                    [vectorstore.index.reconstruct(int(i)) for i in candidates],
+                    k=5,
+                )
+            ]
+
+        samples = ["example 3", "example 50", "other text", "example 99"]
+        assert selector.select_batch(samples) == [expected(s) for s in samples]
+        assert selector.select("example 3") == expected("example 3")
+
+        selector.add_examples(["new example"], ["label 0"])
+        assert selector.select("new example") == expected("new example")
+        # The flat index is read only for the candidates, not copied
+        assert selector._selector.vectors is None
+
+        vectors = selector._selector.load_vectors()
+        ids = selector.add_examples(["other example"], ["label 1"])
+        selector.remove_examples(ids)
+        assert vectors.shape == (101, 16)
+        assert np.array_equal(
+            selector._selector.load_vectors(),
+            selector.vectorstore.index.reconstruct_n(0, 101),
+        )
+
+        pq_selector = BaseSelectorSupervised(
+            language="es",
+            embeddings=embeddings,
+            selector_k=5,
+            selector_algorithm="relevance",
+            selector_index="ivf_pq",
+            selector_index_params={"nlist": 2, "pq_m": 4},
+        ).train(
+            examples=[f"example {idx}" for idx in range(100)],
+            annotations=[f"label {idx % 3}" for idx in range(100)],
+        )
+        assert pq_selector._vectors is not None
+        assert np.array_equal(
+            pq_selector._selector.load_vectors(), pq_selector._vectors
+        )
+
+        ivf_selector = BaseSelectorSupervised(
+            language="es",
+            embeddings=embeddings,
+            selector_k=5,
+            selector_algorithm="relevance",
+            selector_index="ivf_flat",
+            selector_index_params={"nlist": 1},
+        ).train(
+            examples=[f"example {idx}" for idx in range(100)],
+            annotations=[f"label {idx % 3}" for idx in range(100)],
+        )
+        selector = ivf_selector
+        assert ivf_selector._selector.vectors is None
+        assert ivf_selector.select_batch(samples) == [
+            expected(s) for s in samples
+        ]
+
+        ids = list(ivf_selector.vectorstore.index_to_docstore_id.values())
+        ivf_selector.remove_examples(ids[:10])
+        assert ivf_selector.vectorstore.index.ntotal == 90
+        assert ivf_selector.select_batch(samples) == [
+            expected(s) for s in samples
+        ]
+
+    def test_prune_examples(self):
+        """
+        Test that the exact duplicates, the near-duplicates and the examples
+        left out of the coreset are removed for each label.
+        """
+
+        import numpy as np
+        from promptmeteo.selector.pruning import prune_examples
+
+        vectors = {
+            "a": [1.0, 0.0, 0.0],
+            "a'": [0.99, 0.01, 0.0],
+            "b": [0.0, 1.0, 0.0],
+            "c": [0.0, 0.0, 1.0],
+        }
+
+        def embed(texts):
+            return np.asarray([vectors[text] for text in texts], "float32")
+
+        texts = ["a", "a", "a'", "a'", "b", "c"]
+        labels = ["x", "x", "x", "y", "x", "x"]
+
+        result = prune_examples(texts, labels, embed, deduplicate=True)
+        assert result["kept"] == [0, 2, 3, 4, 5]
+        assert result["report"]["exact_duplicates"] == [
+            {"index": 1, "duplicate_of": 0}
+        ]
+        assert result["vectors"].shape == (5, 3)
+
+        result = prune_examples(
+            texts, labels, embed, deduplicate=True, dedup_threshold=0.95
+        )
+        assert result["kept"] == [0, 3, 4, 5]
+        assert [
+            (item["index"], item["duplicate_of"])
+            for item in result["report"]["near_duplicates"]
+        ] == [(2, 0)]
+
+        result = prune_examples(
+            texts, labels, embed, deduplicate=True, coreset_size=2
+        )
+        assert result["report"]["kept"] == 3
+        assert 3 in result["kept"]
+        assert len(result["report"]["coreset"]) == 2
+
+    def test_selector_reindex(self):
+        """
+        Test that the raw vectors are saved with the selector only when the
+        index approximates them, that the index is rebuilt from them without
+        embedding the examples again, and that loading the selector with
+        other embeddings fails.
+        """
+
+        import numpy as np
+
+        embeddings = DeterministicFakeEmbedding(size=16)
+        selector = BaseSelectorSupervised(
+            language="es",
+            embeddings=embeddings,
+            selector_k=2,
+            selector_algorithm="similarity_class_balanced",
+        ).train(
+            examples=[f"example {idx}" for idx in range(50)],
+            annotations=[f"label {idx % 2}" for idx in range(50)],
+        )
+        selector.add_examples(["new example"], ["label 0"])
+        expected = sorted(
+            example["__INPUT__"] for example in selector.select("example 3")
+        )
+
+        kwargs = {
+            "class_list": ["label 0", "label 1"],
+            "class_key": "__OUTPUT__",
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            pq_selector = BaseSelectorSupervised(
+                language="es",
+                embeddings=embeddings,
+                selector_k=2,
+                selector_algorithm="similarity",
+                selector_index="ivf_pq",
+                selector_index_params={"nlist": 2, "pq_m": 4},
+            ).train(
+                examples=[f"example {idx}" for idx in range(50)],
+                annotations=[f"label {idx % 2}" for idx in range(50)],
+            )
+            pq_selector.save_example_selector(tmp, vectors_dtype="float16")
+            assert np.load(os.path.join(tmp, "vectors.npy")).dtype == (
+                np.float16
+            )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            selector.save_example_selector(tmp, vectors_dtype="float16")
+            assert not os.path.exists(os.path.join(tmp, "vectors.npy"))
+
+            with pytest.raises(ValueError):
+                BaseSelectorSupervised(
+                    language="es",
+                    embeddings=DeterministicFakeEmbedding(size=8),
+                    selector_k=2,
+                    selector_algorithm="similarity_class_balanced",
+                ).load_example_selector(tmp, **kwargs)
+
+            load_selector = BaseSelectorSupervised(
+                language="es",
+                embeddings=embeddings,
+                selector_k=2,
+                selector_algorithm="similarity_class_balanced",
+            ).load_example_selector(tmp, **kwargs)
+
+        def fail(texts):
+            raise AssertionError("The examples must not be embedded again")
+
+        load_selector._embed_texts = fail
+        load_selector.reindex("hnsw", {"M": 8})
+
+        assert load_selector._selector_index == "hnsw"
+        assert load_selector.vectorstore.index.ntotal == 51
+        assert (
+            sorted(
+                example["__INPUT__"]
+                for example in load_selector.select("example 3")
+            )
+            == expected
+        )
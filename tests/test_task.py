@@ -2,6 +2,7 @@ import pytest
 
 from promptmeteo.models import BaseModel
 from promptmeteo.tasks import TaskBuilder
+from promptmeteo.tasks.token_budget import TokenBudget
 from promptmeteo.selector import SelectorTypes
 from promptmeteo.selector.base import SelectorAlgorithms
 
@@ -96,3 +97,142 @@ class TestTaskBuilder:
                     )
 
             assert task_builder.task.selector is not None
+
+    def test_token_budget(self):
+        """
+        Test that with a token budget the prompts only include the most
+        relevant examples that fit in the tokens left.
+        """
+
+        from langchain.embeddings import DeterministicFakeEmbedding
+
+        budget = TokenBudget(max_tokens=30, output_tokens=10, count_tokens=len)
+        assert budget.available("0123456789") == 10
+        # Examples that do not fit are skipped, not the ones after them
+        assert budget.pack(["aaaa", "b" * 20, "cc", "dd"], 10) == [0, 2]
+        assert budget.pack(["aaaa", "b" * 20, "cc", "dd"], 10, [3, 1, 0]) == [
+            0,
+            3,
+        ]
+        assert TokenBudget.output_tokens_from_params(
+            {"model_kwargs": {"max_tokens_to_sample": 300}}
+        ) == 300
+        assert TokenBudget.output_tokens_from_params({}) is None
+
+        task_builder = (
+            TaskBuilder(language="es", task_type="classification")
+            .build_model(
+                model_name="fake-static",
+                model_provider_name="fake-llm",
+            )
+            .build_prompt(
+                model_name="fake-static",
+                prompt_domain="",
+                prompt_labels=["1", "0"],
+                prompt_detail=None,
+            )
+        )
+        task_builder.task.model.embeddings = DeterministicFakeEmbedding(size=16)
+        task_builder.build_selector_by_train(
+            examples=[f"text {idx} " * (idx + 1) for idx in range(10)],
+            annotations=["1", "0"] * 5,
+            selector_k=10,
+            selector_type="supervised",
+            selector_algorithm="similarity",
+        )
+
+        task = task_builder.task
+        full_prompt = task.get_prompts(["sample"])[0]
+        empty_prompt = task._format_prompt("sample", "")
+
+        for max_tokens in [len(empty_prompt) + 5, len(full_prompt) - 50]:
+            task.token_budget = TokenBudget(
+                max_tokens=max_tokens, output_tokens=0, count_tokens=len
+            )
+            prompt = task.get_prompts(["sample"])[0]
+            assert len(prompt) <= max_tokens
+            assert len(prompt) < len(full_prompt)
+
+        task.token_budget = TokenBudget(
+            max_tokens=len(full_prompt), output_tokens=0, count_tokens=len
+        )
+        assert task.get_prompts(["sample"])[0] == full_prompt
+
+    def test_token_budget_balanced(self):
+        """
+        Test that with the class balanced selector the token budget keeps
+        examples of every class.
+        """
+
+        from langchain.embeddings import DeterministicFakeEmbedding
+        from promptmeteo.tasks.token_budget import round_robin
+
+        assert round_robin(["a", "a", "b", "a", "c"]) == [0, 2, 4, 1, 3]
+        assert round_robin([]) == []
+
+        labels = ["1", "0", "2"]
+        task_builder = (
+            TaskBuilder(language="es", task_type="classification")
+            .build_model(
+                model_name="fake-static",
+                model_provider_name="fake-llm",
+            )
+            .build_prompt(
+                model_name="fake-static",
+                prompt_domain="",
+                prompt_labels=labels,
+                prompt_detail=None,
+            )
+        )
+        task_builder.task.model.embeddings = DeterministicFakeEmbedding(size=16)
+        task_builder.build_selector_by_train(
+            examples=[f"text {idx:02d}" for idx in range(30)],
+            annotations=labels * 10,
+            selector_k=12,
+            selector_type="supervised",
+            selector_algorithm="similarity_class_balanced",
+        )
+
+        task = task_builder.task
+        examples = task.selector.select("sample")
+        assert len(examples) == 12
+        example_tokens = len(task.selector.format_examples(examples[:1]))
+        separator = TokenBudget.EXAMPLES_SEPARATOR
+
+        task.token_budget = TokenBudget(
+            max_tokens=len(task._format_prompt("sample", ""))
+            + 3 * (example_tokens + len(separator)),
+            output_tokens=0,
+            count_tokens=len,
+        )
+
+        # Ordered examples are grouped by class, from the most relevant
+        ordered = task.selector.select("sample", ordered=True)
+        assert sorted(map(str, ordered)) == sorted(map(str, examples))
+        assert [example["__OUTPUT__"] for example in ordered] == [
+            label for label in dict.fromkeys(
+                example["__OUTPUT__"] for example in ordered
+            )
+            for _ in range(4)
+        ]
+
+        # The least relevant examples of every class are dropped
+        expected = sorted(
+            task.selector.format_examples(
+                [
+                    next(
+                        example
+                        for example in ordered
+                        if example["__OUTPUT__"] == label
+                    )
+                ]
+            )
+            for label in labels
+        )
+        for _ in range(10):
+            prompt = task.get_prompts(["sample"])[0]
+            packed = task._pack_examples(
+                "sample", task.selector.select("sample", ordered=True)
+            )
+            assert sorted(packed.split(separator)) == expected
+            assert all(example in prompt for example in expected)